@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: archive_index.py
+Description: Local SQLite full text index of the idGames archive, filled by
+             crawling the mirror listings (and optionally the API's file
+             info), so the archive can be searched offline.
+Author: InZane84
+License: MIT
+"""
+import os, time, sqlite3, threading
+from collections import deque
+from pathlib import Path
+import httpx
+import http_client
+import idgames
+import mirrors
+
+INDEX_FILE = Path(os.environ.get("XDG_CACHE_HOME",
+                                 Path.home() / ".cache")) / "doom_map_scope" / "archive.sqlite"
+
+# seconds between crawler requests, be nice to the mirrors
+CRAWL_DELAY = 0.1
+
+# most results a search returns
+SEARCH_LIMIT = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    crawled REAL
+);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE,
+    dir TEXT,
+    filename TEXT,
+    title TEXT,
+    author TEXT,
+    size INTEGER,
+    date TEXT,
+    idgames_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+"""
+
+# external content FTS table kept in step with files by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5(
+    filename, title, author, dir, content='files', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts(rowid, filename, title, author, dir)
+    VALUES (new.id, new.filename, new.title, new.author, new.dir);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, filename, title, author, dir)
+    VALUES ('delete', old.id, old.filename, old.title, old.author, old.dir);
+END;
+CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE ON files BEGIN
+    INSERT INTO files_fts(files_fts, rowid, filename, title, author, dir)
+    VALUES ('delete', old.id, old.filename, old.title, old.author, old.dir);
+    INSERT INTO files_fts(rowid, filename, title, author, dir)
+    VALUES (new.id, new.filename, new.title, new.author, new.dir);
+END;
+"""
+
+FIELDS = ('path', 'dir', 'filename', 'title', 'author', 'size', 'date', 'idgames_id')
+
+
+class ArchiveIndex:
+    """The index database. Paths are relative to the archive root
+    ('levels/doom2/a-c/'), so it doesn't matter which mirror filled it.
+
+    Each thread gets its own connection (sqlite3 wants that), the
+    database is in WAL mode so searches don't wait for a crawl.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = Path(path)
+        self._local = threading.local()
+        self.fts = True
+
+    def db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            try:
+                conn.executescript(FTS_SCHEMA)
+            except sqlite3.OperationalError as e:
+                # sqlite built without FTS5, search falls back to LIKE
+                print(f"ArchiveIndex: no full text search: {e}")
+                self.fts = False
+            self._local.conn = conn
+        return conn
+
+    def file_count(self):
+        return self.db().execute("SELECT count(*) FROM files").fetchone()[0]
+
+    # -- searching -------------------------------------------------------
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Files matching every word of text (as prefixes), best first"""
+        words = [w for w in text.replace('"', ' ').split() if w]
+        if not words:
+            return []
+        db = self.db()
+        if self.fts:
+            query = " ".join(f'"{w}"*' for w in words)
+            rows = db.execute("SELECT files.* FROM files_fts JOIN files ON files.id = files_fts.rowid "
+                              "WHERE files_fts MATCH ? ORDER BY bm25(files_fts) LIMIT ?",
+                              (query, limit))
+        else:
+            where = " AND ".join(["(filename LIKE ? OR title LIKE ? OR author LIKE ? OR dir LIKE ?)"] * len(words))
+            args = [f"%{w}%" for w in words for _ in range(4)]
+            rows = db.execute(f"SELECT * FROM files WHERE {where} LIMIT ?", args + [limit])
+        return [dict(row) for row in rows]
+
+    # -- crawling --------------------------------------------------------
+
+    def _fetch_listing(self, client, path, headers):
+        """(mirror, response) for a dir, failing over between mirrors.
+        Raises FileNotFoundError when the mirrors that answered all said
+        404, ConnectionError when none answered."""
+        tried = set()
+        missing = 0
+        for attempt in range(len(mirrors.registry.urls)):
+            mirror = mirrors.registry.best(exclude=tried)
+            tried.add(mirror)
+            try:
+                response = client.get(mirror + path, headers=headers)
+                if response.status_code != 304:
+                    response.raise_for_status()
+                return mirror, response
+            except idgames.MIRROR_ERRORS as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404:
+                    missing += 1
+                mirrors.registry.mark_failed(mirror, e)
+        if missing:
+            raise FileNotFoundError(f"ArchiveIndex: {path} is gone")
+        raise ConnectionError(f"ArchiveIndex: no mirror could list {path}")
+
+    def _forget_dir(self, path):
+        """Drop a dir that's gone from the archive, with its files and
+        subdirs"""
+        db = self.db()
+        with db:
+            db.execute("DELETE FROM files WHERE substr(dir, 1, ?) = ?", (len(path), path))
+            db.execute("DELETE FROM dirs WHERE substr(path, 1, ?) = ?", (len(path), path))
+
+    def _update_dir(self, path, mirror, response, metadata, client):
+        """Store a changed dir's files and subdirs, returns the subdirs"""
+        url = mirror + path
+        entries = idgames.parse_listing(response.content, url)
+        subdirs, files = [], {}
+        for entry in entries:
+            if not entry['url'].startswith(url) or '?' in entry['url']:
+                # sort links, parent dir and anything off-site
+                continue
+            rel = entry['url'][len(mirror):]
+            if entry['is_folder']:
+                if rel != path:
+                    subdirs.append(rel)
+            elif entry['name'].lower().endswith('.zip'):
+                files[rel] = {'path': rel, 'dir': path, 'filename': entry['name'],
+                              'title': None, 'author': None, 'size': entry.get('size'),
+                              'date': entry.get('date'), 'idgames_id': None}
+
+        if metadata and files:
+            try:
+                contents = idgames.get_dir_contents(path, client)
+            except (httpx.HTTPError, ValueError) as e:
+                # the listing is still worth keeping, without titles
+                print(f"ArchiveIndex: no metadata for {path}: {e}")
+                contents = []
+            for info in contents:
+                rel = info.get('dir', path).lstrip('/') + info.get('filename', '')
+                if rel in files:
+                    files[rel].update(title=info.get('title'), author=info.get('author'),
+                                      size=info.get('size'), date=info.get('date'),
+                                      idgames_id=info.get('id'))
+
+        db = self.db()
+        with db:
+            known = {row[0] for row in db.execute("SELECT path FROM files WHERE dir = ?", (path,))}
+            for gone in known - set(files):
+                db.execute("DELETE FROM files WHERE path = ?", (gone,))
+            for f in files.values():
+                db.execute(f"INSERT INTO files ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))}) "
+                           "ON CONFLICT(path) DO UPDATE SET " +
+                           ", ".join(f"{k} = coalesce(excluded.{k}, {k})" for k in FIELDS[1:]),
+                           [f[k] for k in FIELDS])
+            # dirs that went away take their files and subdirs with them
+            for (old,) in db.execute("SELECT path FROM dirs WHERE parent = ?", (path,)).fetchall():
+                if old not in subdirs:
+                    db.execute("DELETE FROM files WHERE substr(dir, 1, ?) = ?", (len(old), old))
+                    db.execute("DELETE FROM dirs WHERE substr(path, 1, ?) = ?", (len(old), old))
+            for sub in subdirs:
+                db.execute("INSERT OR IGNORE INTO dirs (path, parent) VALUES (?, ?)", (sub, path))
+            db.execute("INSERT INTO dirs (path, parent, etag, last_modified, crawled) "
+                       "VALUES (?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET "
+                       "etag = excluded.etag, last_modified = excluded.last_modified, "
+                       "crawled = excluded.crawled",
+                       (path, None, response.headers.get('ETag'),
+                        response.headers.get('Last-Modified'), time.time()))
+        return subdirs
+
+    def crawl(self, root="", metadata=False, client=None, progress=None, stop=None):
+        """Walk the archive from root ('' is all of it) into the index.
+
+        Every dir is asked for with the validators of the last crawl, an
+        unchanged one (304) is skipped and only its known subdirs are
+        walked. metadata=True also fetches title/author/size/date from
+        the API for changed dirs. progress(path, dirs done, dirs changed)
+        is called per dir, stop() returning True ends the crawl early. A
+        dir every mirror 404s is dropped from the index, the crawl only
+        gives up when no mirror can be reached.
+        Returns (dirs done, dirs changed).
+        """
+        client = client or http_client.get_client()
+        db = self.db()
+        pending = deque([root])
+        done = changed = 0
+        while pending:
+            if stop and stop():
+                break
+            path = pending.popleft()
+            row = db.execute("SELECT etag, last_modified FROM dirs WHERE path = ?", (path,)).fetchone()
+            headers = {}
+            if row and row['etag']:
+                headers['If-None-Match'] = row['etag']
+            if row and row['last_modified']:
+                headers['If-Modified-Since'] = row['last_modified']
+            try:
+                mirror, response = self._fetch_listing(client, path, headers)
+            except FileNotFoundError as e:
+                # removed or renamed since the last crawl, the rest of
+                # the archive is still there
+                print(e)
+                self._forget_dir(path)
+                continue
+            except ConnectionError as e:
+                # the mirrors are unreachable, no use going on
+                print(e)
+                break
+            if response.status_code == 304:
+                subdirs = [r[0] for r in db.execute("SELECT path FROM dirs WHERE parent = ?", (path,))]
+            else:
+                subdirs = self._update_dir(path, mirror, response, metadata, client)
+                changed += 1
+            pending.extend(subdirs)
+            done += 1
+            if progress:
+                progress(path, done, changed)
+            time.sleep(CRAWL_DELAY)
+        return done, changed
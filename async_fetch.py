@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: async_fetch.py
+Description: Fetches pages on an asyncio loop in a background thread and
+             hands the results back to the main thread, so a slow mirror
+             never stalls the UI.
+Author: InZane84
+License: MIT
+"""
+import asyncio, threading, queue, time
+from concurrent.futures import Future
+import http_client
+from progressive_draw import FRAME_BUDGET
+
+
+class AsyncFetcher:
+    """One fetch at a time, the newest wins.
+
+    fetch() cancels whatever is still in flight and starts the new one on
+    the loop thread. When it's done on_done(url, result, error) is queued,
+    step() is called every frame by the render loop and runs the queued
+    callbacks there, so they may touch the UI. Results of cancelled or
+    superseded fetches are dropped. stream() also hands over parsed rows
+    as the page arrives.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       name="async_fetch", daemon=True)
+        self.thread.start()
+        self.done = queue.SimpleQueue()
+        self.future = None
+        self.generation = 0
+
+    @property
+    def busy(self):
+        return self.future is not None
+
+    def fetch(self, url, on_done, parse=None, cache=None):
+        """Fetch url, parse(content, url) runs on the loop thread too so
+        the main thread only gets the finished result. With a
+        listing_cache.ListingCache the parsed result goes through it."""
+        self._start(url, on_done, lambda generation: self._get(url, parse, cache))
+
+    def stream(self, url, parser, on_rows, on_done, cache):
+        """Fetch a listing through a ListingCache, feeding parser (a fresh
+        idgames.ListingParser) as the bytes arrive. on_rows(url, rows)
+        gets every batch of finished entries on the main thread, on_done
+        the whole listing as fetch() does."""
+        def rows_arrived(generation, rows):
+            self.done.put((generation, on_rows, url, rows))
+
+        self._start(url, on_done, lambda generation: cache.stream_async(
+            http_client.get_async_client(), url, parser,
+            lambda rows: rows_arrived(generation, rows)))
+
+    def _start(self, url, on_done, coroutine):
+        self.cancel()
+        self.generation += 1
+        generation = self.generation
+        future = asyncio.run_coroutine_threadsafe(coroutine(generation), self.loop)
+        future.add_done_callback(lambda f: self.done.put((generation, on_done, url, f)))
+        self.future = future
+
+    def cancel(self):
+        """Drop the fetch in flight (the request is aborted, not just
+        ignored)"""
+        if self.future is not None:
+            self.future.cancel()
+            self.future = None
+            self.generation += 1
+
+    async def _get(self, url, parse, cache):
+        if cache is not None:
+            return await cache.get_async(http_client.get_async_client(), url, parse)
+        response = await http_client.get_async_client().get(url)
+        response.raise_for_status()
+        if parse is None:
+            return response.content
+        return parse(response.content, url)
+
+    def step(self, budget=FRAME_BUDGET):
+        """Run the callbacks of finished fetches, main thread only. Stops
+        after `budget` seconds, the rest waits for the next frame."""
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            try:
+                generation, callback, url, result = self.done.get_nowait()
+            except queue.Empty:
+                return
+            if generation != self.generation:
+                continue
+            if not isinstance(result, Future):
+                # a batch of rows from stream()
+                callback(url, result)
+                continue
+            future = result
+            if future.cancelled():
+                continue
+            self.future = None
+            error = future.exception()
+            callback(url, None if error else future.result(), error)
+
+    def close(self):
+        self.cancel()
+        asyncio.run_coroutine_threadsafe(http_client.close_async_client(),
+                                         self.loop).result(timeout=5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=5)
@@ -0,0 +1,216 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Module Name: atlas.py
+Description: Contact sheet of every map in a WAD. The cells are drawn in
+             parallel with drawmaps.rendermap and the sheet is written to
+             the PNG a row of cells at a time, so only a few cells are
+             ever in memory.
+Author: InZane84
+License: MIT
+"""
+import sys, os, getopt, math, time, struct, zlib
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from PIL import Image, ImageDraw
+import drawmaps
+from wadfile_buffer import MappedWAD
+
+# cell layout, in pixels
+CELL_SIZE = 512
+LABEL_HEIGHT = 28
+GAP = 8
+BACKGROUND = (255, 255, 255)
+LABEL_COLOR = (0, 0, 0)
+
+# one cell to draw
+Cell = namedtuple('Cell', 'index wadpath name size options')
+
+
+class PngWriter:
+    """Writes an RGB PNG a band of rows at a time.
+
+    Pillow wants the whole image in memory to save it, this only keeps the
+    zlib stream's state around.
+    """
+
+    def __init__(self, path, width, height, level=6):
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.file = open(path, "wb")
+        self.zlib = zlib.compressobj(level)
+        self.file.write(b"\x89PNG\r\n\x1a\n")
+        # 8 bit RGB, no interlace
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind, data):
+        self.file.write(struct.pack(">I", len(data)))
+        self.file.write(kind)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write(self, rows):
+        """rows is an (n, width, 3) uint8 array"""
+        assert rows.shape[1:] == (self.width, 3)
+        # every scanline starts with its filter type, 0 is none
+        lines = np.zeros((len(rows), self.width * 3 + 1), dtype=np.uint8)
+        lines[:, 1:] = rows.reshape(len(rows), -1)
+        data = self.zlib.compress(lines.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows += len(rows)
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError("PngWriter: wrote %d of %d rows" % (self.rows, self.height))
+        self._chunk(b"IDAT", self.zlib.flush())
+        self._chunk(b"IEND", b"")
+        self.file.close()
+
+
+def drawcell(cell):
+    """Draw one map into a size x size RGB array, label on top"""
+    image = Image.new('RGB', (cell.size, cell.size), BACKGROUND)
+    try:
+        im, scale = drawmaps.rendermap(drawmaps.open_wad(cell.wadpath), cell.name,
+                                       min(cell.size, cell.size - LABEL_HEIGHT), 0,
+                                       cell.options)
+        im = im.convert('RGB')
+        # center the map under the label
+        image.paste(im, ((cell.size - im.size[0]) // 2,
+                         LABEL_HEIGHT + (cell.size - LABEL_HEIGHT - im.size[1]) // 2))
+    except Exception as e:
+        print("drawcell: %s failed: %s" % (cell.name, e))
+
+    draw = ImageDraw.Draw(image)
+    font = drawmaps.get_font(LABEL_HEIGHT - 8)
+    width, height = drawmaps.textsize(font, cell.name)
+    draw.text(((cell.size - width) / 2, (LABEL_HEIGHT - height) / 2), cell.name,
+              LABEL_COLOR, font=font)
+    return cell.index, np.asarray(image)
+
+
+def findmaps(wadpath, patterns=("*",)):
+    """Map names of a WAD matching any of the patterns, in WAD order"""
+    wad = MappedWAD(wadpath)
+    names = []
+    for pattern in patterns:
+        for name in wad.maps.find(pattern) + wad.udmfmaps.find(pattern):
+            if name not in names:
+                names.append(name)
+    wad.release()
+    return names
+
+
+def export_atlas(wadpath, filename, patterns=("*",), columns=None, size=CELL_SIZE,
+                 workers=None, options=drawmaps.Options()):
+    """Draw every matching map of a WAD into one PNG sheet.
+
+    Cells are drawn by a pool of `workers` processes (all cores when None),
+    at most two rows of cells are in flight or waiting to be written.
+    Returns (maps, width, height).
+    """
+    names = findmaps(wadpath, patterns)
+    if not names:
+        print("export_atlas: no maps in %s" % wadpath)
+        return 0, 0, 0
+    if columns is None:
+        columns = int(math.ceil(math.sqrt(len(names))))
+    rows = int(math.ceil(len(names) / float(columns)))
+    width = columns * size + (columns + 1) * GAP
+    height = rows * size + (rows + 1) * GAP
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(names)))
+
+    cells = [Cell(i, wadpath, name, size, options) for i, name in enumerate(names)]
+    png = PngWriter(filename, width, height)
+    gap_rows = np.empty((GAP, width, 3), dtype=np.uint8)
+    gap_rows[...] = BACKGROUND
+    png.write(gap_rows)
+
+    done = {}
+    pending = set()
+    queued = iter(cells)
+    limit = columns * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+
+        def refill():
+            # keep the pool busy without running too far ahead
+            while len(pending) + len(done) < limit:
+                cell = next(queued, None)
+                if cell is None:
+                    break
+                pending.add(pool.submit(drawcell, cell))
+
+        for row in range(rows):
+            refill()
+            wanted = range(row * columns, min((row + 1) * columns, len(cells)))
+            while any(i not in done for i in wanted):
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pending.discard(future)
+                    index, pixels = future.result()
+                    done[index] = pixels
+                refill()
+
+            # one band of the sheet: the row of cells with gaps around them
+            band = np.empty((size, width, 3), dtype=np.uint8)
+            band[...] = BACKGROUND
+            for col, i in enumerate(wanted):
+                x = GAP + col * (size + GAP)
+                band[:, x:x + size] = done.pop(i)
+            png.write(band)
+            png.write(gap_rows)
+    png.close()
+    return len(names), width, height
+
+
+def usage():
+    print("\n    Draw every map of a WAD onto one overview image\n")
+    print("    Usage:")
+    print("    atlas.py [-d] [-f] [-j workers] [-c columns] [-s cellsize] source.wad output.png [pattern]\n")
+    print("    Maps whose names match the pattern (default all, several patterns")
+    print("    separated by commas) are laid out in a grid, labelled with the map name.")
+    print("    '-d'/'-f' draw DM/CTF spawn spots like drawmaps.py does.")
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    workers = columns = None
+    size = CELL_SIZE
+    dmspawns = ctfspawns = False
+    try:
+        opts, args = getopt.getopt(argv, 'dfj:c:s:')
+        for o, a in opts:
+            if o == '-d':
+                dmspawns = True
+            if o == '-f':
+                ctfspawns = True
+            if o == '-j':
+                workers = int(a)
+            if o == '-c':
+                columns = int(a)
+            if o == '-s':
+                size = int(a)
+    except (getopt.GetoptError, ValueError) as err:
+        print(str(err))
+        sys.exit(2)
+    if len(args) < 2:
+        usage()
+        return
+
+    patterns = args[2].split(",") if len(args) > 2 else ("*",)
+    options = drawmaps.Options(dmspawns=dmspawns, ctfspawns=ctfspawns)
+    started = time.perf_counter()
+    maps, width, height = export_atlas(args[0], args[1], patterns, columns, size,
+                                       workers, options)
+    if maps:
+        print("Drew %d maps into %s (%d x %d) in %0.2fs" %
+              (maps, args[1], width, height, time.perf_counter() - started))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: conftest.py
+Description: pytest fixtures shared by the tests, small generated WADs.
+Author: InZane84
+License: MIT
+"""
+import random
+import pytest
+from omg import WAD
+from omg.lump import Lump
+from omg.mapedit import MapEditor, Vertex, Linedef, Sidedef, Sector, Thing
+
+
+def build_map(rooms, seed):
+    """A map of `rooms` closed 8 sided rooms scattered around, with some
+    two sided, special and tagged lines and a few things in the rooms"""
+    rng = random.Random(seed)
+    m = MapEditor()
+    m.sectors.append(Sector())
+    m.sidedefs.append(Sidedef(sector=0))
+    centers = []
+    for room in range(rooms):
+        cx, cy = rng.randint(-4000, 4000), rng.randint(-4000, 4000)
+        centers.append((cx, cy))
+        base = len(m.vertexes)
+        for i in range(8):
+            m.vertexes.append(Vertex(x=cx + rng.randint(-300, 300), y=cy + rng.randint(-300, 300)))
+        for i in range(8):
+            line = Linedef(vx_a=base + i, vx_b=base + (i + 1) % 8, front=0)
+            if i % 3 == 0:
+                line.two_sided = True
+                line.back = 0
+            if i % 5 == 0:
+                line.action = 1
+            if i % 7 == 0:
+                line.tag = 3
+            m.linedefs.append(line)
+    for t in range(10):
+        x, y = centers[t % len(centers)] if centers else (0, 0)
+        m.things.append(Thing(x=x, y=y, type=(1, 11, 3001)[t % 3], angle=90))
+    return m
+
+
+@pytest.fixture
+def make_wad(tmp_path):
+    """make_wad(maps, rooms=, extra=, name=) writes a PWAD with those
+    maps (and `extra` non-map lumps, name -> bytes), returns its path"""
+    def make(maps=("MAP01",), rooms=6, extra=None, name="test.wad", seed=0):
+        wad = WAD()
+        for i, map_name in enumerate(maps):
+            wad.maps[map_name] = build_map(rooms, seed + i).to_lumps()
+        for lump_name, data in (extra or {}).items():
+            wad.data[lump_name] = Lump(data)
+        path = tmp_path / name
+        wad.to_file(str(path))
+        return path
+    return make
@@ -13,60 +13,119 @@ Copyright (c) 2026 InZane84
 This source code is licensed under the MIT license found in the
 LICENSE file in the root directory of this source tree.
 """
-import time, re, threading, zipfile, io, tempfile, os
+import time, threading, io, math, queue
+from collections import OrderedDict
 import dearpygui.dearpygui as dpg
-from omg.wad import WAD
-from omg.mapedit import MapEditor
+from wadfile_buffer import BufferWAD, MappedWAD
+import numpy as np
+from PIL import Image
+from map_geometry import (MapGeometry, chain_segments, STYLE_ONESIDED,
+                          STYLE_TWOSIDED, STYLE_SPECIAL, STYLE_TAGGED)
+from map_view import MapView
+from map_lod import chains_to_segments
+from progressive_draw import ProgressiveDraw, FRAME_BUDGET
+from geometry_cache import GeometryCache
+from wadfile_cache import DownloadCache
+from listing_cache import ListingCache
+from archive_index import ArchiveIndex
+from metadata_cache import MetadataCache
+from metadata_prefetch import MetadataPrefetcher
+import map_raster
+import atlas
+import idgames
+import http_client
+import mirrors
+from async_fetch import AsyncFetcher
+from wadinfo import wad_map_ids, MAPID_FORMATS
+from idgames import IdGamesEntry
 import httpx
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from typing import TypedDict
-
-# need to ask about this class as it relates
-# to the annotated return type
-class IdGamesEntry(TypedDict):
-    """To satisfy pylance..."""
-    name: str
-    url: str
-    is_folder: bool
-    type: str
 
+# linedef (color, thickness) per map_geometry style
+VIEWER_STYLES = {STYLE_ONESIDED: ((180, 40, 0),   1.5),
+                 STYLE_TWOSIDED: ((120, 85, 0),   1),
+                 STYLE_SPECIAL:  ((220, 130, 50), 1.5),
+                 STYLE_TAGGED:   ((200, 110, 30), 1.5)}
+VIEWER_DRAW_ORDER = (STYLE_TWOSIDED, STYLE_SPECIAL, STYLE_TAGGED, STYLE_ONESIDED)
+
+# pixels of empty border around a plotted map
+MAP_BORDER = 4
+
+# how many decoded maps / pre-rendered raster images are kept in memory,
+# the map on screen plus its neighbours and a few recently viewed ones
+GEOMETRY_CACHE_MAPS = 8
+PRERENDER_CACHE_MAPS = 4
+
+
+# pixels around the canvas that still count as visible when culling, thick
+# pens and rounding can put a line from just off screen onto the edge
+VIEW_MARGIN = 3
+
+# dpg calls posted by worker threads, run by the render loop
+ui_calls = queue.SimpleQueue()
+
+def on_ui(func, *args):
+    """Have the render loop call func(*args), for worker threads that
+    want to touch the UI"""
+    ui_calls.put((func, args))
+
+def step_ui(budget=FRAME_BUDGET):
+    """Run the posted calls in order, main thread only. Stops after
+    `budget` seconds, the rest waits for the next frame."""
+    deadline = time.perf_counter() + budget
+    while time.perf_counter() < deadline:
+        try:
+            func, args = ui_calls.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            func(*args)
+        except Exception as e:
+            # the render loop has to keep going
+            print(f"step_ui: {getattr(func, '__name__', func)} failed: {e}")
+
+def render_view(geometry, view, lines=None, level=0):
+    """Rasterize what `view` shows of a map into an RGBA array (transparent
+    background), with the same colors, draw order and 1s/2s thickness as
+    the vector view. `lines` limits it to those linedef indexes, a `level`
+    above 0 draws that LOD level of the map instead."""
+    if level:
+        # segments of the simplified chains, style by style in draw order
+        lod = geometry.lod(level)
+        v1, v2, styles = [], [], []
+        for style in VIEWER_DRAW_ORDER:
+            a, b = chains_to_segments(lod.get(style, []))
+            v1.append(a)
+            v2.append(b)
+            styles.append(np.full(len(a), style, dtype=np.int8))
+        v1, v2, styles = np.concatenate(v1), np.concatenate(v2), np.concatenate(styles)
+    else:
+        rank = np.zeros(len(VIEWER_STYLES), dtype=np.int8)
+        rank[list(VIEWER_DRAW_ORDER)] = np.arange(len(VIEWER_DRAW_ORDER))
+        styles = geometry.styles()
+        if lines is None:
+            lines = np.arange(geometry.num_linedefs)
+        lines = lines[np.argsort(rank[styles[lines]], kind='stable')]
+        v1, v2, styles = geometry.v1[lines], geometry.v2[lines], styles[lines]
+
+    x1, y1 = view.to_screen(geometry.vx[v1], -geometry.vy[v1])
+    x2, y2 = view.to_screen(geometry.vx[v2], -geometry.vy[v2])
+    # zoomed in, segments can reach far off the canvas
+    x1, y1, x2, y2, keep = map_raster.clip_segments(x1, y1, x2, y2, -2, -2,
+                                                    view.width + 1, view.height + 1)
+    x1, y1, x2, y2 = (np.rint(a).astype(np.int64) for a in (x1, y1, x2, y2))
+
+    image = map_raster.new_image(view.width, view.height)
+    palette = {style: color + (255,) for style, (color, _) in VIEWER_STYLES.items()}
+    widths = {style: math.ceil(thickness) for style, (_, thickness) in VIEWER_STYLES.items()}
+    return map_raster.draw_styled(image, x1, y1, x2, y2, styles[keep], palette, widths)
 
 def get_idgames_html(url: str) -> list[IdGamesEntry]:
     """Get the dir listings from a url"""
 
-    PRIMARY = "https://mirrors.lug.mtu.edu/idgames/"
-
-    # gonna just overwrite the url for now...
-    url = PRIMARY
-
-    _mirrors = []
-    MIRROR = None
-
     try:
-        response = httpx.get(url, follow_redirects=True)
-        print("get_idgame_html: on Line 44")
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        entries = []
-        links = soup.find_all('a')
-
-        for link in links:
-            href = link.get('href')
-            text = link.get_text().strip()
-            if not href or not text or text == "Parent Directory" or href == '../':
-                continue
-            full_url = urljoin(url, href)
-            is_folder = href.endswith('/')
-            '''
-            for entry in entries:
-                print(entry)
-            '''
-            entries.append({'name': text,
-                            'url': full_url,
-                            'is_folder': is_folder,
-                            'type': 'folder' if is_folder else 'file'})
-        return entries
+        # pooled client, a warm connection makes this one round trip, and
+        # an unchanged folder comes back as a 304 from the listing cache
+        return listing_cache.get(http_client.get_client(), url, idgames.parse_listing)
     
     except httpx.ConnectError as e:
         if "SSL" and "CERTIFICATE_VERIFY_FAILED" in e.args[0]:
@@ -78,28 +137,94 @@ def get_idgames_html(url: str) -> list[IdGamesEntry]:
         print(f"Error parsing directory: {e}")
         return []
     
+# (label, width, sort key) of the browser's listing columns, the API's
+# title/author/rating aren't in the listing so they don't sort
+LISTING_COLUMNS = (("Name", 220, 'name'), ("Title", 260, None),
+                   ("Author", 160, None), ("Rating", 50, None),
+                   ("Size", 60, 'size'), ("Date", 130, 'date'),
+                   ("Type", 60, 'type'))
+
+# rows of widgets in the browser's table, they're reused for whichever
+# part of the listing is scrolled to
+PAGE_ROWS = 25
+ROW_HEIGHT = 23
+
+# rows scrolled per mouse wheel notch
+WHEEL_ROWS = 3
+
+
+def format_size(size):
+    """1234567 -> '1.2M' like the mirrors show it"""
+    if size is None:
+        return ""
+    if size < 1024:
+        return str(size)
+    for unit in ("K", "M", "G"):
+        size /= 1024
+        if size < 1024 or unit == "G":
+            break
+    return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+
+
+def format_rating(rating):
+    try:
+        return f"{float(rating):.1f}"
+    except (TypeError, ValueError):
+        return ""
+
+
+def sort_key(column):
+    """Key function for sorting entries by a listing column, entries
+    without a size/date go first"""
+    if column == 'name':
+        return lambda entry: entry['name'].lower()
+    if column == 'size':
+        return lambda entry: entry.get('size') or -1
+    return lambda entry: entry.get(column) or ""
+
+
 class IdGamesBrowser:
     """Browser for idGames archive"""
 
-    _PRIMARY = "https://mirrors.lug.mtu.edu/idgames/"
-
     def __init__(self, root_url=None):
-        # lets just overwrite the root_url for now
-        self.root_url = self._PRIMARY
-        # =======================================
-        self.current_url = root_url
+        # None browses whichever mirror is best at the time
+        self.root_url = root_url
+        self.current_url = root_url or mirrors.registry.best()
         self.current_entries = []
+        # current_entries filtered and sorted, and the first one on screen
+        self.view = []
+        self.offset = 0
+        # (column, reverse) or None for the mirror's order
+        self.sort = None
         self.history_stack = []
+        self.forward_stack = []
+        # mirrors the folder being loaded failed on, see show_listing()
+        self.tried = set()
         self.window_tag = "idgames_browser_window"
         self.table_tag = "idgames_table"
+        self.listing_tag = "idgames_listing"
+        self.results_tag = "idgames_results"
+        self.scroll_tag = "idgames_scroll"
+        self.filter_tag = "idgames_filter"
+        self.count_tag = "idgames_count"
         self.path_tag = "current_path"
+        self.loading_tag = "idgames_loading"
+        self.search_tag = "idgames_search"
+        self.index_status_tag = "idgames_index_status"
+        self.crawler = None
+        # listings are fetched off the UI thread, main() calls
+        # self.fetcher.step() every frame to apply them
+        self.fetcher = AsyncFetcher()
+        # title/author/rating of the folder's files, fetched in the
+        # background, main() calls self.prefetcher.step() every frame too
+        self.prefetcher = MetadataPrefetcher(metadata_cache, self.show_info)
         
         self.create_window()
     
     def create_window(self):
         """Create the DearPyGui window"""
         with dpg.window(label="idGames Browser", 
-                       width=900, 
+                       width=1100, 
                        height=600, 
                        pos=(50, 50),
                        tag=self.window_tag):
@@ -109,6 +234,9 @@ class IdGamesBrowser:
                 dpg.add_button(label="Back", 
                              width=80, 
                              callback=self.go_back)
+                dpg.add_button(label="Forward",
+                             width=80,
+                             callback=self.go_forward)
                 #dpg.add_same_line()
                 dpg.add_button(label="Home", 
                              width=80, 
@@ -119,96 +247,389 @@ class IdGamesBrowser:
                              color=(255,0,0),
                              show=False)
 
+                dpg.add_loading_indicator(tag=self.loading_tag,
+                                          style=1,
+                                          radius=1.5,
+                                          show=False)
                 #dpg.add_same_line()
                 dpg.add_text("", tag=self.path_tag, wrap=700)
-            
-            # Directory table
-            with dpg.table(header_row=True, 
-                         row_background=True,
-                         borders_innerH=True,
-                         borders_outerH=True,
-                         borders_innerV=True,
-                         borders_outerV=True,
-                         tag=self.table_tag):
-                dpg.add_table_column(label="Name", width=500)
-                dpg.add_table_column(label="Type", width=100)
+
+            # offline search of the local archive index
+            with dpg.group(horizontal=True):
+                dpg.add_input_text(tag=self.search_tag,
+                                   hint="search the archive index...",
+                                   width=300,
+                                   callback=self.search)
+                dpg.add_button(label="Update index",
+                               callback=self.update_index)
+                dpg.add_checkbox(label="titles/authors",
+                                 tag="idgames_index_metadata")
+                dpg.add_text("", tag=self.index_status_tag)
+
+            # Directory table, PAGE_ROWS rows of widgets showing whichever
+            # entries are scrolled to, plus its filter and scrollbar
+            with dpg.group(tag=self.listing_tag):
+                with dpg.group(horizontal=True):
+                    dpg.add_input_text(tag=self.filter_tag,
+                                       hint="filter this folder...",
+                                       width=300,
+                                       callback=lambda: self.refresh(top=True))
+                    dpg.add_text("", tag=self.count_tag)
+
+                with dpg.group(horizontal=True):
+                    with dpg.table(header_row=True, 
+                                 row_background=True,
+                                 borders_innerH=True,
+                                 borders_outerH=True,
+                                 borders_innerV=True,
+                                 borders_outerV=True,
+                                 sortable=True,
+                                 sort_tristate=True,
+                                 callback=self.sort_by,
+                                 width=-30,
+                                 tag=self.table_tag):
+                        for label, width, column in LISTING_COLUMNS:
+                            dpg.add_table_column(label=label, width=width, user_data=column,
+                                                 no_sort=column is None)
+                        for i in range(PAGE_ROWS):
+                            with dpg.table_row(tag=f"idgames_row_{i}"):
+                                dpg.add_button(label="",
+                                               width=-1,
+                                               tag=f"idgames_row_{i}_name",
+                                               user_data=i,
+                                               callback=self.row_clicked)
+                                # opens the details window
+                                dpg.add_button(label="",
+                                               width=-1,
+                                               tag=f"idgames_row_{i}_title",
+                                               user_data=i,
+                                               callback=self.title_clicked)
+                                dpg.add_text("", tag=f"idgames_row_{i}_author")
+                                dpg.add_text("", tag=f"idgames_row_{i}_rating")
+                                dpg.add_text("", tag=f"idgames_row_{i}_size")
+                                dpg.add_text("", tag=f"idgames_row_{i}_date")
+                                dpg.add_text("", tag=f"idgames_row_{i}_type")
+                    # a vertical slider has its max at the top
+                    dpg.add_slider_int(tag=self.scroll_tag,
+                                       vertical=True,
+                                       height=PAGE_ROWS * ROW_HEIGHT,
+                                       width=20,
+                                       min_value=0,
+                                       max_value=0,
+                                       format="",
+                                       callback=lambda s, a: self.scroll_to(self.last_offset() - a))
+
+        with dpg.handler_registry():
+            dpg.add_mouse_wheel_handler(callback=self.wheel)
         
         # Load initial directory
         self.navigate_to_url(self.current_url)
     
-    def navigate_to_url(self, url):
-        """Navigate to a new URL and update the table"""
+    def navigate_to_url(self, url, history=True, tried=None):
+        """Navigate to a new URL, the table is updated by show_listing()
+        once it's loaded. Navigating again cancels a load in flight.
+        tried is the mirrors this folder already failed on."""
         
         # Add current URL to history before navigating
-        if self.current_url != url:
+        if history and self.current_url != url:
             self.history_stack.append(self.current_url)
+            self.forward_stack.clear()
         
         self.current_url = url
-        self.current_entries = get_idgames_html(url)
-
+        self.current_entries = []
+        self.offset = 0
+        self.tried = tried or set()
+        self.prefetcher.cancel()
+        dpg.set_value(self.filter_tag, "")
+        self.refresh()
+        # recently seen folders are shown right away
+        entries = listing_cache.fresh(url)
+        if entries is not None:
+            self.fetcher.cancel()
+            self.show_listing(url, entries, None)
+            return
+        dpg.show_item(self.loading_tag)
+        dpg.set_value(self.path_tag, f"Loading {url}...")
+        # rows show up as the page arrives
+        self.fetcher.stream(url, idgames.ListingParser(url), self.add_rows,
+                            self.show_listing, listing_cache)
+
+    def show_listing(self, url, entries, error):
+        """Fill the table with a fetched listing (runs on the main thread)"""
+        dpg.hide_item(self.loading_tag)
+        if error is not None:
+            print(f"show_listing: {url}: {error}")
+            entries = []
+            # unreachable/bad cert/missing folder, try the same folder on
+            # the next best mirror
+            if isinstance(error, idgames.MIRROR_ERRORS):
+                mirror = mirrors.registry.mirror_of(url)
+                if mirror is not None:
+                    mirrors.registry.mark_failed(mirror, error)
+                    self.tried.add(mirror)
+                    other = mirrors.registry.failover_url(url, exclude=self.tried)
+                    if other is not None:
+                        print(f"show_listing: failing over to {other}")
+                        self.navigate_to_url(other, history=False, tried=self.tried)
+                        return
         # ssl expired cert logic ==============================
-        if not self.current_entries:
+        if isinstance(error, httpx.ConnectError) and "CERTIFICATE_VERIFY_FAILED" in str(error):
             dpg.show_item("ssl_expired_cert")
             dpg.set_item_label(self.window_tag, f"idGames: {url} [Expired SSL CERT!!!]")
+        elif error is not None:
+            dpg.hide_item("ssl_expired_cert")
+            dpg.set_item_label(self.window_tag, f"idGames: {url} [{type(error).__name__}]")
         else:
             dpg.hide_item("ssl_expired_cert")
             dpg.set_item_label(self.window_tag, f"idGames Server: {url}")
         # =====================================================
 
-        print(f"navigate_to_url: passing {url} --> to get_idgames_html")
+        print(f"show_listing: {url}: {len(entries)} entries")
+        
+        # a streamed listing is in current_entries already, a cached (or
+        # failed) one isn't
+        if len(self.current_entries) != len(entries):
+            self.current_entries = list(entries)
+        # the rows on screen are moved to the front by draw_rows()
+        mirror = mirrors.registry.mirror_of(url)
+        if mirror is not None:
+            self.prefetcher.start([entry['url'][len(mirror):] for entry in self.current_entries
+                                   if not entry['is_folder'] and entry['name'].lower().endswith('.zip')])
+        self.refresh()
         
-        # Clear and rebuild table
-        if dpg.does_item_exist(self.table_tag):
-            dpg.delete_item(self.table_tag)
+        # Update breadcrumb/title
+        dpg.set_value(self.path_tag, self.current_url)
+    
+    def add_rows(self, url, rows):
+        """Append streamed listing entries"""
+        self.current_entries.extend(rows)
+        self.refresh()
+
+    def refresh(self, top=False):
+        """Filter and sort current_entries into the view and redraw, top
+        scrolls back to the first entry"""
+        if top:
+            self.offset = 0
+        text = dpg.get_value(self.filter_tag).strip().lower()
+        view = self.current_entries
+        if text:
+            view = [entry for entry in view if text in entry['name'].lower()]
+        if self.sort is not None:
+            column, reverse = self.sort
+            view = sorted(view, key=sort_key(column), reverse=reverse)
+        self.view = view
+        self.offset = min(self.offset, self.last_offset())
+        dpg.configure_item(self.scroll_tag, max_value=self.last_offset())
+        if text:
+            dpg.set_value(self.count_tag, f"{len(view)} of {len(self.current_entries)} entries")
+        else:
+            dpg.set_value(self.count_tag, f"{len(view)} entries")
+        self.draw_rows()
+
+    def last_offset(self):
+        return max(0, len(self.view) - PAGE_ROWS)
+
+    def draw_rows(self):
+        """Point the row widgets at view[offset:offset + PAGE_ROWS], so a
+        folder costs the same to show whatever its size. Files on screen
+        without metadata yet are fetched first."""
+        missing = []
+        for i in range(PAGE_ROWS):
+            index = self.offset + i
+            if index >= len(self.view):
+                dpg.hide_item(f"idgames_row_{i}")
+                continue
+            entry = self.view[index]
+            dpg.show_item(f"idgames_row_{i}")
+            dpg.set_item_label(f"idgames_row_{i}_name", entry['name'])
+            dpg.set_value(f"idgames_row_{i}_date", entry.get('date') or "")
+            dpg.set_value(f"idgames_row_{i}_type", entry['type'])
+            path = self.file_path(entry)
+            info = metadata_cache.fresh(path) if path else None
+            if path and info is None:
+                missing.append(path)
+            self.draw_info(i, entry, info)
+        if missing:
+            self.prefetcher.prioritize(missing)
+        dpg.set_value(self.scroll_tag, self.last_offset() - self.offset)
+
+    def draw_info(self, i, entry, info):
+        """Fill row i's metadata columns, info is the API's content dict
+        (None while it's being fetched)"""
+        info = info or {}
+        dpg.set_item_label(f"idgames_row_{i}_title", info.get('title') or "")
+        dpg.set_value(f"idgames_row_{i}_author", info.get('author') or "")
+        dpg.set_value(f"idgames_row_{i}_rating", format_rating(info.get('rating')))
+        dpg.set_value(f"idgames_row_{i}_size", format_size(entry.get('size') or info.get('size')))
+
+    def show_info(self, path, info):
+        """A file's metadata arrived, update its row if it's on screen"""
+        for i, entry in enumerate(self.view[self.offset:self.offset + PAGE_ROWS]):
+            if self.file_path(entry) == path:
+                self.draw_info(i, entry, info)
+
+    def file_path(self, entry):
+        """Archive path of a listed zip ('levels/doom2/a-c/foo.zip'), the
+        API knows files by it. None for anything else."""
+        if entry['is_folder'] or not entry['name'].lower().endswith('.zip'):
+            return None
+        mirror = mirrors.registry.mirror_of(entry['url'])
+        return entry['url'][len(mirror):] if mirror else None
+
+    def scroll_to(self, offset):
+        offset = max(0, min(int(offset), self.last_offset()))
+        if offset != self.offset:
+            self.offset = offset
+            self.draw_rows()
+
+    def wheel(self, sender, app_data):
+        if dpg.is_item_shown(self.listing_tag) and dpg.is_item_hovered(self.window_tag):
+            self.scroll_to(self.offset - app_data * WHEEL_ROWS)
+
+    def sort_by(self, sender, sort_specs):
+        """A column header was clicked, sort_specs is [[column, direction]]
+        or None when sorting is off again"""
+        if not sort_specs:
+            self.sort = None
+        else:
+            column, direction = sort_specs[0]
+            self.sort = (dpg.get_item_user_data(column), direction < 0)
+        self.refresh(top=True)
+
+    def row_clicked(self, sender, app_data, row):
+        """Rows show different entries as the table scrolls, so the entry
+        is looked up when it's clicked"""
+        index = self.offset + row
+        if index >= len(self.view):
+            return
+        entry = self.view[index]
+        if entry['is_folder']:
+            self.navigate_to_url(entry['url'])
+        else:
+            self.download_wad_callback(entry)
+
+    def title_clicked(self, sender, app_data, row):
+        """Details of a file, right away when it's been prefetched"""
+        index = self.offset + row
+        path = self.file_path(self.view[index]) if index < len(self.view) else None
+        if path is None:
+            return
+        info = metadata_cache.cached(path)
+        if info:
+            show_details(info)
+        else:
+            threading.Thread(target=open_details, args=(path,), daemon=True).start()
+
+    def search(self, sender=None, text=None):
+        """Show the index entries matching the search box, or the current
+        folder again when it's emptied"""
+        text = dpg.get_value(self.search_tag) if text is None else text
+        if not text.strip():
+            if dpg.does_item_exist(self.results_tag):
+                dpg.delete_item(self.results_tag)
+            dpg.show_item(self.listing_tag)
+            dpg.set_value(self.path_tag, self.current_url)
+            return
+        started = time.perf_counter()
+        rows = archive_index.search(text)
+        elapsed = time.perf_counter() - started
+        self.show_results(rows)
+        dpg.set_value(self.path_tag, f"{len(rows)} matches for '{text}' ({elapsed * 1000:.1f}ms)")
+
+    def show_results(self, rows):
+        """Search results: the file downloads it, the folder opens it.
+        They're shown in place of the folder's table."""
+        dpg.hide_item(self.listing_tag)
+        if dpg.does_item_exist(self.results_tag):
+            dpg.delete_item(self.results_tag)
         with dpg.table(header_row=True, 
                  row_background=True,
                  borders_innerH=True,
                  borders_outerH=True,
                  borders_innerV=True,
                  borders_outerV=True,
-                 tag=self.table_tag,
+                 tag=self.results_tag,
                  parent=self.window_tag):
-            dpg.add_table_column(label="Name", width=500)
-            dpg.add_table_column(label="Type", width=100)
-        
-        # Skip header row and rebuild
-        for entry in self.current_entries:
-            with dpg.table_row(parent=self.table_tag):
-                if entry['is_folder']:
-                    dpg.add_button(label=entry['name'], 
-                                 width=400,
-                                 callback=lambda: self.navigate_to_url(entry["url"]))
-                else:
-                    if entry['name'].lower().endswith('.wad'):
-                        dpg.add_button(label=entry['name'],
-                                     width=400,
-                                     callback=lambda s, a, f=entry['name']: self.download_wad_callback(f))
-                    else:
-                        dpg.add_text(entry['name'])
-                
-                dpg.add_text(entry['type'])
-        
-        # Update breadcrumb/title
-        dpg.set_value(self.path_tag, self.current_url)
-    
+            dpg.add_table_column(label="Name", width=250)
+            dpg.add_table_column(label="Title", width=300)
+            dpg.add_table_column(label="Folder", width=250)
+        for row in rows:
+            with dpg.table_row(parent=self.results_tag):
+                # the API takes an archive path when the id isn't known
+                wad_id = str(row['idgames_id'] or row['path'])
+                # the entry goes in user_data, DearPyGui passes that as
+                # the callback's third argument whatever its default
+                dpg.add_button(label=row['filename'],
+                               width=-1,
+                               user_data=wad_id,
+                               callback=lambda s, a, u: threading.Thread(target=wadfile_downloader,
+                                                                         args=(u,),
+                                                                         daemon=True).start())
+                dpg.add_text(row['title'] or "")
+                dpg.add_button(label=row['dir'],
+                               width=-1,
+                               user_data=row['dir'],
+                               callback=lambda s, a, d: self.open_folder(d))
+
+    def open_folder(self, path):
+        """Leave the search results for an archive folder"""
+        dpg.set_value(self.search_tag, "")
+        self.search(text="")
+        self.navigate_to_url(mirrors.registry.best() + path)
+
+    def update_index(self):
+        """Crawl the archive into the index on a background thread, only
+        folders that changed since the last crawl are read again"""
+        if self.crawler is not None and self.crawler.is_alive():
+            return
+        metadata = dpg.get_value("idgames_index_metadata")
+
+        def progress(path, done, changed):
+            on_ui(dpg.set_value, self.index_status_tag,
+                  f"indexing {path} ({done} folders, {changed} changed)")
+
+        def crawl():
+            try:
+                done, changed = archive_index.crawl(metadata=metadata, progress=progress)
+                on_ui(dpg.set_value, self.index_status_tag,
+                      f"{archive_index.file_count()} files indexed ({changed} of {done} folders changed)")
+            except Exception as e:
+                on_ui(dpg.set_value, self.index_status_tag, f"indexing failed: {e}")
+
+        self.crawler = threading.Thread(target=crawl, name="archive_crawler", daemon=True)
+        self.crawler.start()
+
     def go_back(self):
         """Go back to previous directory"""
         if self.history_stack:
             url = self.history_stack.pop()
-            self.navigate_to_url(url)
+            self.forward_stack.append(self.current_url)
+            self.navigate_to_url(url, history=False)
+
+    def go_forward(self):
+        """Undo a go_back()"""
+        if self.forward_stack:
+            url = self.forward_stack.pop()
+            self.history_stack.append(self.current_url)
+            self.navigate_to_url(url, history=False)
     
     def go_home(self):
         """Go back to root idGames directory"""
         self.history_stack.clear()
-        self.navigate_to_url(self.root_url)
+        self.navigate_to_url(self.root_url or mirrors.registry.best())
     
-    '''def download_wad_callback(self, filename):
+    def download_wad_callback(self, entry):
         """Handle WAD download when clicked"""
-        download_url = urljoin(self.current_url, filename)
-        print(f"Download: {download_url}")
-        # Pass to your wadfile_downloader here
-        # wadfile_downloader(download_url)
-    '''
+        # the API finds a file by its path in the archive
+        path = self.file_path(entry)
+        if path is None:
+            print(f"download_wad_callback: can't open {entry['name']}, only the archive's zips")
+            return
+        print(f"Download: {path}")
+        threading.Thread(target=wadfile_downloader,
+                         args=(path,),
+                         daemon=True).start()
+
 
 def get_wad_metadata():
     """get the filename and title values from the
@@ -241,8 +662,34 @@ def cb_scale_slider(sender, app_data):
     dpg.set_global_font_scale(app_data)
 
 def cb_remove_drawlist():
+    wadfile.cancel_drawing()
     dpg.delete_item("drawlist")
 
+def cb_map_wheel(sender, app_data):
+    """Mouse wheel over the map zooms around the pointer"""
+    if dpg.does_item_exist("drawlist") and dpg.is_item_hovered("drawlist"):
+        sx, sy = dpg.get_drawing_mouse_pos()
+        wadfile.zoom_view(1.25 ** app_data, sx, sy)
+
+def cb_map_mouse_down(sender, app_data):
+    """Start a drag-pan when the left button goes down over the map"""
+    if dpg.does_item_exist("drawlist") and dpg.is_item_hovered("drawlist"):
+        wadfile._drag = (0, 0)
+    else:
+        wadfile._drag = None
+
+def cb_map_drag(sender, app_data):
+    """Pan the map while dragging, app_data is [button, total dx, total dy]"""
+    if wadfile._drag is None:
+        return
+    _, dx, dy = app_data
+    lastx, lasty = wadfile._drag
+    wadfile._drag = (dx, dy)
+    wadfile.pan_view(dx - lastx, dy - lasty)
+
+def cb_map_mouse_up(sender, app_data):
+    wadfile._drag = None
+
 """def cb_mapscale_slider(sender, app_data):
     # can't get this working as needed
     snapped_value = round(app_data / 50) * 30
@@ -282,6 +729,12 @@ def map_selection_callback(sender, app_data):
     wadfile.level = app_data
     wadfile.plot_map(sender, app_data, level=app_data)
 
+def cb_prev_map(sender, app_data):
+    wadfile.step_map(-1)
+
+def cb_next_map(sender, app_data):
+    wadfile.step_map(1)
+
 """def cb_open_wadfile(sender, app_data):
     
     print(f"Wadfile(s) selected: { app_data['file_path_name'] }")
@@ -299,6 +752,8 @@ def download_wadfile(sender, app_data):
     print(f"process_idgames_input: {user_input}")
     
     #dpg.set_value("loading_status_text", "Downloading from idgames...")
+    dpg.set_value("download_progress", 0.0)
+    dpg.set_value("status_text", "")
     
     #downloader_thread = threading.Thread(target=run_async_task, args=(user_input,))
     #downloader_thread.start()
@@ -307,82 +762,88 @@ def download_wadfile(sender, app_data):
                      daemon=True).start()
     print("below thread!")
 
+def show_download_progress(done, total):
+    """progress callback for idgames downloads, main thread only"""
+    if total:
+        dpg.set_value("download_progress", done / total)
+        dpg.configure_item("download_progress",
+                           overlay=f"{done / 1024 / 1024:.1f} / {total / 1024 / 1024:.1f}MB")
+    else:
+        dpg.configure_item("download_progress", overlay=f"{done / 1024 / 1024:.1f}MB")
+
+def show_details(content):
+    """Show a file's info dict in the Wadfile Details window, which is
+    made the first time and reused after that"""
+    if not dpg.does_item_exist("wadfile_details"):
+        with dpg.window(label="Wadfile Details",
+                        width=1000,
+                        height=1175,
+                        pos=(1350,
+                             50),
+                        tag="wadfile_details"):
+            with dpg.table(header_row=True,
+                           row_background=True,
+                           borders_innerH=True,
+                           borders_outerH=True,
+                           borders_innerV=True,
+                           borders_outerV=True,
+                           tag="wadfile_details_table"):
+                dpg.add_table_column(label="Field", width_fixed=True, width=100)
+                dpg.add_table_column(label="Value", width_fixed=False)
+    else:
+        dpg.delete_item("wadfile_details_table", children_only=True, slot=1)
+        dpg.show_item("wadfile_details")
+    dpg.set_item_label("wadfile_details", f"Wadfile Details: {content.get('filename', '')}")
+    for key, value in content.items():
+        with dpg.table_row(parent="wadfile_details_table"):
+            dpg.add_text(str(key), color=(255, 0, 0))
+            dpg.add_text(str(value), color=(255, 100, 0), wrap=500)
+    dpg.focus_item("wadfile_details")
+
+
+def open_details(wad_id):
+    """show_details() of a file that isn't cached, runs on a thread"""
+    try:
+        on_ui(show_details, metadata_cache.get(wad_id, http_client.get_client()))
+    except (httpx.HTTPError, LookupError) as e:
+        print(f"open_details: {wad_id}: {e}")
+
+
 def wadfile_downloader(user_input):
-    """get a wadfile over http from the idGames database"""
+    """get a wadfile over http from the idGames database, runs on a
+    thread so everything it shows goes through on_ui()"""
     wad_id = user_input
     print(f"wad_id: {wad_id}")
-    wad_id = user_input.split("://")[-1].strip()
+    wad_id = idgames.parse_id(user_input)
     
     try:
-        with httpx.Client(follow_redirects=True) as client:
-            api_url = f"https://doomworld.com/idgames/api/api.php?action=get&id={wad_id}&out=json"
-            print(f"Requesting: {api_url}")
-            response = client.get(api_url)
-            data = response.json()
-            
-            #viewport_width = dpg.get_viewport_client_width()
-            #viewport_height = dpg.get_viewport_client_height()
-
-            # show wadfile info ============================================
-            with dpg.window(label="Wadfile Details",
-                            width=1000,
-                            height=1175,
-                            pos=(1350,
-                                 50)):
-                with dpg.table(header_row=True,
-                               row_background=True,
-                               borders_innerH=True,
-                               borders_outerH=True,
-                               borders_innerV=True,
-                               borders_outerV=True):
-                    dpg.add_table_column(label="Field", width_fixed=True, width=100)
-                    dpg.add_table_column(label="Value", width_fixed=False)
-                    for key, value in data["content"].items():
-                        with dpg.table_row():
-                            dpg.add_text(str(key), color=(255, 0, 0))
-                            dpg.add_text(str(value), color=(255, 100, 0), wrap=500)
-                            '''dpg.add_selectable(label=str(value),
-                                               span_columns=False,
-                                               width=800)
-                                               '''
-            # ==============================================================
-            # download wadfile
-            if 'content' in data:
-                file_path = data['content']['dir'].strip('/')
-                file_name = data['content']['filename']
-                download_url = f"https://mirrors.lug.mtu.edu/idgames/{file_path}/{file_name}"
-                #download_url = f"https://doomworld.org/idgames/{file_path}/{file_name}"
-                print(f"Downloading from: {download_url}")                
-                _headers = {"User-Agent": "Mozilla/5.0 (Doom Map Scope)"}
-                r = client.get(download_url, headers=_headers)
-                r.raise_for_status() #check for 404
-                
-                print(f"wadfile_downloader: downloading wadfile...")
-                with zipfile.ZipFile(io.BytesIO(r.content)) as z:
-                    wads = [f for f in z.namelist() if f.lower().endswith('.wad')]
-                    print(f"wad is: {len(wads)}")
-                    if wads:
-                        print("WE HAVE A WAD")
-                        # IMPORTANT: Use dpg.configure_item or set_value to update 
-                        # the UI from a background thread safely.
-                        #dpg.set_value("status_text", f"Loaded: {wads[0]}")
-                        wad_data = z.read(wads[0])
-                        
-                        # Try a fix reccomended by Claude...
-                        # my way
-                        #global wadfile
-                        #wadfile = WadFile_IO()
-                        # Claude's way...
-                        wadfile.open_wadfile(sender='foo',
-                                             app_data=io.BytesIO(wad_data))
-                        print(f"Successfully loaded {wads[0]}")
+        client = http_client.get_client()
+        # a cached id doesn't need the network at all
+        content, zip_path = download_cache.get_path(wad_id)
+        if zip_path is None:
+            content = metadata_cache.get(wad_id, client)
+        
+        on_ui(show_details, content)
+
+        # download wadfile
+        if zip_path is None:
+            print(f"wadfile_downloader: downloading wadfile...")
+            zip_path = idgames.download_to_cache(wad_id, content, client,
+                                                 download_cache,
+                                                 progress=lambda *a: on_ui(show_download_progress, *a))
+        else:
+            print(f"wadfile_downloader: {wad_id} loaded from cache")
+        wad_name, wad_data = idgames.extract_wad(zip_path)
+        if wad_data:
+            print("WE HAVE A WAD")
+            # opening it cancels the map being drawn, that's the render
+            # loop's to do
+            on_ui(wadfile.open_wadfile, 'foo', wad_data)
+            print(f"Successfully loaded {wad_name}")
     except httpx.ConnectError:
-        dpg.set_value("status_text", "Error: Could not connect to idGames")
+        on_ui(dpg.set_value, "status_text", "Error: Could not connect to idGames")
     except Exception as e:
-        dpg.set_value("status_text", f"Error: {str(e)}")
-    finally:
-        pass
-        #dpg.configure_item(args[sender], enabled=True)
+        on_ui(dpg.set_value, "status_text", f"Error: {str(e)}")
 
 
 class WadFile_IO:
@@ -399,6 +860,37 @@ class WadFile_IO:
         # populatated once open_wadfile is called
         self.map_ids = None
 
+        # decoded MapGeometry per level (least recently used first), and
+        # the WAD's content hash for the on-disk geometry cache
+        self.geometries = OrderedDict()
+        self.wad_digest = None
+
+        # raster images of the whole map per (level, maxpixels), rendered
+        # ahead of time by the prefetch worker
+        self.prerendered = OrderedDict()
+
+        # bumped whenever the WAD changes, prefetch work for an older
+        # WAD is thrown away
+        self._generation = 0
+        self._cache_lock = threading.Lock()
+        self._prefetch_queue = queue.Queue()
+        self._prefetch_thread = None
+
+        # the level's geometry, what part of it is on screen, and the
+        # RGBA buffer when it was rasterized
+        self.geometry = None
+        self.map_view = None
+        self.raster_image = None
+        self._texture_data = None
+        # bumped by every redraw/clear, a raster that finishes after that
+        # is stale. Finished ones wait in _raster_done for step_raster()
+        self._raster_job = 0
+        self._raster_done = queue.SimpleQueue()
+        # vector drawing in progress, stepped by the render loop in main()
+        self.progressive = ProgressiveDraw()
+        # (dx, dy) so far while drag-panning the map, None otherwise
+        self._drag = None
+
         # set by identify_game
         self.game = None
         
@@ -407,71 +899,43 @@ class WadFile_IO:
         # is a wadfile loaded
         self._isloaded = None
 
-    def _wadfile_to_tempfile(self, app_data):
-        """Write a loaded wadfile from idGames to /tmp"""
-        
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wad") as tmp:
-            tmp.write(app_data.getvalue())
-            tmp_path = tmp.name
-            self.wadfile = WAD(tmp_path)
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-            self._isloaded = True
-
     def open_wadfile(self, sender, app_data):
         """Open a wadfile and load the map data."""
 
-        # local wadfile
+        # let go of the previous wadfile's buffer/mmap
+        if self.wadfile is not None:
+            self.close_wadfile()
+
+        # local wadfile, mmap'd and only the map lumps are indexed
         if isinstance(app_data, dict) and 'file_path_name' in app_data:
             print(f"Wadfile(s) selected: { app_data['file_path_name'] }")
-            self.wadfile = WAD(app_data['file_path_name'])
+            self.wadfile = MappedWAD(app_data['file_path_name'])
             self._isloaded = True
             dpg.set_item_label("map_viewer_id", f"Map Viewer - WAD file: { app_data['file_path_name'] }")
 
-        # downloaded wadfile
-        elif isinstance(app_data, io.BytesIO):
-            print(f"open_wadfile: io.BytesIO")
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wad") as tmp:
-                tmp.write(app_data.getvalue())
-                tmp_path = tmp.name
-                self.wadfile = WAD(tmp_path)
-
-                # SET THE TITLEBAR LABEL FOR THE MAP VIEWER HERE!
-                dpg.set_item_label("map_viewer_id", f"idGames WAD file: {get_wad_metadata()}")
-                print(f"loaded wadfile: {tmp_path}")
-                print(f'wadfile is: {self.wadfile}')
-                if os.path.exists(tmp_path):
-                    os.remove(tmp_path)
+        # downloaded wadfile, lumps are sliced straight out of the buffer
+        elif isinstance(app_data, (io.BytesIO, bytes, bytearray, memoryview)):
+            print(f"open_wadfile: {type(app_data).__name__}")
+            self.wadfile = BufferWAD(app_data)
+
+            # SET THE TITLEBAR LABEL FOR THE MAP VIEWER HERE!
+            dpg.set_item_label("map_viewer_id", f"idGames WAD file: {get_wad_metadata()}")
+            print(f'wadfile is: {self.wadfile}')
             self._isloaded = True
         
         #dpg.configure_item("show_map_btn", enabled=True)
         
-        # get the key from wadfile.maps to identify the game format
-        first_key = self.wadfile.maps.keys()[0]
-        print(f"first key is: {first_key}")
-
-        if "E" in first_key:
-            self.game = "DOOM"
-        elif "MAP" in first_key:
-            self.game = "DOOM2"
-        else:
-            self.game = "UNKNOWN/UNSUPPORTED"
+        # identify the game format from the map names, then keep the
+        # names that fit its map ID format
+        game, map_ids = wad_map_ids(self.wadfile)
+        self.game = game
         self.wadfile.game = self.game
         print(f"self.wadfile.game is: {self.game}")
-
-        #self.game = GameIdentify().identify_game(first_key)
-        # now set the regex pattern for the map IDs
-        if self.game == "DOOM":
-            mapID_format = r"E\d{1}M\d{1}"
-            print(f"Game format: {self.game}")
-        elif self.game == "DOOM2":
-            mapID_format = r"MAP\d{2}"
-            print(f"Game format: {self.game}")
-        else:
+        if game not in MAPID_FORMATS:
             print("Unsupported game format!")
             return
-        self.get_map_ids(self.wadfile.maps, mapID_format)
+        print(f"Game format: {self.game}")
+        self.map_ids = map_ids
         print(f"Map IDs: {self.map_ids}")
 
         maps_sorted = sorted(self.map_ids)
@@ -483,158 +947,347 @@ class WadFile_IO:
         else:
             with dpg.group(horizontal=True, parent="map_viewer_options"):
                 dpg.add_text("Select Map:")
+                dpg.add_button(label="<", callback=cb_prev_map)
                 dpg.add_combo(items=maps_sorted,
                               default_value=wadfile.map_ids[0],
-                              parent="map_viewer_options",
                               width=100, tag="map_selection_box",
                               callback=map_selection_callback)
+                dpg.add_button(label=">", callback=cb_next_map)
 
 
     def plot_map(self, sender, app_data, level=None):
         """Plot the map data to the map viewer window."""
         if self.wadfile:
 
-            dpg.delete_item("drawlist")
-
             if not self.level:
                 self.level = level
 
-            scales = 0
-            total  = 0
-            #alias = 3
-            alias = 0
-            border = 4
-            sptdim = 10
-            txtdim = 16
-            dmtcol = (0,   176,   0) # deathmatch green
-            blucol = (0,   112, 255) # CTF team blue
-            redcol = (240,   0,   0) # CTF team red
-            grncol = (0,   176,   0) # CTF team green
-            txtcol = (255, 216,   0) # yellow text
-            whtcol = (255, 255, 255) # white border
-
-            #self.maxpixels = 1000
-            reqscale = 0
-
-            dmspawns = False
-            ctfspawns = False
-            
-            wad_level = MapEditor(self.wadfile.maps[level])
-
-            # determine scale = map area unit / pixel
-            xmin = min([v.x for v in wad_level.vertexes])
-            xmax = max([v.x for v in wad_level.vertexes])
-            ymin = min([-v.y for v in wad_level.vertexes])
-            ymax = max([-v.y for v in wad_level.vertexes])
-            xsize = xmax - xmin
-            ysize = ymax - ymin
-            scale = (self.maxpixels - border*2) / float(max(xsize, ysize))
-
-            # tally for average scale or compare against requested scale
-            if reqscale == 0:
-                scales += scale
-                total += 1
-            else:
-                if scale > 1.0 / reqscale:
-                    scale = 1.0 / reqscale
-
-            # size up if anti-aliasing
-            ascale = scale * alias
-            aborder = border * alias
-
-            # convert all numbers to (aliased) image space
-            axmin = int(xmin * ascale)
-            aymin = int(ymin * ascale)
-            xmin  = int(xmin * scale)
-            ymin  = int(ymin * scale)
-            axsize = int(xsize * ascale) + aborder*2;
-            aysize = int(ysize * ascale) + aborder*2;
-            xsize  = int(xsize * scale) + border*2;
-            ysize  = int(ysize * scale) + border*2;
-        
-            for v in wad_level.vertexes:
-                v.x = int(v.x * scale); v.y = int(v.y * -scale)
-        
-            if dmspawns or ctfspawns:
-                for t in wad_level.things:
-                    t.x = int(t.x * ascale); t.y = int(t.y * -ascale)
-
-            # draw 1s lines after 2s lines so 1s lines are never obscured
-            wad_level.linedefs.sort(key=lambda a: not a.two_sided)
-
-
-            with dpg.drawlist(width=xsize, height=ysize, id="drawlist", parent="map_viewer_id"):
-                    
-
-                # draw all lines from their vertexes
-                for line in wad_level.linedefs:
-                    p1x = wad_level.vertexes[line.vx_a].x - xmin + border
-                    p1y = wad_level.vertexes[line.vx_a].y - ymin + border
-                    p2x = wad_level.vertexes[line.vx_b].x - xmin + border
-                    p2y = wad_level.vertexes[line.vx_b].y - ymin + border
-                    color = (180, 40, 0)
-                    if line.two_sided:   color = (120, 85, 0)
-                    #if line.special:    color = (220, 130, 50)
-                    #if line.id > defid: color = (200, 110, 30)
-
-                    # draw multiple lines to simulate thickness
-                    """
-                    draw.line((p1x, p1y,   p2x, p2y),   fill=color)
-                    draw.line((p1x+1, p1y, p2x+1, p2y), fill=color)
-                    draw.line((p1x-1, p1y, p2x-1, p2y), fill=color)
-                    draw.line((p1x, p1y+1, p2x, p2y+1), fill=color)
-                    draw.line((p1x, p1y-1, p2x, p2y-1), fill=color)
-                    """
-
-                    if line.two_sided:
-                        thickness = 1
-                    else:
-                        thickness = 1.5
-
-                    dpg.draw_line((p1x, p1y), (p2x, p2y), color=color, thickness=thickness)
-                    #dpg.render_dearpygui_frame()
-                    #print("Drawing line: {}", {line.front})
-
-                    # DON'T DELETE THIS!===================
-                    delay = dpg.get_value("delay_slider")
-                    time.sleep(float(delay))
-                    # =====================================
-                    # scale up to anti-alias
-                    """
-                    if alias > 1:
-                        im = im.resize((axsize, aysize))
-                        del draw
-                        draw = ImageDraw.Draw(im)
-                        """
-
-                    # scale down to anti-alias
-                    """
-                    if alias > 1:
-                        im = im.resize((xsize, ysize), Image.ANTIALIAS)
-                    """
+            self.geometry = self.get_geometry(level)
+
+            # a fresh view of the whole map at the Map Scale size
+            self.map_view = MapView(self.geometry, self.maxpixels, MAP_BORDER)
+            self.redraw()
+
+            # get the maps either side of this one ready in the background
+            self.prefetch_neighbours(level)
 
         if not self.wadfile:
             print("load a wad first")
 
+    def redraw(self):
+        """Draw what the current map view shows.
+
+        Zoomed out, the map is drawn from the LOD level that matches the
+        scale. Zoomed in, only the linedefs whose boxes intersect the
+        visible rectangle (looked up in the geometry's SegmentGrid) are
+        submitted.
+        """
+        if not self.map_view:
+            return
+        geometry, view = self.geometry, self.map_view
+        self.cancel_drawing()
+        self.raster_image = None
+
+        level = geometry.lod_for_scale(view.scale)
+        lines = None
+        if not level and not view.shows_everything():
+            lines = geometry.grid().query(*view.visible_rect(VIEW_MARGIN))
+
+        if dpg.get_value("render_mode") == "Raster":
+            self._plot_raster(geometry, view, lines, level)
+        else:
+            self._plot_vector(geometry, view, lines, level)
+
+    def _plot_vector(self, geometry, view, lines, level):
+        """Draw the map as DearPyGui draw items"""
+        sx, sy = view.to_screen(geometry.vx, -geometry.vy)
+        vertexes = np.column_stack((sx, sy)).tolist()
+
+        if lines is None:
+            style_chains = geometry.lod(level)
+        else:
+            # chain up just the visible linedefs
+            styles = geometry.styles()[lines]
+            style_chains = {}
+            for style in VIEWER_DRAW_ORDER:
+                subset = lines[styles == style]
+                style_chains[style] = chain_segments(geometry.v1[subset], geometry.v2[subset])
+
+        # one layer per linedef style, each style's linedefs joined into
+        # polylines so a wall is one draw item instead of one item per
+        # linedef. 1s lines go last so they're never obscured
+        items = []
+        dpg.delete_item("drawlist")
+        with dpg.drawlist(width=view.width, height=view.height, id="drawlist", parent="map_viewer_id"):
+            for style in VIEWER_DRAW_ORDER:
+                chains = style_chains.get(style)
+                if not chains:
+                    continue
+                color, thickness = VIEWER_STYLES[style]
+                layer = dpg.add_draw_layer(tag=f"drawlist_layer_{style}")
+                for chain in chains:
+                    points = [vertexes[v] for v in chain.tolist()]
+                    items.append((len(chain) - 1, dict(points=points, color=color,
+                                                       thickness=thickness, parent=layer)))
+
+        # the polylines are handed to the render loop a frame's worth at a
+        # time, so neither a big map nor the reveal delay blocks the UI
+        # DON'T DELETE THIS!===================
+        delay = float(dpg.get_value("delay_slider"))
+        # =====================================
+        started = time.perf_counter()
+        self.progressive.start(dpg.draw_polyline, items, delay,
+                               on_done=lambda: print(f"_plot_vector: {geometry.name} drawn in "
+                                                     f"{time.perf_counter() - started:.3f}s"))
+
+    def _plot_raster(self, geometry, view, lines, level):
+        """Rasterize the map on a worker thread and show it as one texture"""
+        job = self._raster_job
+        generation, maxpixels = self._generation, self.maxpixels
+
+        # the whole map may already be rendered by the prefetch worker
+        if not view.zoomed:
+            with self._cache_lock:
+                image = self.prerendered.get((geometry.name, self.maxpixels))
+            if image is not None and image.shape[:2] == (view.height, view.width):
+                self._show_raster(image)
+                return
+
+        def worker():
+            t = time.perf_counter()
+            image = render_view(geometry, view, lines, level)
+            print(f"_plot_raster: {geometry.name} (LOD {level}) rasterized in {time.perf_counter() - t:.3f}s")
+            if not view.zoomed:
+                self._keep_prerendered(geometry.name, maxpixels, image, generation)
+            # shown by the render loop, the texture can't be touched here
+            self._raster_done.put((job, image))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def step_raster(self):
+        """Show a finished raster unless the view changed since it was
+        started, main thread only (main() calls it every frame)"""
+        while True:
+            try:
+                job, image = self._raster_done.get_nowait()
+            except queue.Empty:
+                return
+            if job == self._raster_job:
+                self._show_raster(image)
+
+    def cancel_drawing(self):
+        """Stop the vector draw in progress and make any raster still
+        being rendered stale"""
+        self.progressive.cancel()
+        self._raster_job += 1
+
+    def _show_raster(self, image):
+        """Upload an RGBA image as the map texture and draw it"""
+        height, width = image.shape[:2]
+        data = (image.astype(np.float32) / 255.0).reshape(-1)
+        self.raster_image = image
+
+        # same size (zoom/pan), just swap the pixels
+        if (dpg.does_item_exist("map_texture") and dpg.does_item_exist("drawlist")
+                and self._texture_data is not None and len(self._texture_data) == len(data)):
+            self._texture_data[:] = data
+            dpg.set_value("map_texture", self._texture_data)
+            return
+
+        # raw textures use our buffer as is, so keep a reference to it
+        self._texture_data = data
+        dpg.delete_item("drawlist")
+        if dpg.does_item_exist("map_texture"):
+            dpg.delete_item("map_texture")
+        dpg.add_raw_texture(width, height, self._texture_data,
+                            format=dpg.mvFormat_Float_rgba,
+                            tag="map_texture", parent="map_texture_registry")
+        with dpg.drawlist(width=width, height=height, id="drawlist", parent="map_viewer_id"):
+            dpg.draw_image("map_texture", (0, 0), (width, height))
+
+    def zoom_view(self, factor, sx, sy):
+        """Zoom the map view around canvas point (sx, sy)"""
+        if self.map_view:
+            self.map_view.zoom_at(factor, sx, sy)
+            self.redraw()
+
+    def pan_view(self, dx, dy):
+        """Pan the map view by (dx, dy) canvas pixels"""
+        if self.map_view:
+            self.map_view.pan_by(dx, dy)
+            self.redraw()
+
+    def reset_view(self):
+        """Show the whole map again"""
+        if self.map_view:
+            self.map_view.reset()
+            self.redraw()
+
+    def save_view(self, sender, app_data):
+        """Save the current view as a PNG (file dialog callback)"""
+        if not self.map_view:
+            print("save_view: nothing to save, plot a map first")
+            return
+        path = app_data['file_path_name']
+        if not path.lower().endswith(".png"):
+            path += ".png"
+
+        # the raster buffer is already there in raster mode, otherwise
+        # render one with the same rules as the vector view
+        image = self.raster_image
+        if image is None:
+            level = self.geometry.lod_for_scale(self.map_view.scale)
+            lines = None
+            if not level and not self.map_view.shows_everything():
+                lines = self.geometry.grid().query(*self.map_view.visible_rect(VIEW_MARGIN))
+            image = render_view(self.geometry, self.map_view, lines, level)
+        Image.fromarray(image, 'RGBA').save(path)
+        print(f"save_view: saved {path}")
+
+    def export_atlas(self, sender, app_data):
+        """Write an overview sheet of every map in the WAD (file dialog
+        callback), drawn by worker processes in the background"""
+        wadpath = getattr(self.wadfile, 'path', None)
+        if not wadpath:
+            print("export_atlas: only WADs opened from a file can be exported")
+            return
+        path = app_data['file_path_name']
+        if not path.lower().endswith(".png"):
+            path += ".png"
+
+        def worker():
+            t = time.perf_counter()
+            maps, width, height = atlas.export_atlas(wadpath, path, self.map_ids or ("*",))
+            print(f"export_atlas: {maps} maps, {width} x {height} written to {path} "
+                  f"in {time.perf_counter() - t:.2f}s")
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def get_geometry(self, level):
+        """Get a level's MapGeometry, from memory, the disk cache or by
+        decoding the lumps (in that order). Safe to call from the
+        prefetch worker."""
+        with self._cache_lock:
+            wad, generation, digest = self.wadfile, self._generation, self.wad_digest
+            geometry = self.geometries.get(level)
+            if geometry is not None:
+                self.geometries.move_to_end(level)
+                return geometry
+
+        if digest is None:
+            digest = geometry_cache.wad_digest(wad)
+
+        geometry = geometry_cache.load(digest, level)
+        if geometry is None:
+            geometry = MapGeometry.from_wad(wad, level)
+            geometry_cache.store(digest, geometry)
+        else:
+            print(f"get_geometry: {level} loaded from cache")
+
+        with self._cache_lock:
+            # don't keep it if another WAD was opened meanwhile
+            if generation == self._generation:
+                self.wad_digest = digest
+                self.geometries[level] = geometry
+                while len(self.geometries) > GEOMETRY_CACHE_MAPS:
+                    self.geometries.popitem(last=False)
+        return geometry
+
+    def neighbour_maps(self, level):
+        """The maps before and after `level` in map selection order"""
+        if not self.map_ids or level not in self.map_ids:
+            return []
+        maps = sorted(self.map_ids)
+        i = maps.index(level)
+        return [maps[j] for j in (i - 1, i + 1) if 0 <= j < len(maps)]
+
+    def step_map(self, step):
+        """Show the previous (-1) or next (1) map"""
+        if not self.wadfile or not self.map_ids:
+            return
+        maps = sorted(self.map_ids)
+        current = self.level if self.level in maps else maps[0]
+        i = min(max(maps.index(current) + step, 0), len(maps) - 1)
+        if maps[i] == current and self.geometry is not None:
+            return
+        self.level = maps[i]
+        dpg.set_value("map_selection_box", self.level)
+        self.plot_map(None, self.level, level=self.level)
+
+    def prefetch_neighbours(self, level):
+        """Queue the maps next to `level` for decoding (and rendering when
+        in Raster mode) on the prefetch worker"""
+        if self._prefetch_thread is None:
+            self._prefetch_thread = threading.Thread(target=self._prefetch_worker, daemon=True)
+            self._prefetch_thread.start()
+
+        # only the latest neighbours are worth doing
+        try:
+            while True:
+                self._prefetch_queue.get_nowait()
+        except queue.Empty:
+            pass
+        raster = dpg.get_value("render_mode") == "Raster"
+        for name in self.neighbour_maps(level):
+            self._prefetch_queue.put((self._generation, name, self.maxpixels, raster))
+
+    def _keep_prerendered(self, name, maxpixels, image, generation):
+        """Remember the raster image of a whole map at a Map Scale size"""
+        with self._cache_lock:
+            if generation != self._generation:
+                return
+            self.prerendered[(name, maxpixels)] = image
+            while len(self.prerendered) > PRERENDER_CACHE_MAPS:
+                self.prerendered.popitem(last=False)
+
+    def _prefetch_worker(self):
+        while True:
+            generation, name, maxpixels, raster = self._prefetch_queue.get()
+            if generation != self._generation:
+                continue
+            try:
+                t = time.perf_counter()
+                geometry = self.get_geometry(name)
+
+                # the chains the first draw of this map is going to need
+                view = MapView(geometry, maxpixels, MAP_BORDER)
+                level = geometry.lod_for_scale(view.scale)
+                geometry.lod(level)
+
+                if raster and (name, maxpixels) not in self.prerendered:
+                    image = render_view(geometry, view, level=level)
+                    self._keep_prerendered(name, maxpixels, image, generation)
+                print(f"_prefetch_worker: {name} ready in {time.perf_counter() - t:.3f}s")
+            except Exception as e:
+                print(f"_prefetch_worker: {name} failed: {e}")
+
     def get_map(self, map_name):
         return self.wadfile.maps[map_name]
 
-    def get_map_ids(self, map_dict, mapID_format):
-        """Get the map names from the WAD file."""
-        def find_maps(map_dict, mapID_format):
-            regex = re.compile(mapID_format)
-            matched_keys = [key for key in map_dict.keys() if regex.match(key)]
-            return matched_keys
-        self.map_ids = find_maps(map_dict, mapID_format)
-
     def get_map_data(self):
         return self.map_data
 
     def close_wadfile(self):
-        self.wadfile = None
+        self.cancel_drawing()
+        with self._cache_lock:
+            self._generation += 1
+            if isinstance(self.wadfile, BufferWAD):
+                self.wadfile.release()
+            self.wadfile = None
+            self.geometries = OrderedDict()
+            self.prerendered = OrderedDict()
+            self.wad_digest = None
+        self.level = None
+        self.geometry = None
+        self.map_view = None
         self.map_names = []
         self.map_data = []
 
+geometry_cache = GeometryCache()
+download_cache = DownloadCache()
+listing_cache = ListingCache()
+archive_index = ArchiveIndex()
+metadata_cache = MetadataCache()
 wadfile = WadFile_IO()
 
 class GameIdentify:
@@ -674,6 +1327,9 @@ def main():
     
 
     dpg.create_context()
+    # callbacks are run by our render loop, on the main thread, so they
+    # can't race ProgressiveDraw.step() or the fetchers' step()
+    dpg.configure_app(manual_callback_management=True)
 
     #TODO: dynamically size viewport according to host resolution
     dpg.create_viewport(title="DOOM Map Scope", width=2400, height=1250)
@@ -693,9 +1349,27 @@ def main():
         #dpg.add_file_extension(".deh")
         #dpg.add_file_extension(".bex")
 
+    with dpg.file_dialog(directory_selector=False, show=False, callback=wadfile.save_view, id="save_view_dialog",
+                         default_filename="map", width=800, height=400):
+        dpg.add_file_extension(".png")
+
+    with dpg.file_dialog(directory_selector=False, show=False, callback=wadfile.export_atlas, id="atlas_dialog",
+                         default_filename="atlas", width=800, height=400):
+        dpg.add_file_extension(".png")
+
+    with dpg.texture_registry(tag="map_texture_registry"):
+        pass
+
     with dpg.window(label="UI Scaling", width=200, height=100, id="scale_slider_window", show=False):
         dpg.add_slider_float(label="Scale", default_value=1.0, min_value=0.5, max_value=10.0, callback=cb_scale_slider)
 
+    # mouse wheel zoom and left-drag pan in the map viewer
+    with dpg.handler_registry():
+        dpg.add_mouse_wheel_handler(callback=cb_map_wheel)
+        dpg.add_mouse_click_handler(button=dpg.mvMouseButton_Left, callback=cb_map_mouse_down)
+        dpg.add_mouse_drag_handler(button=dpg.mvMouseButton_Left, threshold=1.0, callback=cb_map_drag)
+        dpg.add_mouse_release_handler(button=dpg.mvMouseButton_Left, callback=cb_map_mouse_up)
+
     with dpg.viewport_menu_bar():
         dpg.add_menu_item(label="UI Scaling...", callback= lambda: dpg.show_item("scale_slider_window"))
 
@@ -709,6 +1383,7 @@ def main():
                     #dpg.add_text("Loading wadfile...", tag="loading_status_text", color=(200, 200, 200))
 
                     dpg.add_button(label="Clear Map", callback=cb_remove_drawlist)
+                    dpg.add_button(label="Reset View", callback=lambda: wadfile.reset_view())
                     #dpg.add_slider_float(label="delay", default_value=0.000, min_value=0.000, max_value=0.100, tag="delay_slider", width=200)
                     #dpg.add_slider_int(label="Map Scale", default_value=1000, min_value=250, max_value=2500, callback=cb_mapscale_slider, clamped=True)
                 #with dpg.group(horizontal=True):
@@ -716,10 +1391,15 @@ def main():
                     dpg.add_combo(width=100, items=["0.000", "0.001", "0.005", "0.010", "0.050", "0.100"], default_value="0.000", tag="delay_slider")
                     dpg.add_text("Map Scale:")
                     dpg.add_combo(width=100, items=["100", "75", "50", "25", "0"], default_value="Scale 50", callback=combo_callback)
+                    dpg.add_text("Render:")
+                    dpg.add_combo(width=100, items=["Vector", "Raster"], default_value="Vector", tag="render_mode",
+                                  callback=lambda: wadfile.plot_map(None, None, level=wadfile.level) if wadfile.level else None)
+                    dpg.add_button(label="Save View...", callback=lambda: dpg.show_item("save_view_dialog"))
         with dpg.menu_bar():
             with dpg.menu(label="File"):
                 dpg.add_menu_item(label="Open a WAD file...", callback= lambda: dpg.show_item("file_dialog_id"))
                 dpg.add_menu_item(label="Open a wadfile from the idgames database...", callback=lambda: dpg.show_item("idgames_wad_id"))
+                dpg.add_menu_item(label="Export map atlas...", callback=lambda: dpg.show_item("atlas_dialog"))
 
     with dpg.window(label="Enter the 'idgames://123' ID to open",
                     modal=True,
@@ -728,6 +1408,8 @@ def main():
                     no_title_bar=False):
         dpg.add_text("idgames id URL")
         dpg.add_input_text(tag="user_input_field", hint="idgames address...")
+        dpg.add_progress_bar(tag="download_progress", default_value=0.0, width=-1)
+        dpg.add_text("", tag="status_text")
         with dpg.group(horizontal=True):
             dpg.add_button(label="OK",
                            width=75,
@@ -739,10 +1421,24 @@ def main():
 
     dpg.setup_dearpygui()
 
-    idgames_browser = IdGamesBrowser("https://mirrors.lug.mtu.edu/idgames/")
+    # rank the mirrors while the window comes up
+    mirrors.registry.probe_in_background()
+    idgames_browser = IdGamesBrowser()
 
     dpg.show_viewport()
-    dpg.start_dearpygui()
+
+    # our own render loop so the map can be drawn a bit every frame
+    while dpg.is_dearpygui_running():
+        dpg.run_callbacks(dpg.get_callback_queue())
+        step_ui()
+        wadfile.progressive.step()
+        wadfile.step_raster()
+        idgames_browser.fetcher.step()
+        idgames_browser.prefetcher.step()
+        dpg.render_dearpygui_frame()
+    idgames_browser.fetcher.close()
+    idgames_browser.prefetcher.close()
+    http_client.close_client()
     dpg.destroy_context()
 
 
@@ -4,19 +4,23 @@
 # updated  by Frans P. de Vries, 2016-04-26/2018-09-05/2018-10-04
 # utilized by doom_map_scope InZane84 1/13/2025
 
-import sys, getopt
-from omg.wad import WAD
+import sys, os, getopt, time, math
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-
-verbose   = False
-dmspawns  = False
-ctfspawns = False
-scales = 0
-total  = 0
+from map_geometry import MapGeometry
+import map_raster
+from wadfile_buffer import MappedWAD
 
 # configuration
 alias  = 3
 border = 4
+# line pen width, 2 is the 5 pixel '+' (same pixels the 'pillow' engine
+# gets out of five offset draw.line calls)
+linewidth = 2
+ENGINES = ("raster", "pillow")
 
 # spot & text dimensions
 sptdim = 10
@@ -28,194 +32,279 @@ redcol = (240,   0,   0) # CTF team red
 grncol = (0,   176,   0) # CTF team green
 txtcol = (255, 216,   0) # yellow text
 whtcol = (255, 255, 255) # white border
+# line colors, indexed by map_geometry STYLE_*
+linecolors = np.array([(0,     0,   0),  # 1-sided
+                       (144, 144, 144),  # 2-sided
+                       (220, 130,  50),  # special
+                       (200, 110,  30)], # tagged
+                      dtype=np.uint8)
+# same colors plus the white background as an image palette
+linepalette = np.vstack((linecolors, [(255, 255, 255)])).astype(np.uint8).tobytes()
+
+# thing position scaled to image space
+Thing = namedtuple('Thing', 'x y type angle')
+
+# command line flags, passed along to every drawmap call
+Options = namedtuple('Options', 'verbose dmspawns ctfspawns engine')
+Options.__new__.__defaults__ = (False, False, False, "raster")
+
+# one map to draw, and what came out of drawing it
+Job = namedtuple('Job', 'wadpath name filename maxpixels reqscale options')
+Result = namedtuple('Result', 'wadpath name filename scale xsize ysize seconds')
+
+
+@lru_cache(maxsize=None)
+def get_font(size):
+    """Arial, or Pillow's own font where there's no arial.ttf"""
+    try:
+        return ImageFont.truetype('arial.ttf', size)
+    except OSError:
+        return ImageFont.load_default(size)
 
+@lru_cache(maxsize=256)
+def textsize(font, text):
+    """(width, height) of text drawn at the origin, what font.getsize gave"""
+    left, top, right, bottom = font.getbbox(text)
+    return right, bottom
 
-def drawmap(wad, name, filename, maxpixels, reqscale):
-    global scales, total
-    try:
-        edit = UMapEditor(wad.udmfmaps[name])
-    except KeyError:
-        edit = UMapEditor(wad.maps[name])
 
-    # set default linedef id
-    if edit.namespace.lower() in ('zdoom', 'hexen'):
-        defid = -1
-    else:
-        defid = 0
-
-    # determine scale = map area unit / pixel
-    xmin = min([v.x for v in edit.vertexes])
-    xmax = max([v.x for v in edit.vertexes])
-    ymin = min([-v.y for v in edit.vertexes])
-    ymax = max([-v.y for v in edit.vertexes])
-    xsize = xmax - xmin
-    ysize = ymax - ymin
-    scale = (maxpixels - border*2) / float(max(xsize, ysize))
-
-    # tally for average scale or compare against requested scale
-    if reqscale == 0:
-        scales += scale
-        total += 1
-    else:
-        if scale > 1.0 / reqscale:
-            scale = 1.0 / reqscale
+@lru_cache(maxsize=8)
+def open_wad(path):
+    """mmap'd WAD, kept open for the next map of the same WAD"""
+    return MappedWAD(path)
+
+
+def drawmap(wad, name, filename, maxpixels, reqscale, options=Options()):
+    """Draw one map to an image file, returns (scale, xsize, ysize)"""
+    im, scale = rendermap(wad, name, maxpixels, reqscale, options)
+    im.save(filename)
+    return scale, im.size[0], im.size[1]
+
+def rendermap(wad, name, maxpixels, reqscale, options=Options(), geom=None):
+    """Draw one map, returns (PIL image, scale). Pass the map's MapGeometry
+    as geom when it's already decoded."""
+    if geom is None:
+        geom = MapGeometry.from_wad(wad, name)
+
+    # don't use anti-aliasing without spawn spots
+    aliasing = alias if options.dmspawns or options.ctfspawns else 1
+
+    # determine scale = map area unit / pixel, capped by the requested scale
+    scale = geom.fit_scale(maxpixels, border, reqscale)
 
     # size up if anti-aliasing
-    ascale = scale * alias
-    aborder = border * alias
+    ascale = scale * aliasing
+    aborder = border * aliasing
 
     # convert all numbers to (aliased) image space
+    xmin, xmax, ymin, ymax = geom.bounds()
     axmin = int(xmin * ascale)
     aymin = int(ymin * ascale)
-    xmin  = int(xmin * scale)
-    ymin  = int(ymin * scale)
-    axsize = int(xsize * ascale) + aborder*2;
-    aysize = int(ysize * ascale) + aborder*2;
-    xsize  = int(xsize * scale) + border*2;
-    ysize  = int(ysize * scale) + border*2;
-    for v in edit.vertexes:
-        v.x = int(v.x * scale); v.y = int(v.y * -scale)
-    if dmspawns or ctfspawns:
-        for t in edit.things:
-            t.x = int(t.x * ascale); t.y = int(t.y * -ascale)
-
-    # initiate new map image
-    if verbose:
-        flag = ""
-        if xsize * ysize > 12500000:
-            flag = " !"
-        print("\t%0.2f: %d x %d%s" % (1.0 / scale, xsize, ysize, flag))
-
-    im = Image.new('RGB', (xsize, ysize), (255,255,255))
-    draw = ImageDraw.Draw(im)
-
+    axsize = int((xmax - xmin) * ascale) + aborder*2
+    aysize = int((ymax - ymin) * ascale) + aborder*2
     # draw 1s lines after 2s lines so 1s lines are never obscured
-    edit.linedefs.sort(key=lambda a: not a.twosided)
+    order = geom.draw_order()
+    x1, y1, x2, y2, xsize, ysize = geom.segments(scale, border, order)
+    styles = geom.styles()[order]
+    colors = linecolors[styles]
+    if options.dmspawns or options.ctfspawns:
+        tx, ty = geom.things_scaled(ascale)
+        things = [Thing(*t) for t in zip(tx.tolist(), ty.tolist(),
+                                         geom.thing_type.tolist(),
+                                         geom.thing_angle.tolist())]
 
     # draw all lines from their vertexes
-    for line in edit.linedefs:
-        p1x = edit.vertexes[line.v1].x - xmin + border
-        p1y = edit.vertexes[line.v1].y - ymin + border
-        p2x = edit.vertexes[line.v2].x - xmin + border
-        p2y = edit.vertexes[line.v2].y - ymin + border
-        color = (0, 0, 0)
-        if line.twosided:   color = (144, 144, 144)
-        if line.special:    color = (220, 130, 50)
-        if line.id > defid: color = (200, 110, 30)
-
-        # draw multiple lines to simulate thickness
-        draw.line((p1x, p1y,   p2x, p2y),   fill=color)
-        draw.line((p1x+1, p1y, p2x+1, p2y), fill=color)
-        draw.line((p1x-1, p1y, p2x-1, p2y), fill=color)
-        draw.line((p1x, p1y+1, p2x, p2y+1), fill=color)
-        draw.line((p1x, p1y-1, p2x, p2y-1), fill=color)
+    if options.engine == "pillow":
+        im = Image.new('RGB', (xsize, ysize), (255,255,255))
+        draw = ImageDraw.Draw(im)
+        for p1x, p1y, p2x, p2y, color in zip(x1.tolist(), y1.tolist(),
+                                             x2.tolist(), y2.tolist(),
+                                             map(tuple, colors.tolist())):
+            # draw multiple lines to simulate thickness
+            draw.line((p1x, p1y,   p2x, p2y),   fill=color)
+            draw.line((p1x+1, p1y, p2x+1, p2y), fill=color)
+            draw.line((p1x-1, p1y, p2x-1, p2y), fill=color)
+            draw.line((p1x, p1y+1, p2x, p2y+1), fill=color)
+            draw.line((p1x, p1y-1, p2x, p2y-1), fill=color)
+    else:
+        # every linedef in one vectorized pass, in the same order, into a
+        # palette image (one byte a pixel, quicker to fill and to save)
+        pixels = np.full((ysize, xsize), len(linecolors), dtype=np.uint8)
+        map_raster.draw_segments(pixels, x1, y1, x2, y2, styles, linewidth)
+        im = Image.fromarray(pixels, 'P')
+        im.putpalette(linepalette)
+        # spawn spots are drawn in full color
+        if aliasing > 1:
+            im = im.convert('RGB')
+        draw = ImageDraw.Draw(im)
 
     # scale up to anti-alias
-    if alias > 1:
+    if aliasing > 1:
         im = im.resize((axsize, aysize))
-        del draw
-        draw = ImageDraw.Draw(im)
 
     # draw DM spawns
-    if dmspawns:
-        drawspawns(edit, draw, axmin, aymin, aborder, 11, dmtcol, False)
+    if options.dmspawns:
+        drawspawns(things, im, axmin, aymin, aborder, 11, dmtcol, False)
     # draw CTF spawns & flags
-    if ctfspawns:
-        drawspawns(edit, draw, axmin, aymin, aborder, 5080, blucol, False) # blue spawn
-        drawspawns(edit, draw, axmin, aymin, aborder, 5130, blucol, True)  # blue flag
-        drawspawns(edit, draw, axmin, aymin, aborder, 5081, redcol, False) # red spawn
-        drawspawns(edit, draw, axmin, aymin, aborder, 5131, redcol, True)  # red flag
-        drawspawns(edit, draw, axmin, aymin, aborder, 5083, grncol, False) # green spawn
-        drawspawns(edit, draw, axmin, aymin, aborder, 5133, grncol, True)  # green flag
+    if options.ctfspawns:
+        drawspawns(things, im, axmin, aymin, aborder, 5080, blucol, False) # blue spawn
+        drawspawns(things, im, axmin, aymin, aborder, 5130, blucol, True)  # blue flag
+        drawspawns(things, im, axmin, aymin, aborder, 5081, redcol, False) # red spawn
+        drawspawns(things, im, axmin, aymin, aborder, 5131, redcol, True)  # red flag
+        drawspawns(things, im, axmin, aymin, aborder, 5083, grncol, False) # green spawn
+        drawspawns(things, im, axmin, aymin, aborder, 5133, grncol, True)  # green flag
 
     # scale down to anti-alias
-    if alias > 1:
-        im = im.resize((xsize, ysize), Image.ANTIALIAS)
-
-    del draw
-    im.save(filename)
+    if aliasing > 1:
+        im = im.resize((xsize, ysize), Image.LANCZOS)
+
+    return im, scale
+
+def drawjob(job):
+    """Draw a Job, runs in the worker processes"""
+    t = time.perf_counter()
+    scale, xsize, ysize = drawmap(open_wad(job.wadpath), job.name, job.filename,
+                                  job.maxpixels, job.reqscale, job.options)
+    return Result(job.wadpath, job.name, job.filename, scale, xsize, ysize,
+                  time.perf_counter() - t)
+
+def findjobs(wadpaths, patterns, maxpixels, reqscale, options, outdir="."):
+    """A Job for every map of every WAD matching any of the patterns.
+    With more than one WAD the images are prefixed with the WAD's name."""
+    jobs = []
+    for path in wadpaths:
+        wad = MappedWAD(path)
+        prefix = ""
+        if len(wadpaths) > 1:
+            prefix = os.path.splitext(os.path.basename(path))[0] + "_"
+        names = []
+        for pattern in patterns:
+            for name in wad.maps.find(pattern) + wad.udmfmaps.find(pattern):
+                if name not in names:
+                    names.append(name)
+        for name in names:
+            filename = os.path.join(outdir, prefix + name + ".png")
+            jobs.append(Job(path, name, filename, maxpixels, reqscale, options))
+        wad.release()
+    return jobs
+
+def drawbatch(jobs, workers=None):
+    """Draw the jobs over a pool of `workers` processes (all cores when
+    None, in this process when 1). Yields a Result per map as it's done."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        for job in jobs:
+            yield drawjob(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(drawjob, job) for job in jobs]
+        for future in as_completed(futures):
+            yield future.result()
 
 def plotmap(wad, name, maxpixels, reqscale):
     """ Draw a map to a DearPyGui window"""
     pass
 
-def drawspawns(edit, draw, xmin, ymin, border, thtype, sptcol, flag):
+@lru_cache(maxsize=1024)
+def spawnsprite(sptcol, angle, wide, flag):
+    """One spawn spot (without its label) drawn on a transparent sprite,
+    centered on (half, half). Returns (sprite, half). Spots only differ by
+    color, angle, size and flag so each is drawn once and then pasted at
+    every spawn."""
+    # size up if anti-aliasing
+    radius = sptdim * alias
+    # larger spot for 2 digits
+    if wide:
+        radius *= 1.3
+    # room for the arrow/border arcs
+    half = int(math.ceil(radius)) + 16
+    sprite = Image.new('RGBA', (half*2 + 1, half*2 + 1), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+
+    # compute bounding box
+    p1x = half - radius
+    p1y = half - radius
+    p2x = half + radius
+    p2y = half + radius
+
+    # draw spawn spot
+    draw.ellipse((p1x, p1y, p2x, p2y), outline=sptcol, fill=sptcol)
+
+    if not flag:
+        # draw arrow at thing angle
+        draw.arc((p1x-12, p1y-12, p2x+12, p2y+12), 360-angle- 2, 360-angle+ 2, fill=sptcol)
+        draw.arc((p1x-11, p1y-11, p2x+11, p2y+11), 360-angle- 4, 360-angle+ 4, fill=sptcol)
+        draw.arc((p1x-10, p1y-10, p2x+10, p2y+10), 360-angle- 6, 360-angle+ 6, fill=sptcol)
+        draw.arc((p1x- 9, p1y- 9, p2x+ 9, p2y+ 9), 360-angle- 8, 360-angle+ 8, fill=sptcol)
+        draw.arc((p1x- 8, p1y- 8, p2x+ 8, p2y+ 8), 360-angle-10, 360-angle+10, fill=sptcol)
+        draw.arc((p1x- 7, p1y- 7, p2x+ 7, p2y+ 7), 360-angle-11, 360-angle+11, fill=sptcol)
+        draw.arc((p1x- 6, p1y- 6, p2x+ 6, p2y+ 6), 360-angle-12, 360-angle+12, fill=sptcol)
+        draw.arc((p1x- 5, p1y- 5, p2x+ 5, p2y+ 5), 360-angle-13, 360-angle+13, fill=sptcol)
+        draw.arc((p1x- 4, p1y- 4, p2x+ 4, p2y+ 4), 360-angle-14, 360-angle+14, fill=sptcol)
+        draw.arc((p1x- 2, p1y- 2, p2x+ 2, p2y+ 2), 360-angle-15, 360-angle+15, fill=sptcol)
+
+        # draw border around arrow
+        draw.arc((p1x-15, p1y-15, p2x+15, p2y+15), 360-angle- 3, 360-angle+ 3, fill=whtcol)
+        draw.arc((p1x-14, p1y-14, p2x+14, p2y+14), 360-angle- 4, 360-angle+ 4, fill=whtcol)
+        draw.arc((p1x-13, p1y-13, p2x+13, p2y+13), 360-angle- 5, 360-angle+ 5, fill=whtcol)
+        draw.arc((p1x-12, p1y-12, p2x+12, p2y+12), 360-angle+ 3, 360-angle+ 7, fill=whtcol)
+        draw.arc((p1x-12, p1y-12, p2x+12, p2y+12), 360-angle- 7, 360-angle- 3, fill=whtcol)
+        draw.arc((p1x-11, p1y-11, p2x+11, p2y+11), 360-angle+ 5, 360-angle+ 9, fill=whtcol)
+        draw.arc((p1x-11, p1y-11, p2x+11, p2y+11), 360-angle- 9, 360-angle- 5, fill=whtcol)
+        draw.arc((p1x-10, p1y-10, p2x+10, p2y+10), 360-angle+ 7, 360-angle+11, fill=whtcol)
+        draw.arc((p1x-10, p1y-10, p2x+10, p2y+10), 360-angle-11, 360-angle- 7, fill=whtcol)
+        draw.arc((p1x- 9, p1y- 9, p2x+ 9, p2y+ 9), 360-angle+ 9, 360-angle+13, fill=whtcol)
+        draw.arc((p1x- 9, p1y- 9, p2x+ 9, p2y+ 9), 360-angle-13, 360-angle- 9, fill=whtcol)
+        draw.arc((p1x- 8, p1y- 8, p2x+ 8, p2y+ 8), 360-angle+11, 360-angle+15, fill=whtcol)
+        draw.arc((p1x- 8, p1y- 8, p2x+ 8, p2y+ 8), 360-angle-15, 360-angle-11, fill=whtcol)
+        draw.arc((p1x- 7, p1y- 7, p2x+ 7, p2y+ 7), 360-angle+12, 360-angle+16, fill=whtcol)
+        draw.arc((p1x- 7, p1y- 7, p2x+ 7, p2y+ 7), 360-angle-16, 360-angle-12, fill=whtcol)
+
+        # draw border around rest of spot
+        draw.arc((p1x- 6, p1y- 6, p2x+ 6, p2y+ 6), 360-angle+12, 360-angle-12, fill=whtcol)
+        draw.arc((p1x- 4, p1y- 4, p2x+ 4, p2y+ 4), 360-angle+14, 360-angle-14, fill=whtcol)
+        draw.arc((p1x- 2, p1y- 2, p2x+ 2, p2y+ 2), 360-angle+15, 360-angle-15, fill=whtcol)
+
+    else:
+        # draw border around entire spot
+        draw.ellipse((p1x- 4, p1y- 4, p2x+ 4, p2y+ 4), outline=whtcol)
+        draw.ellipse((p1x- 2, p1y- 2, p2x+ 2, p2y+ 2), outline=whtcol)
+
+    return sprite, half
+
+def drawspawns(things, im, xmin, ymin, border, thtype, sptcol, flag):
 
+    font = get_font(txtdim * alias)
+    draw = ImageDraw.Draw(im)
     spawn = 1;
-    for thing in edit.things:
+    for thing in things:
         if thing.type == thtype:
             # define spot string
             if flag:
                 spstr = 'F'
             else:
                 spstr = str(spawn)
-            # size up if anti-aliasing
-            radius = sptdim * alias
-            # larger spot for 2 digits
-            if len(spstr) > 1:
-                radius *= 1.3
-            size = font.getsize(spstr)
-            # compute bounding box
-            p1x = (thing.x - radius) - xmin + border
-            p1y = (thing.y - radius) - ymin + border
-            p2x = (thing.x + radius) - xmin + border
-            p2y = (thing.y + radius) - ymin + border
-
-            # draw spawn spot
-            draw.ellipse((p1x, p1y, p2x, p2y), outline=sptcol, fill=sptcol)
-
-            if not flag:
-                # draw arrow at thing angle
-                draw.arc((p1x-12, p1y-12, p2x+12, p2y+12), 360-thing.angle- 2, 360-thing.angle+ 2, fill=sptcol)
-                draw.arc((p1x-11, p1y-11, p2x+11, p2y+11), 360-thing.angle- 4, 360-thing.angle+ 4, fill=sptcol)
-                draw.arc((p1x-10, p1y-10, p2x+10, p2y+10), 360-thing.angle- 6, 360-thing.angle+ 6, fill=sptcol)
-                draw.arc((p1x- 9, p1y- 9, p2x+ 9, p2y+ 9), 360-thing.angle- 8, 360-thing.angle+ 8, fill=sptcol)
-                draw.arc((p1x- 8, p1y- 8, p2x+ 8, p2y+ 8), 360-thing.angle-10, 360-thing.angle+10, fill=sptcol)
-                draw.arc((p1x- 7, p1y- 7, p2x+ 7, p2y+ 7), 360-thing.angle-11, 360-thing.angle+11, fill=sptcol)
-                draw.arc((p1x- 6, p1y- 6, p2x+ 6, p2y+ 6), 360-thing.angle-12, 360-thing.angle+12, fill=sptcol)
-                draw.arc((p1x- 5, p1y- 5, p2x+ 5, p2y+ 5), 360-thing.angle-13, 360-thing.angle+13, fill=sptcol)
-                draw.arc((p1x- 4, p1y- 4, p2x+ 4, p2y+ 4), 360-thing.angle-14, 360-thing.angle+14, fill=sptcol)
-                draw.arc((p1x- 2, p1y- 2, p2x+ 2, p2y+ 2), 360-thing.angle-15, 360-thing.angle+15, fill=sptcol)
-
-                # draw border around arrow
-                draw.arc((p1x-15, p1y-15, p2x+15, p2y+15), 360-thing.angle- 3, 360-thing.angle+ 3, fill=whtcol)
-                draw.arc((p1x-14, p1y-14, p2x+14, p2y+14), 360-thing.angle- 4, 360-thing.angle+ 4, fill=whtcol)
-                draw.arc((p1x-13, p1y-13, p2x+13, p2y+13), 360-thing.angle- 5, 360-thing.angle+ 5, fill=whtcol)
-                draw.arc((p1x-12, p1y-12, p2x+12, p2y+12), 360-thing.angle+ 3, 360-thing.angle+ 7, fill=whtcol)
-                draw.arc((p1x-12, p1y-12, p2x+12, p2y+12), 360-thing.angle- 7, 360-thing.angle- 3, fill=whtcol)
-                draw.arc((p1x-11, p1y-11, p2x+11, p2y+11), 360-thing.angle+ 5, 360-thing.angle+ 9, fill=whtcol)
-                draw.arc((p1x-11, p1y-11, p2x+11, p2y+11), 360-thing.angle- 9, 360-thing.angle- 5, fill=whtcol)
-                draw.arc((p1x-10, p1y-10, p2x+10, p2y+10), 360-thing.angle+ 7, 360-thing.angle+11, fill=whtcol)
-                draw.arc((p1x-10, p1y-10, p2x+10, p2y+10), 360-thing.angle-11, 360-thing.angle- 7, fill=whtcol)
-                draw.arc((p1x- 9, p1y- 9, p2x+ 9, p2y+ 9), 360-thing.angle+ 9, 360-thing.angle+13, fill=whtcol)
-                draw.arc((p1x- 9, p1y- 9, p2x+ 9, p2y+ 9), 360-thing.angle-13, 360-thing.angle- 9, fill=whtcol)
-                draw.arc((p1x- 8, p1y- 8, p2x+ 8, p2y+ 8), 360-thing.angle+11, 360-thing.angle+15, fill=whtcol)
-                draw.arc((p1x- 8, p1y- 8, p2x+ 8, p2y+ 8), 360-thing.angle-15, 360-thing.angle-11, fill=whtcol)
-                draw.arc((p1x- 7, p1y- 7, p2x+ 7, p2y+ 7), 360-thing.angle+12, 360-thing.angle+16, fill=whtcol)
-                draw.arc((p1x- 7, p1y- 7, p2x+ 7, p2y+ 7), 360-thing.angle-16, 360-thing.angle-12, fill=whtcol)
-
-                # draw border around rest of spot
-                draw.arc((p1x- 6, p1y- 6, p2x+ 6, p2y+ 6), 360-thing.angle+12, 360-thing.angle-12, fill=whtcol)
-                draw.arc((p1x- 4, p1y- 4, p2x+ 4, p2y+ 4), 360-thing.angle+14, 360-thing.angle-14, fill=whtcol)
-                draw.arc((p1x- 2, p1y- 2, p2x+ 2, p2y+ 2), 360-thing.angle+15, 360-thing.angle-15, fill=whtcol)
-
-            else:
-                # draw border around entire spot
-                draw.ellipse((p1x- 4, p1y- 4, p2x+ 4, p2y+ 4), outline=whtcol)
-                draw.ellipse((p1x- 2, p1y- 2, p2x+ 2, p2y+ 2), outline=whtcol)
+            sprite, half = spawnsprite(sptcol, thing.angle, len(spstr) > 1, flag)
+            im.paste(sprite, (thing.x - xmin + border - half,
+                              thing.y - ymin + border - half), sprite)
 
             # shift top-left corner by 'size/2' to center text in spot
+            size = textsize(font, spstr)
             draw.text((thing.x - xmin + border - size[0]/2,
                        thing.y - ymin + border - size[1]/2 - 5),
                       spstr, txtcol, font=font)
             spawn += 1
 
 
-if len(sys.argv) < 3:
+def usage():
     print("\n    Omgifol script: draw maps to image files\n")
     print("    Usage:")
-    print("    drawmaps.py [-v] [-d] [-f] source.wad pattern [size [scale]]\n")
-    print("    Draw all maps whose names match the given pattern (eg E?M4 or MAP*).")
+    print("    drawmaps.py [-v] [-d] [-f] [-j workers] [-o outdir] [-e engine] source.wad [source2.wad ...] pattern [size [scale]]\n")
+    print("    Draw all maps whose names match the given pattern (eg E?M4 or MAP*),")
+    print("    several patterns can be given separated by commas (eg E1M*,E2M1).")
+    print("    With more than one WAD the images are named wadname_MAPxx.png.")
     print("    If no 'size' is specified, default size is 1000 px.")
     print("    With 'scale' specified, all maps are rendered at that same scale,")
     print("    but still capped to 'size' if needed.")
@@ -223,11 +312,22 @@ if len(sys.argv) < 3:
     print("    without 'scale', also log the average scale for all maps.")
     print("    With DM spawns flag '-d' or CTF spawns flag '-f', draw numbered")
     print("    spawn spots.")
+    print("    Maps are drawn by '-j' worker processes, default is one per core.")
+    print("    Engine '-e raster' (default) draws all lines in one vectorized pass,")
+    print("    '-e pillow' draws them one ImageDraw.line at a time.")
     print("    Wiki images can be max. 12,500,000 pixels, larger is flagged with !")
-else:
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
     # process optional flags
+    verbose = dmspawns = ctfspawns = False
+    workers = None
+    outdir = "."
+    engine = "raster"
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'vdf')
+        opts, args = getopt.getopt(argv, 'vdfj:o:e:')
         for o, a in opts:
             if o == '-v':
                 verbose = True
@@ -235,36 +335,74 @@ else:
                 dmspawns = True
             if o == '-f':
                 ctfspawns = True
-    except getopt.GetoptError as err:
+            if o == '-j':
+                workers = int(a)
+            if o == '-o':
+                outdir = a
+            if o == '-e':
+                if a not in ENGINES:
+                    raise ValueError("unknown engine %s, use one of %s" % (a, ", ".join(ENGINES)))
+                engine = a
+    except (getopt.GetoptError, ValueError) as err:
         print(str(err))
         sys.exit(2)
 
-    # don't use anti-aliasing without spawn spots
-    if not dmspawns and not ctfspawns:
-        alias = 1
-    font = ImageFont.truetype('arial.ttf', txtdim * alias)
+    # the WADs are the leading arguments that are files
+    nwads = 0
+    while nwads < len(args) and os.path.isfile(args[nwads]):
+        nwads += 1
+    wadpaths, rest = args[:nwads], args[nwads:]
+    if not wadpaths or not rest:
+        usage()
+        return
+    patterns = rest[0].split(",")
 
     # process optional limits
     try:
-        maxpixels = int(args[2])
+        maxpixels = int(rest[1])
         try:
-            reqscale = float(args[3])
+            reqscale = float(rest[2])
         except:
             reqscale = 0
     except:
         maxpixels = 1000  # default size
         reqscale = 0
 
-    # load WAD and draw map(s)
-    print("Loading %s ..." % args[0])
-    inwad = WAD()
-    inwad.from_file(args[0])
-
-    for name in inwad.maps.find(args[1]) + inwad.udmfmaps.find(args[1]):
-        print("Drawing %s" % name, end='')
-        drawmap(inwad, name, name + ".png", maxpixels, reqscale)
-        if not verbose:
-            print("")
-
-    if verbose and total > 1:
-        print("\nAvg scale: %0.2f" % (1.0 / (scales / total)))
\ No newline at end of file
+    options = Options(verbose, dmspawns, ctfspawns, engine)
+    os.makedirs(outdir, exist_ok=True)
+
+    # load WAD(s) and draw map(s)
+    for path in wadpaths:
+        print("Loading %s ..." % path)
+    jobs = findjobs(wadpaths, patterns, maxpixels, reqscale, options, outdir)
+
+    started = time.perf_counter()
+    results = []
+    for result in drawbatch(jobs, workers):
+        results.append(result)
+        line = "Drawing %s" % result.name
+        if len(wadpaths) > 1:
+            line = "Drawing %s %s" % (os.path.basename(result.wadpath), result.name)
+        if verbose:
+            flag = ""
+            if result.xsize * result.ysize > 12500000:
+                flag = " !"
+            line += "\t%0.2f: %d x %d%s" % (1.0 / result.scale, result.xsize, result.ysize, flag)
+        print(line)
+    elapsed = time.perf_counter() - started
+
+    # average scale for all maps
+    if verbose and reqscale == 0 and len(results) > 1:
+        scales = sum(r.scale for r in results)
+        print("\nAvg scale: %0.2f" % (1.0 / (scales / len(results))))
+
+    # throughput
+    if results:
+        pixels = sum(r.xsize * r.ysize for r in results)
+        print("\nDrew %d maps in %0.2fs: %0.1f maps/s, %0.1f Mpixels/s" %
+              (len(results), elapsed, len(results) / elapsed, pixels / elapsed / 1e6))
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: geometry_cache.py
+Description: Persistent on-disk cache of decoded MapGeometry, one .npz file
+             per (WAD content hash, map name).
+Author: InZane84
+License: MIT
+"""
+import os, json, time, hashlib, threading
+from pathlib import Path
+import numpy as np
+from omg.wad import HeaderGroup
+from map_geometry import MapGeometry
+from wadfile_buffer import ViewLump
+
+# bump whenever MapGeometry's arrays or their meaning change, old files
+# are then ignored and evicted like any other stale entry
+CACHE_VERSION = 1
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME",
+                                Path.home() / ".cache")) / "doom_map_scope" / "geometry"
+MAX_CACHE_SIZE = 256*1024*1024
+
+_DIGEST_INDEX = "digests.json"
+
+
+def _safe_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def map_digest(wad):
+    """Hash of a BufferWAD/MappedWAD's lump directory and its map lumps.
+
+    That's all MapGeometry is decoded from. Textures, sounds, music etc.
+    are never read, so a MappedWAD only pages in its map lumps. Any lump
+    that's added, removed, moved or resized still changes the directory.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for entry in wad.wadio.entries:
+        h.update(bytes(entry))
+    for group in wad.groups:
+        if not isinstance(group, HeaderGroup):
+            continue
+        for name, lumps in group.items():
+            h.update(name.encode())
+            for lump_name, lump in lumps.items():
+                h.update(lump_name.encode())
+                h.update(lump.view if isinstance(lump, ViewLump) else lump.data)
+    return h.hexdigest()
+
+
+class GeometryCache:
+    """Decoded map geometry, persisted between runs.
+
+    Entries are keyed by map_digest() of the WAD plus the map name, so an
+    edited WAD never picks up stale geometry. The hash of a local file is
+    remembered by (path, size, mtime) so reopening it doesn't rehash it.
+    The least recently used entries are evicted once the cache grows past
+    `max_size` bytes. The cache directory is scanned once, after that the
+    sizes and access times are kept up to date in memory.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size=MAX_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._digests = None
+        self._entries = None   # path -> [access time, size]
+        self._total = 0
+
+    # -- WAD hashing -----------------------------------------------------
+
+    def _load_digests(self):
+        if self._digests is None:
+            try:
+                with open(self.cache_dir / _DIGEST_INDEX) as f:
+                    self._digests = json.load(f)
+            except (OSError, ValueError):
+                self._digests = {}
+        return self._digests
+
+    def _save_digests(self):
+        tmp = self.cache_dir / (_DIGEST_INDEX + ".tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(self._digests, f)
+            os.replace(tmp, self.cache_dir / _DIGEST_INDEX)
+        except OSError as e:
+            print(f"GeometryCache: couldn't save digests: {e}")
+
+    def wad_digest(self, wad):
+        """map_digest() of a BufferWAD/MappedWAD, remembered for files"""
+        path = getattr(wad, 'path', None)
+        key = None
+        with self._lock:
+            if path:
+                st = os.stat(path)
+                key = f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}"
+                digest = self._load_digests().get(key)
+                if digest:
+                    return digest
+
+            digest = map_digest(wad)
+
+            if key:
+                self._digests[key] = digest
+                # keep the index small, oldest entries first out
+                for old in list(self._digests)[:-1000]:
+                    del self._digests[old]
+                self._save_digests()
+        return digest
+
+    # -- entries ---------------------------------------------------------
+
+    def path_for(self, digest, name):
+        return self.cache_dir / f"{digest}_{_safe_name(name)}.v{CACHE_VERSION}.npz"
+
+    def load(self, digest, name):
+        """Return the cached MapGeometry or None"""
+        path = self.path_for(digest, name)
+        try:
+            with np.load(path, allow_pickle=False) as npz:
+                meta = json.loads(str(npz['meta']))
+                if meta.get('version') != CACHE_VERSION:
+                    return None
+                arrays = [npz[a] for a in MapGeometry.ARRAYS]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # truncated/corrupt file, get rid of it
+            print(f"GeometryCache: dropping {path.name}: {e}")
+            path.unlink(missing_ok=True)
+            return None
+
+        # bump the access time for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            if self._entries is not None and path in self._entries:
+                self._entries[path][0] = time.time()
+
+        geometry = MapGeometry(meta['name'], *arrays,
+                               num_sidedefs=meta['num_sidedefs'],
+                               num_sectors=meta['num_sectors'],
+                               namespace=meta['namespace'])
+        geometry._bounds = tuple(meta['bounds'])
+        return geometry
+
+    def store(self, digest, geometry):
+        """Write a MapGeometry to the cache, then evict if over budget"""
+        path = self.path_for(digest, geometry.name)
+        meta = {'version': CACHE_VERSION,
+                'name': geometry.name,
+                'namespace': geometry.namespace,
+                'num_sidedefs': geometry.num_sidedefs,
+                'num_sectors': geometry.num_sectors,
+                'bounds': list(geometry.bounds())}
+        arrays = {a: getattr(geometry, a) for a in MapGeometry.ARRAYS}
+        # the prefetch worker and the UI thread may store the same map
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "wb") as f:
+                np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+            size = tmp.stat().st_size
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"GeometryCache: couldn't write {path.name}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._scan()
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._total -= old[1]
+            self._entries[path] = [time.time(), size]
+            self._total += size
+        self.evict()
+
+    def _scan(self):
+        """Read the sizes and access times off disk, the first time only.
+        Called with the lock held."""
+        if self._entries is not None:
+            return
+        self._entries, self._total = {}, 0
+        for f in self.cache_dir.glob("*.npz"):
+            # entries from an older cache version are always evicted
+            if not f.name.endswith(f".v{CACHE_VERSION}.npz"):
+                f.unlink(missing_ok=True)
+                continue
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            self._entries[f] = [st.st_mtime, st.st_size]
+            self._total += st.st_size
+
+    def evict(self):
+        """Drop least recently used entries until under max_size"""
+        with self._lock:
+            self._scan()
+            if self._total <= self.max_size:
+                return
+            for f, (atime, size) in sorted(self._entries.items(), key=lambda e: e[1][0]):
+                if self._total <= self.max_size:
+                    break
+                f.unlink(missing_ok=True)
+                del self._entries[f]
+                self._total -= size
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            for f in self.cache_dir.glob("*.npz"):
+                f.unlink(missing_ok=True)
+            self._entries, self._total = {}, 0
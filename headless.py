@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Module Name: headless.py
+Description: Command line renders and JSON stats of a WAD's maps, for build
+             servers. Doesn't touch DearPyGui.
+Author: InZane84
+License: MIT
+"""
+import sys, os, getopt, json, time
+from map_geometry import MapGeometry
+import drawmaps
+import wadinfo
+
+
+def usage():
+    print("\n    Render maps and write their stats without the GUI\n")
+    print("    Usage:")
+    print("    headless.py [-n] [-o outdir] [-s size] [-e engine] [-j stats.json] source [pattern]\n")
+    print("    'source' is a WAD file or an idgames id (idgames://12345).")
+    print("    Maps matching 'pattern' (eg MAP0*, several separated by commas) are")
+    print("    drawn to outdir/MAPxx.png at 'size' px (default 1000) and their")
+    print("    counts, bounds and timings written as JSON to outdir/stats.json,")
+    print("    or the '-j' file ('-' for stdout). '-n' skips the renders.")
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    render = True
+    outdir = "."
+    maxpixels = 1000
+    engine = "raster"
+    statsfile = None
+    try:
+        opts, args = getopt.getopt(argv, 'no:s:e:j:')
+        for o, a in opts:
+            if o == '-n':
+                render = False
+            if o == '-o':
+                outdir = a
+            if o == '-s':
+                maxpixels = int(a)
+            if o == '-e':
+                if a not in drawmaps.ENGINES:
+                    raise ValueError("unknown engine %s, use one of %s" % (a, ", ".join(drawmaps.ENGINES)))
+                engine = a
+            if o == '-j':
+                statsfile = a
+    except (getopt.GetoptError, ValueError) as err:
+        print(str(err))
+        sys.exit(2)
+    if not args:
+        usage()
+        return
+    if statsfile is None:
+        statsfile = os.path.join(outdir, "stats.json")
+
+    # progress goes to stderr so the JSON can go to stdout
+    log = sys.stderr
+
+    t = time.perf_counter()
+    wad, label = wadinfo.open_source(args[0])
+    game, map_ids = wadinfo.wad_map_ids(wad)
+    load_time = time.perf_counter() - t
+    print(f"Loaded {label} ({game}, {len(map_ids)} maps) in {load_time:.3f}s", file=log)
+
+    # all maps by default, the UDMF ones too
+    if len(args) > 1:
+        names = []
+        for pattern in args[1].split(","):
+            for name in wad.maps.find(pattern) + wad.udmfmaps.find(pattern):
+                if name not in names:
+                    names.append(name)
+    else:
+        names = map_ids + [n for n in wad.udmfmaps.keys() if n not in map_ids]
+
+    if render:
+        os.makedirs(outdir, exist_ok=True)
+    options = drawmaps.Options(engine=engine)
+    maps = []
+    for name in names:
+        t = time.perf_counter()
+        geometry = MapGeometry.from_wad(wad, name)
+        stats = wadinfo.map_stats(geometry)
+        stats['timings'] = {'decode': time.perf_counter() - t}
+
+        if render:
+            t = time.perf_counter()
+            im, scale = drawmaps.rendermap(wad, name, maxpixels, 0, options, geometry)
+            stats['timings']['render'] = time.perf_counter() - t
+            t = time.perf_counter()
+            filename = os.path.join(outdir, name + ".png")
+            im.save(filename)
+            stats['timings']['save'] = time.perf_counter() - t
+            stats['image'] = {'file': filename, 'width': im.size[0],
+                              'height': im.size[1], 'scale': 1.0 / scale}
+        print(f"{name}: {stats['linedefs']} linedefs, {stats['things']} things", file=log)
+        maps.append(stats)
+
+    report = {'source': label,
+              'game': game,
+              'map_ids': map_ids,
+              'timings': {'load': load_time},
+              'maps': maps}
+    text = json.dumps(report, indent=2)
+    if statsfile == "-":
+        print(text)
+    else:
+        with open(statsfile, "w") as f:
+            f.write(text + "\n")
+        print(f"Stats written to {statsfile}", file=log)
+    if hasattr(wad, 'release'):
+        wad.release()
+    return report
+
+
+if __name__ == "__main__":
+    main()
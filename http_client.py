@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: http_client.py
+Description: The one httpx.Client all idGames traffic goes through (browser
+             listings, API lookups and downloads), so connections to the
+             mirror and doomworld.com are kept alive and reused.
+Author: InZane84
+License: MIT
+"""
+import threading
+import importlib.util
+import httpx
+
+USER_AGENT = "Mozilla/5.0 (Doom Map Scope)"
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+# connect/read timeouts in seconds, reads are per chunk so a big download
+# isn't cut off as long as bytes keep coming
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+# only a couple of hosts are ever talked to, so these are per host in
+# practice: a few downloads and listings at once, the idle connections
+# stay open for reuse
+LIMITS = httpx.Limits(max_connections=16,
+                      max_keepalive_connections=8,
+                      keepalive_expiry=60.0)
+
+_client = None
+_async_client = None
+_lock = threading.Lock()
+
+
+def _settings():
+    return dict(http2=HTTP2,
+                timeout=TIMEOUT,
+                limits=LIMITS,
+                follow_redirects=True,
+                headers={"User-Agent": USER_AGENT})
+
+
+def get_client():
+    """The shared client, created on first use. httpx.Client is safe to use
+    from several threads at once."""
+    global _client
+    with _lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_settings())
+            print(f"http_client: new client (HTTP/2: {HTTP2})")
+        return _client
+
+
+def close_client():
+    """Close the pooled connections, get_client() makes a new client if
+    needed again"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def get_async_client():
+    """The shared httpx.AsyncClient, same settings as get_client(). It's
+    tied to the event loop it's first used on, so only use it from that
+    loop (async_fetch.AsyncFetcher's)."""
+    global _async_client
+    with _lock:
+        if _async_client is None or _async_client.is_closed:
+            _async_client = httpx.AsyncClient(**_settings())
+        return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    with _lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: idgames.py
+Description: idGames archive access (file info API and WAD downloads) with
+             no GUI attached, shared by the viewer and the headless CLI.
+Author: InZane84
+License: MIT
+"""
+import io, os, re, time, codecs, zipfile, hashlib
+from html.parser import HTMLParser
+from typing import TypedDict
+from urllib.parse import urljoin
+import httpx
+import http_client
+import mirrors
+
+API_URL = "https://doomworld.com/idgames/api/api.php"
+HEADERS = {"User-Agent": http_client.USER_AGENT}
+
+# download chunk size and how many times a dropped transfer is resumed
+CHUNK_SIZE = 64*1024
+RETRIES = 5
+
+# a mirror averaging less than MIN_RATE bytes/s after SLOW_AFTER seconds
+# is dropped for the next best one (the download resumes there)
+MIN_RATE = 32*1024
+SLOW_AFTER = 5.0
+
+
+class SlowMirror(Exception):
+    pass
+
+
+# failures that mean "try another mirror" rather than "try again"
+MIRROR_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.HTTPStatusError, SlowMirror)
+
+
+def parse_id(user_input):
+    """'idgames://123', ' 123 ' -> '123'"""
+    return user_input.split("://")[-1].strip()
+
+
+# need to ask about this class as it relates
+# to the annotated return type
+class IdGamesEntry(TypedDict):
+    """To satisfy pylance..."""
+    name: str
+    url: str
+    is_folder: bool
+    type: str
+    size: int | None
+    date: str | None
+
+
+# the columns after a link in Apache/nginx listings: the date (ISO or
+# nginx's 01-Jan-2005), then the size, then maybe a description
+_DATE = re.compile(r"(?:(\d{4})-(\d{2})-(\d{2})|(\d{2})-([A-Za-z]{3})-(\d{4}))[ T](\d{2}:\d{2})")
+_SIZE = re.compile(r"\s*(\d+(?:\.\d+)?)([KMGT]?)(?:\s|$)")
+_UNITS = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+_MONTHS = {m: f"{i:02d}" for i, m in enumerate(
+    ("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+
+class ListingParser(HTMLParser):
+    """Streaming parser of a mirror's dir listing.
+
+    feed() it bytes as they arrive, take() hands over the entries finished
+    so far. Only the links and the text after each of them (where the
+    date and size columns are) are looked at, no tree is built. An entry
+    is finished at the end of its line or table row, or at the next link.
+    """
+
+    def __init__(self, url):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.entries = []
+        self._taken = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._href = None     # link being read
+        self._text = []
+        self._entry = None    # link read, collecting its columns
+        self._columns = []
+
+    def feed(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = self._decoder.decode(data)
+        super().feed(data)
+
+    def close(self):
+        super().feed(self._decoder.decode(b"", final=True))
+        super().close()
+        self._finish()
+
+    def take(self):
+        """Entries finished since the last take()"""
+        new = self.entries[self._taken:]
+        self._taken = len(self.entries)
+        return new
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'a':
+            self._finish()
+            self._href = dict(attrs).get('href')
+            self._text = []
+        elif self._entry is not None:
+            # keep table cells apart
+            self._columns.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._href is not None:
+            href, text = self._href, "".join(self._text).strip()
+            self._href = None
+            # skip the parent dir and the column sorting links
+            if (not href or not text or text == "Parent Directory" or href == '../'
+                    or href.startswith('?')):
+                return
+            is_folder = href.endswith('/')
+            self._entry = {'name': text,
+                           'url': urljoin(self.url, href),
+                           'is_folder': is_folder,
+                           'type': 'folder' if is_folder else 'file',
+                           'size': None,
+                           'date': None}
+            self._columns = []
+        elif tag in ('tr', 'pre', 'table'):
+            self._finish()
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+        elif self._entry is not None:
+            # <pre> listings put one entry per line
+            line, newline, _ = data.partition("\n")
+            self._columns.append(line)
+            if newline:
+                self._finish()
+
+    def _finish(self):
+        entry = self._entry
+        if entry is None:
+            return
+        self._entry = None
+        columns = "".join(self._columns)
+        date = _DATE.search(columns)
+        if date:
+            # stored as ISO so dates sort whatever the mirror runs
+            year, month, day, nday, nmonth, nyear, clock = date.groups()
+            if year is None:
+                year, month, day = nyear, _MONTHS.get(nmonth.lower(), "00"), nday
+            entry['date'] = f"{year}-{month}-{day} {clock}"
+            columns = columns[date.end():]
+        # the first column after the date, not the end of the line where
+        # a description may be
+        size = _SIZE.match(columns)
+        if size and not entry['is_folder']:
+            entry['size'] = int(float(size.group(1)) * _UNITS[size.group(2)])
+        self.entries.append(entry)
+
+
+def parse_listing(content, url: str) -> list[IdGamesEntry]:
+    """Entries of a mirror's dir listing page"""
+    parser = ListingParser(url)
+    parser.feed(content)
+    parser.close()
+    return parser.entries
+
+
+def get_file_info(wad_id, client):
+    """The API's 'content' dict for a file id (title, dir, filename...).
+    A path like 'levels/doom2/a-c/foo.zip' works as an id too."""
+    key = "id" if str(wad_id).isdigit() else "file"
+    api_url = f"{API_URL}?action=get&{key}={wad_id}&out=json"
+    print(f"Requesting: {api_url}")
+    response = client.get(api_url)
+    response.raise_for_status()
+    data = response.json()
+    if 'content' not in data:
+        raise LookupError(f"idgames: no file with id {wad_id}: {data.get('error', data)}")
+    return data['content']
+
+
+def get_dir_contents(path, client):
+    """The API's file info dicts of every file in an archive dir
+    ('levels/doom2/a-c/')"""
+    api_url = f"{API_URL}?action=getcontents&name={path}&out=json"
+    response = client.get(api_url)
+    response.raise_for_status()
+    content = response.json().get('content') or {}
+    files = content.get('file', [])
+    # a single file comes back as a dict instead of a list
+    return [files] if isinstance(files, dict) else files
+
+
+def download_url(content, mirror=None):
+    """Mirror URL of the zip for a file info dict, on the best mirror
+    unless one is given"""
+    file_path = content['dir'].strip('/')
+    file_name = content['filename']
+    if mirror is None:
+        mirror = mirrors.registry.best()
+    return f"{mirror}{file_path}/{file_name}"
+
+
+def _next_mirror(registry, failed):
+    """Best mirror that hasn't failed this download yet"""
+    return registry.best(exclude=failed)
+
+
+def download_zip(content, client, registry=None):
+    """Download a file's zip, returns its bytes. Fails over to the next
+    best mirror like download_file() does."""
+    registry = registry or mirrors.registry
+    failed = set()
+    for attempt in range(RETRIES + 1):
+        mirror = _next_mirror(registry, failed)
+        url = download_url(content, mirror)
+        print(f"Downloading from: {url}")
+        try:
+            r = client.get(url, headers=HEADERS)
+            r.raise_for_status() #check for 404
+            return r.content
+        except (httpx.TransportError, httpx.HTTPStatusError) as e:
+            if isinstance(e, MIRROR_ERRORS):
+                registry.mark_failed(mirror, e)
+                failed.add(mirror)
+            if attempt == RETRIES:
+                raise
+
+
+def _hash_file(path, *hashes):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            for h in hashes:
+                h.update(chunk)
+
+
+def download_file(content, client, path, progress=None, registry=None):
+    """Stream a file's zip to `path`, CHUNK_SIZE bytes at a time.
+
+    Bytes land in `path` + '.part' first. A partial file left by an
+    earlier attempt (or a connection dropped mid-way, up to RETRIES
+    times) is resumed with a Range request, so only the missing bytes
+    are fetched. md5 and sha256 are updated as the chunks arrive and the
+    md5 is checked against the API's, on a mismatch the part file is
+    deleted and ValueError raised. progress(done, total) is called after
+    every chunk, total is None when the server doesn't say.
+
+    Each attempt goes to the best mirror of `registry` that hasn't failed
+    this download. One that can't be reached, fails TLS, doesn't have the
+    file or is too slow (see MIN_RATE) is marked failed and the download
+    resumes from the next one, the md5 makes sure the pieces match.
+    Returns (sha256 hex digest, size).
+    """
+    registry = registry or mirrors.registry
+    part = f"{path}.part"
+    failed = set()
+    for attempt in range(RETRIES + 1):
+        mirror = _next_mirror(registry, failed)
+        url = download_url(content, mirror)
+        md5, sha256 = hashlib.md5(), hashlib.sha256()
+        done = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = dict(HEADERS)
+        if done:
+            headers['Range'] = f"bytes={done}-"
+        print(f"Downloading from: {url}" + (f" (resuming at {done})" if done else ""))
+        try:
+            with client.stream("GET", url, headers=headers) as r:
+                if r.status_code == 416:
+                    # the part file is already the whole thing
+                    total = done
+                else:
+                    r.raise_for_status() #check for 404
+                    if done and r.status_code != 206:
+                        # no range support, start over
+                        done = 0
+                    length = r.headers.get('Content-Length')
+                    total = done + int(length) if length is not None else None
+                with open(part, "r+b" if done else "wb") as f:
+                    if done:
+                        # pick the checksums up where the part file ends
+                        _hash_file(part, md5, sha256)
+                        f.seek(done)
+                    if r.status_code != 416:
+                        started, start = time.perf_counter(), done
+                        # only worth giving up on a slow mirror for another
+                        others = len(failed) + 1 < len(registry.urls)
+                        for chunk in r.iter_bytes(CHUNK_SIZE):
+                            f.write(chunk)
+                            md5.update(chunk)
+                            sha256.update(chunk)
+                            done += len(chunk)
+                            if progress:
+                                progress(done, total)
+                            elapsed = time.perf_counter() - started
+                            if others and elapsed > SLOW_AFTER and (done - start) / elapsed < MIN_RATE:
+                                f.truncate()
+                                raise SlowMirror(f"{(done - start) / elapsed / 1024:.0f}KB/s")
+                    f.truncate()
+            break
+        except (httpx.TransportError, httpx.HTTPStatusError, SlowMirror) as e:
+            if isinstance(e, MIRROR_ERRORS):
+                registry.mark_failed(mirror, e)
+                failed.add(mirror)
+            if attempt == RETRIES:
+                raise
+            print(f"download_file: {e}, resuming ({attempt + 1}/{RETRIES})")
+
+    expected = content.get('md5')
+    if expected and md5.hexdigest() != expected.lower():
+        os.remove(part)
+        raise ValueError(f"idgames: {content['filename']}: md5 mismatch, download is corrupt")
+    os.replace(part, path)
+    return sha256.hexdigest(), done
+
+
+def extract_wad(zip_data):
+    """(wad name, wad bytes) of the first .wad in a zip (bytes or a path),
+    (None, None) when there isn't one"""
+    if isinstance(zip_data, (bytes, bytearray)):
+        zip_data = io.BytesIO(zip_data)
+    with zipfile.ZipFile(zip_data) as z:
+        wads = [f for f in z.namelist() if f.lower().endswith('.wad')]
+        if not wads:
+            return None, None
+        return wads[0], z.read(wads[0])
+
+
+def download_wad(content, client):
+    """Download a file's zip and return (wad name, wad bytes) of the first
+    .wad in it, (None, None) when there isn't one"""
+    return extract_wad(download_zip(content, client))
+
+
+def download_to_cache(wad_id, content, client, cache, progress=None):
+    """Stream an id's zip into a DownloadCache (see download_file),
+    returns the cached zip's path"""
+    with cache.lock_for(wad_id):
+        # another thread may have fetched it while we waited
+        cached, path = cache.get_path(wad_id)
+        if path is not None:
+            return path
+        path = cache.download_path(wad_id)
+        digest, size = download_file(content, client, path, progress)
+        return cache.add_file(wad_id, path, digest, size, content)
+
+
+def fetch_zip(wad_id, client=None, cache=None, progress=None):
+    """(file info, zip) of an idgames id. Without a cache the zip is
+    bytes. With a DownloadCache it's the path of the cached zip: a cached
+    id never touches the network, a missing one is streamed into the
+    cache (resuming a partial download if there is one)."""
+    if cache is not None:
+        content, path = cache.get_path(wad_id)
+        if path is not None:
+            print(f"Loading idgames {wad_id} from cache")
+            return content, path
+    if client is None:
+        client = http_client.get_client()
+    content = get_file_info(wad_id, client)
+    if cache is None:
+        return content, download_zip(content, client)
+    return content, download_to_cache(wad_id, content, client, cache, progress)
+
+
+def fetch_wad(wad_id, client=None, cache=None, progress=None):
+    """Look up and download a WAD by idgames id.
+    Returns (file info, wad name, wad bytes)."""
+    content, zip_data = fetch_zip(wad_id, client, cache, progress)
+    name, data = extract_wad(zip_data)
+    return content, name, data
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: listing_cache.py
+Description: Parsed idGames folder listings, kept in memory and on disk and
+             revalidated with ETag/If-Modified-Since, so going back to a
+             folder doesn't download and parse it again.
+Author: InZane84
+License: MIT
+"""
+import os, json, time, atexit, threading
+from collections import OrderedDict
+from pathlib import Path
+
+CACHE_FILE = Path(os.environ.get("XDG_CACHE_HOME",
+                                 Path.home() / ".cache")) / "doom_map_scope" / "listings.json"
+
+# a listing younger than this is used as is, an older one is revalidated
+TTL = 300.0
+
+# listings kept, least recently used are dropped first
+MAX_LISTINGS = 64
+
+# seconds changes are collected before listings.json is written
+SAVE_DELAY = 2.0
+
+# 2: entries have size and date
+# 3: dates are ISO
+CACHE_VERSION = 3
+
+
+class ListingCache:
+    """url -> {entries, etag, last_modified, checked}.
+
+    Within TTL seconds of its last check a listing is returned without any
+    request. After that the server is asked with the stored validators and
+    a 304 just restarts the clock. Shared by the UI thread and the fetcher
+    thread, so everything goes through a lock. `path` None keeps it in
+    memory only.
+
+    New listings are written to disk SAVE_DELAY seconds later on a timer
+    thread (and at exit), several at once, so neither the fetcher's loop
+    nor the lock waits on json. A 304 isn't written at all, after a
+    restart the listing is just revalidated again.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl=TTL, max_listings=MAX_LISTINGS):
+        self.path = Path(path) if path else None
+        self.ttl = ttl
+        self.max_listings = max_listings
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._listings = None
+        self._dirty = False
+        self._timer = None
+        atexit.register(self.flush)
+
+    def _load(self):
+        if self._listings is not None:
+            return self._listings
+        self._listings = OrderedDict()
+        if self.path:
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+                if data.get('version') == CACHE_VERSION:
+                    self._listings.update(data['listings'])
+            except (OSError, ValueError, KeyError):
+                pass
+        return self._listings
+
+    def _save(self):
+        """Schedule a flush(), called with the lock held"""
+        if not self.path:
+            return
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(SAVE_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Write the listings if they changed since the last write"""
+        with self._write_lock:
+            with self._lock:
+                self._timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # only a stored listing's 'checked' changes after the
+                # fact, a shallow copy is enough to dump outside the lock
+                listings = dict(self._listings)
+            tmp = self.path.with_suffix(f".{threading.get_ident()}.tmp")
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(tmp, "w") as f:
+                    json.dump({'version': CACHE_VERSION, 'listings': listings}, f)
+                os.replace(tmp, self.path)
+            except OSError as e:
+                print(f"ListingCache: couldn't save: {e}")
+
+    def fresh(self, url):
+        """Cached entries of url if checked within TTL, else None"""
+        with self._lock:
+            listing = self._load().get(url)
+            if listing is None or time.time() - listing['checked'] > self.ttl:
+                return None
+            self._listings.move_to_end(url)
+            return listing['entries']
+
+    def headers(self, url):
+        """Conditional request headers for url's cached listing"""
+        with self._lock:
+            listing = self._load().get(url)
+        headers = {}
+        if listing:
+            if listing['etag']:
+                headers['If-None-Match'] = listing['etag']
+            if listing['last_modified']:
+                headers['If-Modified-Since'] = listing['last_modified']
+        return headers
+
+    def _revalidated(self, url, response):
+        """The cached entries when response is a 304 for them, else None"""
+        if response.status_code != 304:
+            return None
+        with self._lock:
+            listing = self._load().get(url)
+            if listing is None:
+                return None
+            # only the time changed, not worth a write
+            listing['checked'] = time.time()
+            self._listings.move_to_end(url)
+            return listing['entries']
+
+    def update(self, url, response, parse):
+        """Entries for url from a (conditional) response: the cached ones on
+        a 304, else parse(content, url), which is then cached"""
+        entries = self._revalidated(url, response)
+        if entries is not None:
+            return entries
+        response.raise_for_status()
+        return self.store(url, parse(response.content, url), response)
+
+    def store(self, url, entries, response):
+        """Cache url's freshly parsed entries with response's validators"""
+        with self._lock:
+            self._load()[url] = {'entries': entries,
+                                 'etag': response.headers.get('ETag'),
+                                 'last_modified': response.headers.get('Last-Modified'),
+                                 'checked': time.time()}
+            self._listings.move_to_end(url)
+            while len(self._listings) > self.max_listings:
+                self._listings.popitem(last=False)
+            self._save()
+        return entries
+
+    def get(self, client, url, parse):
+        """Listing of url through the cache with an httpx.Client"""
+        entries = self.fresh(url)
+        if entries is not None:
+            return entries
+        return self.update(url, client.get(url, headers=self.headers(url)), parse)
+
+    async def get_async(self, client, url, parse):
+        """Same as get() with an httpx.AsyncClient"""
+        entries = self.fresh(url)
+        if entries is not None:
+            return entries
+        return self.update(url, await client.get(url, headers=self.headers(url)), parse)
+
+    async def stream_async(self, client, url, parser, on_rows):
+        """get_async() that parses the page as it arrives: parser (an
+        idgames.ListingParser) is fed every chunk and on_rows(rows) gets
+        the entries it finished. A cached or revalidated listing is just
+        returned, on_rows isn't called for it."""
+        entries = self.fresh(url)
+        if entries is not None:
+            return entries
+        async with client.stream("GET", url, headers=self.headers(url)) as response:
+            entries = self._revalidated(url, response)
+            if entries is not None:
+                return entries
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                parser.feed(chunk)
+                rows = parser.take()
+                if rows:
+                    on_rows(rows)
+            parser.close()
+            rows = parser.take()
+            if rows:
+                on_rows(rows)
+        return self.store(url, parser.entries, response)
+
+    def clear(self):
+        with self._lock:
+            self._listings = OrderedDict()
+            self._save()
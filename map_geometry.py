@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: map_geometry.py
+Description: Compact, array-backed (struct-of-arrays) map geometry decoded
+             straight from the map lumps. Shared by the map viewer and
+             drawmaps.py.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+from spatial_grid import SegmentGrid
+from map_lod import simplify_chains, level_tolerance, level_for_scale
+
+# linedef draw styles, later ones win (same precedence as drawmaps.py)
+STYLE_ONESIDED = 0
+STYLE_TWOSIDED = 1
+STYLE_SPECIAL  = 2
+STYLE_TAGGED   = 3
+STYLE_NAMES = ("1-sided", "2-sided", "special", "tagged")
+
+# linedef flag bit for ML_TWOSIDED
+TWOSIDED_FLAG = 0x0004
+
+# binary lump layouts (little endian, packed)
+VERTEX_DTYPE = np.dtype([('x', '<i2'), ('y', '<i2')])
+LINEDEF_DTYPE = np.dtype([('v1', '<u2'), ('v2', '<u2'), ('flags', '<u2'),
+                          ('special', '<u2'), ('tag', '<u2'),
+                          ('front', '<u2'), ('back', '<u2')])
+ZLINEDEF_DTYPE = np.dtype([('v1', '<u2'), ('v2', '<u2'), ('flags', '<u2'),
+                           ('special', 'u1'), ('args', 'u1', (5,)),
+                           ('front', '<u2'), ('back', '<u2')])
+THING_DTYPE = np.dtype([('x', '<i2'), ('y', '<i2'), ('angle', '<u2'),
+                        ('type', '<u2'), ('flags', '<u2')])
+ZTHING_DTYPE = np.dtype([('tid', '<u2'), ('x', '<i2'), ('y', '<i2'),
+                         ('height', '<i2'), ('angle', '<u2'), ('type', '<u2'),
+                         ('flags', '<u2'), ('special', 'u1'),
+                         ('args', 'u1', (5,))])
+SIDEDEF_SIZE = 30
+SECTOR_SIZE = 26
+
+# Hexen specials that carry a line id in one of their args (see omg.udmf)
+_HEXEN_LINEID_ARG = {1: 3, 5: 4, 181: 2, 208: 0, 215: 0, 222: 0}
+
+
+def chain_segments(v1, v2):
+    """Join segments that share end points into polylines.
+
+    v1/v2 are the vertex indexes of each segment. Returns a list of int32
+    arrays of vertex indexes, every segment ends up in exactly one chain.
+    Chains are started at dead ends/junctions first so they come out as
+    long as possible.
+    """
+    v1 = v1.tolist()
+    v2 = v2.tolist()
+    adjacent = {}
+    for k, (a, b) in enumerate(zip(v1, v2)):
+        adjacent.setdefault(a, []).append(k)
+        adjacent.setdefault(b, []).append(k)
+
+    used = bytearray(len(v1))
+
+    def walk(vertex):
+        # follow unused segments from vertex until we run out
+        path = []
+        edges = adjacent[vertex]
+        while edges:
+            k = edges.pop()
+            if used[k]:
+                continue
+            used[k] = 1
+            vertex = v2[k] if v1[k] == vertex else v1[k]
+            path.append(vertex)
+            edges = adjacent[vertex]
+        return path
+
+    starts = sorted(range(len(v1)), key=lambda k: len(adjacent[v1[k]]) == 2)
+    chains = []
+    for k in starts:
+        if used[k]:
+            continue
+        used[k] = 1
+        forward = walk(v2[k])
+        backward = walk(v1[k])
+        backward.reverse()
+        chains.append(np.array(backward + [v1[k], v2[k]] + forward, dtype=np.int32))
+    return chains
+
+
+def _lump_buffer(lump):
+    """zero-copy view of a lump when it has one (ViewLump), else its data"""
+    return getattr(lump, 'view', None) or lump.data
+
+
+def _decode(lump, dtype):
+    """Decode a binary lump into a structured array, ignoring trailing junk"""
+    buf = _lump_buffer(lump)
+    count = len(buf) // dtype.itemsize
+    return np.frombuffer(buf, dtype=dtype, count=count)
+
+
+class MapGeometry:
+    """Map geometry as flat NumPy arrays.
+
+    Vertexes:  vx, vy                                 (int32)
+    Linedefs:  v1, v2, flags, special, tag            (int32, tag is -1 when unset)
+    Things:    thing_x, thing_y, thing_type, thing_angle (int32)
+
+    Linedefs that reference missing vertexes are dropped on construction.
+    """
+
+    # array attributes, in constructor order (see geometry_cache.py)
+    ARRAYS = ('vx', 'vy', 'v1', 'v2', 'flags', 'special', 'tag',
+              'thing_x', 'thing_y', 'thing_type', 'thing_angle')
+
+    def __init__(self, name, vx, vy, v1, v2, flags, special, tag,
+                 thing_x, thing_y, thing_type, thing_angle,
+                 num_sidedefs=0, num_sectors=0, namespace="Doom"):
+        self.name = name
+        self.namespace = namespace
+        self.vx = np.asarray(vx, dtype=np.int32)
+        self.vy = np.asarray(vy, dtype=np.int32)
+
+        v1 = np.asarray(v1, dtype=np.int32)
+        v2 = np.asarray(v2, dtype=np.int32)
+        valid = (v1 >= 0) & (v2 >= 0) & (v1 < len(self.vx)) & (v2 < len(self.vx))
+        self.v1 = v1[valid]
+        self.v2 = v2[valid]
+        self.flags = np.asarray(flags, dtype=np.int32)[valid]
+        self.special = np.asarray(special, dtype=np.int32)[valid]
+        self.tag = np.asarray(tag, dtype=np.int32)[valid]
+
+        self.thing_x = np.asarray(thing_x, dtype=np.int32)
+        self.thing_y = np.asarray(thing_y, dtype=np.int32)
+        self.thing_type = np.asarray(thing_type, dtype=np.int32)
+        self.thing_angle = np.asarray(thing_angle, dtype=np.int32)
+
+        self.num_sidedefs = num_sidedefs
+        self.num_sectors = num_sectors
+        self._bounds = None
+        self._chains = {}
+        self._grid = None
+        self._lod = {}
+
+    def __repr__(self):
+        return (f"<MapGeometry {self.name}: {self.num_vertexes} vertexes, "
+                f"{self.num_linedefs} linedefs, {self.num_things} things>")
+
+    # -- construction ----------------------------------------------------
+
+    @classmethod
+    def from_lumps(cls, lumpgroup, name=None):
+        """Decode a binary (Doom or Hexen format) map lump group"""
+        m = lumpgroup
+        try:
+            vertexes = _decode(m["VERTEXES"], VERTEX_DTYPE)
+            num_sidedefs = len(_lump_buffer(m["SIDEDEFS"])) // SIDEDEF_SIZE
+            num_sectors = len(_lump_buffer(m["SECTORS"])) // SECTOR_SIZE
+
+            if "BEHAVIOR" in m:
+                namespace = "Hexen"
+                things = _decode(m["THINGS"], ZTHING_DTYPE)
+                lines = _decode(m["LINEDEFS"], ZLINEDEF_DTYPE)
+                special = lines['special'].astype(np.int32)
+                args = lines['args'].astype(np.int32)
+                # line ids live in the args of a few specials
+                tag = np.full(len(lines), -1, dtype=np.int32)
+                for action, arg in _HEXEN_LINEID_ARG.items():
+                    hit = special == action
+                    tag[hit] = args[hit, arg]
+                setid = special == 121  # Line_SetIdentification
+                tag[setid] = args[setid, 0] + args[setid, 4] * 256
+                special[setid] = 0
+                setid = (special == 160) & ((args[:, 1] & 8) != 0)  # Sector_Set3dFloor
+                tag[setid] = args[setid, 4]
+            else:
+                namespace = "Doom"
+                things = _decode(m["THINGS"], THING_DTYPE)
+                lines = _decode(m["LINEDEFS"], LINEDEF_DTYPE)
+                special = lines['special']
+                tag = lines['tag']
+        except KeyError as e:
+            raise ValueError("map is missing %s lump" % e)
+
+        return cls(name, vertexes['x'], vertexes['y'],
+                   lines['v1'], lines['v2'], lines['flags'], special, tag,
+                   things['x'], things['y'], things['type'], things['angle'],
+                   num_sidedefs=num_sidedefs, num_sectors=num_sectors,
+                   namespace=namespace)
+
+    @classmethod
+    def from_umap(cls, edit, name=None):
+        """Build from an omgifol UMapEditor (UDMF maps)"""
+        lines = edit.linedefs
+        things = edit.things
+        return cls(name,
+                   [v.x for v in edit.vertexes], [v.y for v in edit.vertexes],
+                   [l.v1 for l in lines], [l.v2 for l in lines],
+                   [TWOSIDED_FLAG if getattr(l, 'twosided', False) else 0 for l in lines],
+                   [l.special for l in lines], [l.id for l in lines],
+                   [t.x for t in things], [t.y for t in things],
+                   [t.type for t in things], [t.angle for t in things],
+                   num_sidedefs=len(edit.sidedefs),
+                   num_sectors=len(edit.sectors),
+                   namespace=edit.namespace or "Doom")
+
+    @classmethod
+    def from_wad(cls, wad, name):
+        """Decode map `name` from an omgifol WAD, UDMF or binary"""
+        udmfmaps = getattr(wad, 'udmfmaps', {})
+        if name in udmfmaps:
+            from omg.udmf import UMapEditor
+            return cls.from_umap(UMapEditor(udmfmaps[name]), name)
+        return cls.from_lumps(wad.maps[name], name)
+
+    # -- counts ----------------------------------------------------------
+
+    @property
+    def num_vertexes(self):
+        return len(self.vx)
+
+    @property
+    def num_linedefs(self):
+        return len(self.v1)
+
+    @property
+    def num_things(self):
+        return len(self.thing_x)
+
+    @property
+    def defid(self):
+        """Linedef id meaning 'no id' for this map's namespace"""
+        return -1 if self.namespace.lower() in ('zdoom', 'hexen') else 0
+
+    # -- classification --------------------------------------------------
+
+    @property
+    def two_sided(self):
+        return (self.flags & TWOSIDED_FLAG) != 0
+
+    def draw_order(self):
+        """Linedef indices with 2s lines first so 1s lines are never obscured"""
+        return np.argsort(~self.two_sided, kind='stable')
+
+    def styles(self, specials=True):
+        """STYLE_* per linedef. With specials=False only sidedness counts."""
+        styles = np.where(self.two_sided, STYLE_TWOSIDED, STYLE_ONESIDED).astype(np.int8)
+        if specials:
+            styles[self.special != 0] = STYLE_SPECIAL
+            styles[self.tag > self.defid] = STYLE_TAGGED
+        return styles
+
+    def style_chains(self, specials=True):
+        """{STYLE_*: [vertex index arrays]}, linedefs of each style joined
+        into polylines with chain_segments(). Built once per geometry."""
+        if specials not in self._chains:
+            styles = self.styles(specials)
+            chains = {}
+            for style in np.unique(styles).tolist():
+                lines = np.flatnonzero(styles == style)
+                chains[style] = chain_segments(self.v1[lines], self.v2[lines])
+            self._chains[specials] = chains
+        return self._chains[specials]
+
+    def lod(self, level):
+        """style_chains() simplified to LOD `level` (0 is the linedefs as
+        they are). Each level is built from the one below it, once."""
+        if level <= 0:
+            return self.style_chains()
+        if level not in self._lod:
+            finer = self.lod(level - 1)
+            tolerance = level_tolerance(level)
+            self._lod[level] = {style: simplify_chains(self.vx, -self.vy, chains, tolerance)
+                                for style, chains in finer.items()}
+        return self._lod[level]
+
+    def lod_for_scale(self, scale):
+        """LOD level to draw at `scale` pixels per map unit"""
+        return level_for_scale(scale)
+
+    def grid(self):
+        """SegmentGrid over the linedefs in map units (y flipped), built once"""
+        if self._grid is None:
+            self._grid = SegmentGrid(self.vx[self.v1], -self.vy[self.v1],
+                                     self.vx[self.v2], -self.vy[self.v2])
+        return self._grid
+
+    # -- scaling ---------------------------------------------------------
+
+    def bounds(self):
+        """(xmin, xmax, ymin, ymax) in map units, y flipped to screen space"""
+        if self._bounds is None:
+            if not self.num_vertexes:
+                self._bounds = (0, 0, 0, 0)
+            else:
+                self._bounds = (int(self.vx.min()), int(self.vx.max()),
+                                -int(self.vy.max()), -int(self.vy.min()))
+        return self._bounds
+
+    def fit_scale(self, maxpixels, border, reqscale=0):
+        """pixels per map unit so the map fits in `maxpixels`, capped to
+        1/reqscale when a scale is requested"""
+        xmin, xmax, ymin, ymax = self.bounds()
+        scale = (maxpixels - border*2) / float(max(xmax - xmin, ymax - ymin, 1))
+        if reqscale and scale > 1.0 / reqscale:
+            scale = 1.0 / reqscale
+        return scale
+
+    def layout(self, scale, border):
+        """Vertexes in image space.
+
+        Returns (px, py, xsize, ysize) where px/py are int32 arrays already
+        offset by the border, rounded the same way the old per-vertex code
+        did (truncate then subtract the truncated minimum).
+        """
+        xmin, xmax, ymin, ymax = self.bounds()
+        xoff = int(xmin * scale) - border
+        yoff = int(ymin * scale) - border
+        px = np.trunc(self.vx * scale).astype(np.int32) - xoff
+        py = np.trunc(self.vy * -scale).astype(np.int32) - yoff
+        xsize = int((xmax - xmin) * scale) + border*2
+        ysize = int((ymax - ymin) * scale) + border*2
+        return px, py, xsize, ysize
+
+    def segments(self, scale, border, order=None):
+        """Linedef end points in image space.
+
+        Returns (x1, y1, x2, y2, xsize, ysize), the coordinate arrays in
+        `order` (draw_order() when not given).
+        """
+        if order is None:
+            order = self.draw_order()
+        px, py, xsize, ysize = self.layout(scale, border)
+        v1 = self.v1[order]
+        v2 = self.v2[order]
+        return px[v1], py[v1], px[v2], py[v2], xsize, ysize
+
+    def things_scaled(self, scale):
+        """Thing positions scaled into (unbordered) image space"""
+        return (np.trunc(self.thing_x * scale).astype(np.int32),
+                np.trunc(self.thing_y * -scale).astype(np.int32))
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: map_lod.py
+Description: Level-of-detail simplification of linedef polylines, so a
+             zoomed out map doesn't spend a draw call on every sub-pixel
+             linedef.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+
+# level k is simplified to a tolerance of 2**k map units, level 0 is the
+# untouched linedefs
+LOD_LEVELS = 8
+
+# a level is used once its tolerance is at most this many pixels on screen
+LOD_PIXELS = 0.5
+
+
+def level_tolerance(level):
+    """Max distance (map units) a level's polylines may stray from the map"""
+    return float(2 ** level) if level else 0.0
+
+
+def level_for_scale(scale):
+    """Coarsest level whose error stays under LOD_PIXELS at `scale`
+    (pixels per map unit)"""
+    level = 0
+    while level < LOD_LEVELS and level_tolerance(level + 1) * scale <= LOD_PIXELS:
+        level += 1
+    return level
+
+
+def simplify_chains(x, y, chains, tolerance):
+    """Douglas-Peucker every chain at once.
+
+    x/y are the vertex coordinates, chains a list of vertex index arrays
+    (what chain_segments() returns). Points closer than `tolerance` to the
+    line between the points kept around them are dropped, which merges
+    collinear runs and flattens stair steps. Chains that fit within
+    `tolerance` altogether are dropped.
+
+    The recursion is done breadth first: every pending span of every chain
+    is split in the same pass, so it's a handful of NumPy calls per depth
+    instead of a Python call per span.
+    """
+    if not chains:
+        return []
+    verts = np.concatenate(chains)
+    sizes = np.array([len(c) for c in chains])
+    ends = np.cumsum(sizes)
+    begins = ends - sizes
+    px = x[verts].astype(np.float64)
+    py = y[verts].astype(np.float64)
+
+    keep = np.zeros(len(verts), dtype=bool)
+    keep[begins] = True
+    keep[ends - 1] = True
+
+    # spans (first, last) still to be looked at, in flat point indexes
+    first, last = begins, ends - 1
+    while True:
+        inner = last - first - 1
+        pending = inner > 0
+        first, last, inner = first[pending], last[pending], inner[pending]
+        if not len(first):
+            break
+
+        # every point strictly inside every pending span
+        owner = np.repeat(np.arange(len(first)), inner)
+        offsets = np.cumsum(inner) - inner
+        point = first[owner] + 1 + np.arange(len(owner)) - offsets[owner]
+
+        # distance to the span's base segment (or its first point when
+        # the span is closed)
+        ax, ay = px[first][owner], py[first][owner]
+        dx, dy = px[last][owner] - ax, py[last][owner] - ay
+        length2 = dx*dx + dy*dy
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(((px[point] - ax)*dx + (py[point] - ay)*dy) / length2, 0.0, 1.0)
+        t[length2 == 0] = 0.0
+        ex = px[point] - (ax + t*dx)
+        ey = py[point] - (ay + t*dy)
+        dist = ex*ex + ey*ey
+
+        # farthest point of each span, split there if it's too far
+        far = np.maximum.reduceat(dist, offsets)
+        split = far > tolerance * tolerance
+        hit = np.flatnonzero(dist == far[owner])
+        hit_owner, pick = np.unique(owner[hit], return_index=True)
+        mid = np.empty(len(first), dtype=np.int64)
+        mid[hit_owner] = point[hit[pick]]
+
+        first, last, mid = first[split], last[split], mid[split]
+        keep[mid] = True
+        first, last = np.concatenate((first, mid)), np.concatenate((mid, last))
+
+    # what's left of each chain, minus the ones smaller than the tolerance
+    counts = np.add.reduceat(keep, begins)
+    extent = np.maximum(np.maximum.reduceat(px, begins) - np.minimum.reduceat(px, begins),
+                        np.maximum.reduceat(py, begins) - np.minimum.reduceat(py, begins))
+    simplified = np.split(verts[keep], np.cumsum(counts)[:-1])
+    return [c for c, size in zip(simplified, extent.tolist()) if size >= tolerance]
+
+
+def chains_to_segments(chains):
+    """(v1, v2) vertex index arrays of every segment of the chains"""
+    if not chains:
+        empty = np.zeros(0, dtype=np.int32)
+        return empty, empty
+    return (np.concatenate([c[:-1] for c in chains]),
+            np.concatenate([c[1:] for c in chains]))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: map_view.py
+Description: Zoom/pan state of the map viewer and the map <-> screen
+             transform that goes with it.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+
+MIN_ZOOM = 0.25
+MAX_ZOOM = 256.0
+
+
+class MapView:
+    """What part of a map is on screen.
+
+    The canvas is the size the whole map takes at the 'fit' scale (what
+    the Map Scale combo picks). zoom multiplies that scale and `center` is
+    the map point (x, flipped y) in the middle of the canvas.
+    """
+
+    def __init__(self, geometry, maxpixels, border):
+        self.border = border
+        self.fit_scale = geometry.fit_scale(maxpixels, border)
+        xmin, xmax, ymin, ymax = geometry.bounds()
+        self.width = int((xmax - xmin) * self.fit_scale) + border*2
+        self.height = int((ymax - ymin) * self.fit_scale) + border*2
+        self.bounds = (xmin, ymin, xmax, ymax)
+        self.home = ((xmin + xmax) / 2.0, (ymin + ymax) / 2.0)
+        self.reset()
+
+    def reset(self):
+        """Back to the whole map"""
+        self.zoom = 1.0
+        self.center = self.home
+
+    @property
+    def scale(self):
+        """pixels per map unit"""
+        return self.fit_scale * self.zoom
+
+    @property
+    def zoomed(self):
+        return self.zoom != 1.0 or self.center != self.home
+
+    def visible_rect(self, margin=0):
+        """(xmin, ymin, xmax, ymax) of the canvas in map units (y flipped),
+        grown by `margin` pixels on every side"""
+        hw = (self.width / 2.0 + margin) / self.scale
+        hh = (self.height / 2.0 + margin) / self.scale
+        cx, cy = self.center
+        return cx - hw, cy - hh, cx + hw, cy + hh
+
+    def shows_everything(self):
+        xmin, ymin, xmax, ymax = self.visible_rect()
+        bx0, by0, bx1, by1 = self.bounds
+        return xmin <= bx0 and ymin <= by0 and xmax >= bx1 and ymax >= by1
+
+    def to_screen(self, x, y):
+        """Map x / flipped map y (scalars or arrays) to canvas pixels"""
+        s = self.scale
+        cx, cy = self.center
+        return ((np.asarray(x) - cx) * s + self.width / 2.0,
+                (np.asarray(y) - cy) * s + self.height / 2.0)
+
+    def to_map(self, sx, sy):
+        """Canvas pixels to map x / flipped map y"""
+        s = self.scale
+        cx, cy = self.center
+        return ((sx - self.width / 2.0) / s + cx,
+                (sy - self.height / 2.0) / s + cy)
+
+    def zoom_at(self, factor, sx, sy):
+        """Zoom by `factor`, keeping the map point under (sx, sy) still"""
+        mx, my = self.to_map(sx, sy)
+        self.zoom = min(max(self.zoom * factor, MIN_ZOOM), MAX_ZOOM)
+        s = self.scale
+        self.center = (mx - (sx - self.width / 2.0) / s,
+                       my - (sy - self.height / 2.0) / s)
+
+    def pan_by(self, dx, dy):
+        """Move the view by (dx, dy) canvas pixels"""
+        s = self.scale
+        cx, cy = self.center
+        self.center = (cx - dx / s, cy - dy / s)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: metadata_cache.py
+Description: The idGames API's file info (title, author, rating...) kept on
+             disk, so the browser and the details window don't have to ask
+             doomworld.com again for files they've seen.
+Author: InZane84
+License: MIT
+"""
+import os, json, time, sqlite3, threading
+from pathlib import Path
+import idgames
+
+CACHE_FILE = Path(os.environ.get("XDG_CACHE_HOME",
+                                 Path.home() / ".cache")) / "doom_map_scope" / "metadata.sqlite"
+
+# ratings and reviews change now and then, titles and authors don't
+TTL = 7 * 24 * 3600.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metadata (
+    path TEXT PRIMARY KEY,
+    idgames_id INTEGER,
+    content TEXT,
+    fetched REAL
+);
+CREATE INDEX IF NOT EXISTS metadata_id ON metadata(idgames_id);
+"""
+
+
+class MetadataCache:
+    """Archive path ('levels/doom2/a-c/foo.zip') -> the API's content dict.
+
+    A file the API doesn't know is stored as {} so it isn't asked for
+    again until it's stale. Lookups by numeric id work too. Each thread
+    gets its own sqlite connection, what's been looked up is also kept in
+    memory for the browser's redraws.
+    """
+
+    def __init__(self, path=CACHE_FILE, ttl=TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._memory = {}
+
+    def db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _lookup(self, key):
+        """(content, fetched) for a path or id, or None"""
+        key = str(key)
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        column = "idgames_id" if key.isdigit() else "path"
+        row = self.db().execute(f"SELECT content, fetched FROM metadata WHERE {column} = ?",
+                                (key,)).fetchone()
+        if row is None:
+            return None
+        found = (json.loads(row[0]), row[1])
+        with self._lock:
+            self._memory[key] = found
+        return found
+
+    def cached(self, key):
+        """Cached content for a path or id whatever its age, or None"""
+        found = self._lookup(key)
+        return None if found is None else found[0]
+
+    def fresh(self, key):
+        """Cached content fetched within TTL, or None"""
+        found = self._lookup(key)
+        if found is None or time.time() - found[1] > self.ttl:
+            return None
+        return found[0]
+
+    def put(self, path, content):
+        fetched = time.time()
+        db = self.db()
+        with db:
+            db.execute("INSERT OR REPLACE INTO metadata (path, idgames_id, content, fetched) "
+                       "VALUES (?, ?, ?, ?)",
+                       (path, content.get('id'), json.dumps(content), fetched))
+        with self._lock:
+            self._memory[path] = (content, fetched)
+            if content.get('id') is not None:
+                self._memory[str(content['id'])] = (content, fetched)
+        return content
+
+    def get(self, key, client):
+        """Content for a path or id, from the API with an httpx.Client
+        when it isn't cached (or the cached one is {})"""
+        content = self.cached(key)
+        if content:
+            return content
+        content = idgames.get_file_info(key, client)
+        path = content.get('dir', '').lstrip('/') + content.get('filename', '')
+        return self.put(path or str(key), content)
+
+    def clear(self):
+        db = self.db()
+        with db:
+            db.execute("DELETE FROM metadata")
+        with self._lock:
+            self._memory.clear()
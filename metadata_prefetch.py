@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: metadata_prefetch.py
+Description: Fetches the idGames API's file info for every file of the
+             folder being browsed in the background, a few at a time and
+             politely rate limited, into a MetadataCache.
+Author: InZane84
+License: MIT
+"""
+import time, threading, queue
+from collections import deque
+import httpx
+import http_client
+import idgames
+from progressive_draw import FRAME_BUDGET
+
+# requests at once, and at most this many a second between them all
+WORKERS = 4
+RATE = 4.0
+
+# seconds to back off when the API says 429/503 without a Retry-After
+PAUSE = 30.0
+
+
+class RateLimit:
+    """Spaces out wait() returns to `rate` a second across threads"""
+
+    def __init__(self, rate=RATE):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        time.sleep(at - now)
+
+    def pause(self, seconds):
+        """Nothing goes out for `seconds`"""
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+class MetadataPrefetcher:
+    """Worker threads working through a queue of archive paths.
+
+    start() replaces the queue with a new folder's files, prioritize()
+    puts some (the rows on screen) at the front. Paths with fresh cached
+    info are skipped. Every fetched file is stored in the cache and
+    on_info(path, content) is queued for step(), which the render loop
+    calls every frame so on_info may touch the UI.
+    """
+
+    def __init__(self, cache, on_info, workers=WORKERS, rate=RATE, client=None):
+        self.cache = cache
+        self.on_info = on_info
+        self.workers = workers
+        self.rate = RateLimit(rate)
+        self.client = client
+        self.done = queue.SimpleQueue()
+        self._cond = threading.Condition()
+        self._pending = deque()
+        self._inflight = set()
+        self._threads = []
+        self._closed = False
+
+    def start(self, paths):
+        """Prefetch these paths (in order) instead of the previous ones"""
+        with self._cond:
+            self._pending = deque(paths)
+            self._cond.notify_all()
+        self._spawn()
+
+    def prioritize(self, paths):
+        """Fetch these before anything else queued"""
+        with self._cond:
+            self._pending.extendleft(reversed(paths))
+            self._cond.notify_all()
+        self._spawn()
+
+    def cancel(self):
+        with self._cond:
+            self._pending.clear()
+
+    def _spawn(self):
+        # a worker that died somehow gets replaced
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name="metadata_prefetch",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _next_path(self):
+        """Next path to fetch, None when closed"""
+        with self._cond:
+            while True:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                path = self._pending.popleft()
+                # already being fetched, or queued twice by prioritize()
+                if path not in self._inflight:
+                    self._inflight.add(path)
+                    return path
+
+    def _work(self):
+        while True:
+            path = self._next_path()
+            if path is None:
+                return
+            retry = False
+            try:
+                if self.cache.fresh(path) is None:
+                    retry = self._fetch(path)
+            except Exception as e:
+                # one bad path shouldn't take the worker down with it
+                print(f"MetadataPrefetcher: {path}: {e!r}")
+            finally:
+                with self._cond:
+                    self._inflight.discard(path)
+                    if retry:
+                        self._pending.appendleft(path)
+
+    def _fetch(self, path):
+        """Fetch and cache one file's info, True when it should be tried
+        again later"""
+        self.rate.wait()
+        client = self.client or http_client.get_client()
+        try:
+            content = idgames.get_file_info(path, client)
+        except LookupError:
+            # not in the database (yet), remember that too
+            content = {}
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (429, 503):
+                try:
+                    seconds = float(e.response.headers.get('Retry-After', PAUSE))
+                except ValueError:
+                    seconds = PAUSE
+                print(f"MetadataPrefetcher: backing off for {seconds:.0f}s")
+                self.rate.pause(seconds)
+                return True
+            print(f"MetadataPrefetcher: {path}: {e}")
+            return False
+        except (httpx.HTTPError, ValueError) as e:
+            # ValueError: not JSON, like an HTML maintenance page
+            print(f"MetadataPrefetcher: {path}: {e}")
+            return False
+        self.cache.put(path, content)
+        self.done.put((path, content))
+        return False
+
+    def step(self, budget=FRAME_BUDGET):
+        """Run on_info for fetched files, main thread only"""
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            try:
+                path, content = self.done.get_nowait()
+            except queue.Empty:
+                return
+            self.on_info(path, content)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: mirrors.py
+Description: The idGames mirrors, probed for health and latency and ranked
+             so listings and downloads go to the fastest one that works.
+Author: InZane84
+License: MIT
+"""
+import os, time, threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import http_client
+
+# in order of preference until they've been probed, set
+# DOOM_MAP_SCOPE_MIRRORS to a comma separated list to use others
+DEFAULT_MIRRORS = ["https://mirrors.lug.mtu.edu/idgames/",
+                   "https://www.gamers.org/pub/idgames/",
+                   "https://www.quaddicted.com/files/idgames/",
+                   "https://youfailit.net/pub/idgames/",
+                   "https://ftpmirror1.infania.net/pub/idgames/"]
+
+# seconds a probe may take, and how long its ranking is trusted
+PROBE_TIMEOUT = 3.0
+PROBE_INTERVAL = 600.0
+
+# seconds after a failure before that one mirror is probed again
+RECHECK_DELAY = 30.0
+
+
+def configured_mirrors():
+    urls = os.environ.get("DOOM_MAP_SCOPE_MIRRORS")
+    if not urls:
+        return list(DEFAULT_MIRRORS)
+    return [u.strip().rstrip("/") + "/" for u in urls.split(",") if u.strip()]
+
+
+class MirrorRegistry:
+    """Health and latency of each mirror.
+
+    probe() hits every mirror's root at once and times it. ranked() puts
+    the healthy ones first, fastest first, then the ones not probed yet in
+    configured order, then the broken ones. Anything that fails in use
+    (unreachable, bad certificate, server errors, too slow) is reported
+    with mark_failed() and drops to the back until it's probed again:
+    by itself RECHECK_DELAY seconds later, or by the next full probe,
+    which that starts unless the last one was recent. A 404 is only about
+    one file, the caller tries another mirror without demoting this one.
+    """
+
+    def __init__(self, urls=None, timeout=PROBE_TIMEOUT, interval=PROBE_INTERVAL,
+                 recheck=RECHECK_DELAY, client=None):
+        self.urls = list(urls) if urls else configured_mirrors()
+        self.timeout = timeout
+        self.interval = interval
+        self.recheck = recheck
+        self.client = client
+        self._lock = threading.Lock()
+        self._state = {url: {'healthy': None, 'latency': None, 'error': None}
+                       for url in self.urls}
+        self._probed = 0.0
+        self._probing = None
+        self._rechecks = {}
+
+    def _probe_one(self, url, client):
+        started = time.perf_counter()
+        try:
+            r = client.head(url, timeout=self.timeout)
+            r.raise_for_status()
+            return url, True, time.perf_counter() - started, None
+        except httpx.HTTPError as e:
+            return url, False, None, f"{type(e).__name__}: {e}"
+
+    def probe(self, client=None):
+        """Probe every mirror concurrently, returns the new ranking"""
+        client = client or self.client or http_client.get_client()
+        with ThreadPoolExecutor(max_workers=len(self.urls)) as pool:
+            results = list(pool.map(lambda url: self._probe_one(url, client), self.urls))
+        with self._lock:
+            for url, healthy, latency, error in results:
+                self._state[url] = {'healthy': healthy, 'latency': latency, 'error': error}
+            self._probed = time.time()
+        for url, healthy, latency, error in results:
+            print(f"MirrorRegistry: {url}: " +
+                  (f"{latency * 1000:.0f}ms" if healthy else f"down ({error})"))
+        return self.ranked()
+
+    def probe_mirror(self, url, client=None):
+        """Probe one mirror, True when it's healthy"""
+        client = client or self.client or http_client.get_client()
+        url, healthy, latency, error = self._probe_one(url, client)
+        with self._lock:
+            self._state[url] = {'healthy': healthy, 'latency': latency, 'error': error}
+            self._rechecks.pop(url, None)
+        print(f"MirrorRegistry: {url}: " +
+              (f"{latency * 1000:.0f}ms, back" if healthy else f"still down ({error})"))
+        return healthy
+
+    def recheck_later(self, url):
+        """probe_mirror() a failed mirror after RECHECK_DELAY seconds,
+        once however often it fails meanwhile"""
+        with self._lock:
+            if url in self._rechecks:
+                return
+            timer = threading.Timer(self.recheck, self.probe_mirror, args=(url,))
+            timer.daemon = True
+            self._rechecks[url] = timer
+        timer.start()
+
+    def probe_in_background(self):
+        """Start a probe on a daemon thread unless the last one is recent
+        or one is already running"""
+        with self._lock:
+            if self._probing is not None and self._probing.is_alive():
+                return
+            if time.time() - self._probed < self.interval:
+                return
+            self._probing = threading.Thread(target=self.probe, name="mirror_probe",
+                                             daemon=True)
+            self._probing.start()
+
+    def ranked(self):
+        """Mirror URLs, best first"""
+        with self._lock:
+            def rank(url):
+                state = self._state[url]
+                if state['healthy']:
+                    return (0, state['latency'], 0)
+                if state['healthy'] is None:
+                    return (1, 0, self.urls.index(url))
+                return (2, 0, self.urls.index(url))
+            return sorted(self.urls, key=rank)
+
+    def best(self, exclude=()):
+        """Best mirror not in exclude (the ones a request already tried),
+        the best one overall when they've all been tried"""
+        ranked = self.ranked()
+        return next((url for url in ranked if url not in exclude), ranked[0])
+
+    def status(self, url):
+        with self._lock:
+            return dict(self._state[url])
+
+    def mark_failed(self, url, error):
+        """Demote a mirror that just failed us, and probe it again soon so
+        it can come back"""
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code == 404:
+            print(f"MirrorRegistry: {url} doesn't have {error.request.url}")
+            return
+        with self._lock:
+            if url in self._state:
+                self._state[url] = {'healthy': False, 'latency': None,
+                                    'error': f"{type(error).__name__}: {error}"}
+        print(f"MirrorRegistry: {url} failed: {error}")
+        if url in self._state:
+            self.recheck_later(url)
+        self.probe_in_background()
+
+    def mirror_of(self, url):
+        """The mirror a URL is on, or None"""
+        for mirror in self.urls:
+            if url.startswith(mirror):
+                return mirror
+        return None
+
+    def failover_url(self, url, exclude=()):
+        """The same path on the best mirror other than the one url is on
+        (or the ones in exclude), None when there's nowhere healthier to go"""
+        mirror = self.mirror_of(url)
+        if mirror is None:
+            return None
+        for other in self.ranked():
+            if other != mirror and other not in exclude and self.status(other)['healthy'] is not False:
+                return other + url[len(mirror):]
+        return None
+
+
+registry = MirrorRegistry()
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: progressive_draw.py
+Description: Feeds draw calls to DearPyGui a frame at a time from the render
+             loop, so drawing a big map (or playing the 'Delay' reveal)
+             never blocks the UI.
+Author: InZane84
+License: MIT
+"""
+import time
+
+# seconds of each frame that may be spent submitting draw items
+FRAME_BUDGET = 0.008
+
+
+class ProgressiveDraw:
+    """One progressive draw job at a time.
+
+    start() hands over a list of (lines, kwargs) items, step() is called
+    once per frame by the render loop and calls draw(**kwargs) for as many
+    items as the frame budget (and the reveal delay) allows. `lines` is how
+    many linedefs an item stands for, a delay of d seconds shows them at
+    the same pace as sleeping d seconds after every linedef did.
+    """
+
+    def __init__(self, budget=FRAME_BUDGET):
+        self.budget = budget
+        self.cancel()
+
+    def start(self, draw, items, delay=0.0, on_done=None):
+        """Replace whatever is being drawn with a new job"""
+        self.draw = draw
+        self.items = items
+        self.delay = delay
+        self.on_done = on_done
+        self.pos = 0
+        self.shown = 0
+        self.started = time.perf_counter()
+
+    def cancel(self):
+        """Stop the current job, what's been drawn so far stays"""
+        self.draw = None
+        self.items = None
+        self.on_done = None
+
+    @property
+    def busy(self):
+        return self.items is not None
+
+    def progress(self):
+        """(items drawn, items total) of the current job"""
+        if self.items is None:
+            return 0, 0
+        return self.pos, len(self.items)
+
+    def step(self):
+        """Submit this frame's share of the job"""
+        if self.items is None:
+            return
+        now = time.perf_counter()
+        deadline = now + self.budget
+        if self.delay > 0:
+            # linedefs that should be on screen by now
+            allowed = (now - self.started) / self.delay
+        else:
+            allowed = float("inf")
+
+        items = self.items
+        while self.pos < len(items) and self.shown <= allowed:
+            lines, kwargs = items[self.pos]
+            try:
+                self.draw(**kwargs)
+            except Exception as e:
+                # the drawlist went away under us
+                print(f"ProgressiveDraw: cancelled: {e}")
+                self.cancel()
+                return
+            self.pos += 1
+            self.shown += lines
+            if time.perf_counter() >= deadline:
+                break
+
+        if self.pos >= len(items):
+            on_done = self.on_done
+            self.cancel()
+            if on_done:
+                on_done()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: spatial_grid.py
+Description: Uniform grid over line segment bounding boxes, for finding the
+             segments inside a rectangle without looking at every segment.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+
+# segments whose bounding box covers more cells than this aren't put in
+# the grid, they're kept in a short list that's checked on every query
+MAX_SEGMENT_CELLS = 64
+
+
+class SegmentGrid:
+    """Bucket segments by the grid cells their bounding boxes touch.
+
+    grid = SegmentGrid(x1, y1, x2, y2[, cell])
+    grid.query(xmin, ymin, xmax, ymax) -> sorted segment indexes
+
+    The cells are stored CSR style (one sorted array of segment indexes and
+    the offset where each cell starts) so building and querying are a
+    handful of NumPy calls.
+    """
+
+    def __init__(self, x1, y1, x2, y2, cell=None):
+        x1, y1, x2, y2 = (np.asarray(a, dtype=np.float64) for a in (x1, y1, x2, y2))
+        self.bx0 = np.minimum(x1, x2)
+        self.bx1 = np.maximum(x1, x2)
+        self.by0 = np.minimum(y1, y2)
+        self.by1 = np.maximum(y1, y2)
+        count = len(x1)
+
+        if count:
+            self.ox, self.oy = float(self.bx0.min()), float(self.by0.min())
+            w = float(self.bx1.max()) - self.ox
+            h = float(self.by1.max()) - self.oy
+        else:
+            self.ox = self.oy = 0.0
+            w = h = 0.0
+        if cell is None:
+            # aim for a couple of segments per cell
+            cell = max(np.sqrt(max(w * h, 1.0) / max(count, 1)) * 2, 16.0)
+        self.cell = float(cell)
+        self.nx = int(w // self.cell) + 1
+        self.ny = int(h // self.cell) + 1
+
+        cx0, cy0 = self._cells(self.bx0, self.by0)
+        cx1, cy1 = self._cells(self.bx1, self.by1)
+        spanx = cx1 - cx0 + 1
+        cells = spanx * (cy1 - cy0 + 1)
+
+        small = cells <= MAX_SEGMENT_CELLS
+        self.big = np.flatnonzero(~small)
+
+        # one (cell, segment) pair for every cell a segment's box touches
+        idx = np.flatnonzero(small)
+        counts = cells[idx]
+        seg = np.repeat(idx, counts)
+        local = np.arange(len(seg)) - np.repeat(np.cumsum(counts) - counts, counts)
+        span = spanx[seg]
+        cell_id = (cy0[seg] + local // span) * self.nx + cx0[seg] + local % span
+
+        order = np.argsort(cell_id, kind='stable')
+        self.items = seg[order]
+        self.starts = np.searchsorted(cell_id[order], np.arange(self.nx * self.ny + 1))
+
+    def _cells(self, x, y):
+        cx = ((x - self.ox) // self.cell).astype(np.int64)
+        cy = ((y - self.oy) // self.cell).astype(np.int64)
+        return np.clip(cx, 0, self.nx - 1), np.clip(cy, 0, self.ny - 1)
+
+    def __len__(self):
+        return len(self.bx0)
+
+    def query(self, xmin, ymin, xmax, ymax):
+        """Indexes of the segments whose bounding box intersects the rect"""
+        if not len(self) or xmax < self.ox or ymax < self.oy:
+            return np.zeros(0, dtype=np.int64)
+        (cx0, cx1), (cy0, cy1) = self._cells(np.array([xmin, xmax]), np.array([ymin, ymax]))
+        cx0, cx1, cy0, cy1 = int(cx0), int(cx1), int(cy0), int(cy1)
+
+        # a row of cells is a contiguous slice of items
+        parts = [self.items[self.starts[row + cx0]:self.starts[row + cx1 + 1]]
+                 for row in range(cy0 * self.nx, cy1 * self.nx + 1, self.nx)]
+        parts.append(self.big)
+        found = np.unique(np.concatenate(parts))
+
+        hit = ((self.bx0[found] <= xmax) & (self.bx1[found] >= xmin) &
+               (self.by0[found] <= ymax) & (self.by1[found] >= ymin))
+        return found[hit]
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_archive_index.py
+Description: Crawling fake mirrors into an ArchiveIndex and searching it.
+Author: InZane84
+License: MIT
+"""
+import httpx
+import pytest
+import archive_index
+import mirrors
+from archive_index import ArchiveIndex
+
+MIRRORS = ["https://one.example/idgames/", "https://two.example/idgames/"]
+
+
+def listing(*names):
+    links = "".join(f'<a href="{name}">{name}</a>  2005-01-01 12:00  1.2K\n' for name in names)
+    return f"<html><body><pre>{links}</pre></body></html>"
+
+
+class FakeArchive:
+    """Serves dir listings from a dict of path -> names on every mirror,
+    paths that aren't in it 404"""
+
+    def __init__(self, dirs, api=None):
+        self.dirs = dirs
+        self.api = api
+        self.requests = []
+
+    def __call__(self, request):
+        url = str(request.url)
+        self.requests.append(url)
+        if url.startswith("https://doomworld.com/"):
+            return self.api(request)
+        for mirror in MIRRORS:
+            if url.startswith(mirror):
+                path = url[len(mirror):]
+                if path in self.dirs:
+                    return httpx.Response(200, text=listing(*self.dirs[path]))
+        return httpx.Response(404, text="not here")
+
+
+@pytest.fixture(autouse=True)
+def fake_mirrors(monkeypatch):
+    registry = mirrors.MirrorRegistry(MIRRORS)
+    registry.probe_in_background = lambda: None
+    registry.recheck_later = lambda url: None
+    monkeypatch.setattr(mirrors, "registry", registry)
+    monkeypatch.setattr(archive_index, "CRAWL_DELAY", 0)
+    return registry
+
+
+def crawl(index, archive, **kwargs):
+    client = httpx.Client(transport=httpx.MockTransport(archive))
+    return index.crawl(client=client, **kwargs)
+
+
+def test_crawl_and_search(tmp_path):
+    index = ArchiveIndex(tmp_path / "archive.sqlite")
+    archive = FakeArchive({"": ["levels/"],
+                           "levels/": ["doom2/"],
+                           "levels/doom2/": ["scythe.zip", "scythe2.zip", "readme.txt"]})
+    assert crawl(index, archive) == (3, 3)
+    assert index.file_count() == 2
+    found = index.search("scythe2")
+    assert [f['path'] for f in found] == ["levels/doom2/scythe2.zip"]
+    assert found[0]['size'] == 1228
+    assert found[0]['date'] == "2005-01-01 12:00"
+    assert len(index.search("scy")) == 2
+
+
+def test_gone_dir_is_dropped_and_crawl_goes_on(tmp_path):
+    index = ArchiveIndex(tmp_path / "archive.sqlite")
+    dirs = {"": ["gone/", "levels/"],
+            "gone/": ["old.zip"],
+            "levels/": ["new.zip"]}
+    crawl(index, FakeArchive(dirs))
+    assert index.file_count() == 2
+
+    # still linked from the root, but every mirror 404s it now
+    del dirs["gone/"]
+    done, changed = crawl(index, FakeArchive(dirs))
+    assert done == 2
+    assert [f['path'] for f in index.search("new")] == ["levels/new.zip"]
+    assert index.search("old") == []
+    assert index.db().execute("SELECT count(*) FROM dirs WHERE path = 'gone/'").fetchone()[0] == 0
+    # a 404 isn't the mirror's fault
+    assert all(mirrors.registry.status(m)['healthy'] is None for m in MIRRORS)
+
+
+def test_unreachable_mirrors_stop_the_crawl(tmp_path):
+    index = ArchiveIndex(tmp_path / "archive.sqlite")
+
+    def down(request):
+        raise httpx.ConnectError("down", request=request)
+
+    assert crawl(index, down) == (0, 0)
+    assert all(mirrors.registry.status(m)['healthy'] is False for m in MIRRORS)
+
+
+def test_metadata_failure_keeps_listing(tmp_path):
+    index = ArchiveIndex(tmp_path / "archive.sqlite")
+    archive = FakeArchive({"": ["levels/"], "levels/": ["foo.zip", "bar.zip"]},
+                          api=lambda request: httpx.Response(200, text="<html>maintenance</html>"))
+    assert crawl(index, archive, metadata=True) == (2, 2)
+    assert index.file_count() == 2
+
+
+def test_metadata_fills_titles(tmp_path):
+    index = ArchiveIndex(tmp_path / "archive.sqlite")
+
+    def api(request):
+        return httpx.Response(200, json={'content': {'file': {
+            'id': 42, 'dir': 'levels/', 'filename': 'foo.zip',
+            'title': 'Foo Episode', 'author': 'Somebody'}}})
+
+    archive = FakeArchive({"": ["levels/"], "levels/": ["foo.zip"]}, api=api)
+    crawl(index, archive, metadata=True)
+    found = index.search("episode")
+    assert found[0]['idgames_id'] == 42
+    assert found[0]['author'] == "Somebody"
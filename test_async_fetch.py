@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_async_fetch.py
+Description: AsyncFetcher handing results back through step().
+Author: InZane84
+License: MIT
+"""
+import time, asyncio
+import httpx
+import pytest
+import http_client
+import idgames
+from async_fetch import AsyncFetcher
+from listing_cache import ListingCache
+
+PAGE = (b'<pre><a href="foo.zip">foo.zip</a>  02-Feb-2006 11:30  12K\n'
+        b'<a href="bar.zip">bar.zip</a>  03-Mar-2007 12:00  1K\n</pre>')
+
+
+async def handler(request):
+    if request.url.path == "/slow":
+        await asyncio.sleep(0.5)
+    if request.url.path == "/missing":
+        return httpx.Response(404)
+    return httpx.Response(200, content=PAGE)
+
+
+@pytest.fixture
+def fetcher(monkeypatch):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(http_client, "_async_client", client)
+    fetcher = AsyncFetcher()
+    yield fetcher
+    fetcher.close()
+
+
+def run_until(fetcher, check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        fetcher.step()
+        if check():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_fetch(fetcher):
+    results = []
+    fetcher.fetch("https://mirror.example/", lambda *a: results.append(a),
+                  parse=idgames.parse_listing)
+    assert fetcher.busy
+    assert run_until(fetcher, lambda: results)
+    url, entries, error = results[0]
+    assert error is None and [e['name'] for e in entries] == ["foo.zip", "bar.zip"]
+    assert not fetcher.busy
+
+
+def test_error_handed_over(fetcher):
+    results = []
+    fetcher.fetch("https://mirror.example/missing", lambda *a: results.append(a))
+    assert run_until(fetcher, lambda: results)
+    assert isinstance(results[0][2], httpx.HTTPStatusError)
+
+
+def test_newest_wins(fetcher):
+    results = []
+    fetcher.fetch("https://mirror.example/slow", lambda *a: results.append(a))
+    fetcher.fetch("https://mirror.example/", lambda *a: results.append(a))
+    assert run_until(fetcher, lambda: results)
+    time.sleep(0.6)
+    fetcher.step()
+    assert [url for url, _, _ in results] == ["https://mirror.example/"]
+
+
+def test_stream_through_cache(fetcher):
+    url = "https://mirror.example/"
+    rows, results = [], []
+    cache = ListingCache(None)
+    fetcher.stream(url, idgames.ListingParser(url), lambda u, batch: rows.extend(batch),
+                   lambda *a: results.append(a), cache)
+    assert run_until(fetcher, lambda: results)
+    assert rows == results[0][1]
+    assert cache.fresh(url) == rows
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_atlas.py
+Description: The streaming PNG writer and the atlas sheet layout.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+import pytest
+from PIL import Image
+import atlas
+import drawmaps
+from atlas import PngWriter, export_atlas, GAP
+
+
+def test_png_writer_round_trip(tmp_path):
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 255, (37, 23, 3), dtype=np.uint8)
+    png = PngWriter(tmp_path / "out.png", 23, 37)
+    for start in range(0, 37, 10):
+        png.write(pixels[start:start + 10])
+    png.close()
+    with Image.open(tmp_path / "out.png") as im:
+        assert (np.asarray(im.convert('RGB')) == pixels).all()
+
+
+def test_png_writer_wants_every_row(tmp_path):
+    png = PngWriter(tmp_path / "out.png", 4, 4)
+    png.write(np.zeros((2, 4, 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        png.close()
+    png.file.close()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_export_atlas(make_wad, tmp_path, workers):
+    wad = make_wad(maps=("MAP01", "MAP02", "MAP03", "MAP04", "MAP05"))
+    out = tmp_path / "atlas.png"
+    maps, width, height = export_atlas(str(wad), str(out), size=120, workers=workers)
+    assert maps == 5
+    # 3 x 2 cells with gaps around them
+    assert (width, height) == (3 * 120 + 4 * GAP, 2 * 120 + 3 * GAP)
+    with Image.open(out) as im:
+        sheet = np.asarray(im.convert('RGB'))
+    assert sheet.shape == (height, width, 3)
+
+    # every cell is what drawcell draws, the empty sixth one is background
+    for i, name in enumerate(["MAP01", "MAP02", "MAP03", "MAP04", "MAP05", None]):
+        x = GAP + (i % 3) * (120 + GAP)
+        y = GAP + (i // 3) * (120 + GAP)
+        cell = sheet[y:y + 120, x:x + 120]
+        if name is None:
+            assert (cell == atlas.BACKGROUND).all()
+        else:
+            index, pixels = atlas.drawcell(atlas.Cell(i, str(wad), name, 120, drawmaps.Options()))
+            assert (cell == pixels).all()
+
+
+def test_findmaps(make_wad):
+    wad = make_wad(maps=("MAP01", "MAP02", "MAP10"))
+    assert atlas.findmaps(str(wad), ("MAP1*", "MAP0*")) == ["MAP10", "MAP01", "MAP02"]
+    assert export_atlas(str(wad), "unused.png", patterns=("E1M*",)) == (0, 0, 0)
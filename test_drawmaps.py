@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_drawmaps.py
+Description: drawmaps.py's batch jobs and render engines.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+import pytest
+from PIL import Image
+import drawmaps
+from drawmaps import Options
+
+
+def test_findjobs(make_wad, tmp_path):
+    one = make_wad(maps=("MAP01", "MAP02", "MAP10"), name="one.wad")
+    two = make_wad(maps=("MAP01",), name="two.wad")
+    jobs = drawmaps.findjobs([str(one)], ["MAP0*"], 500, 0, Options(), str(tmp_path))
+    assert [j.name for j in jobs] == ["MAP01", "MAP02"]
+    assert jobs[0].filename == str(tmp_path / "MAP01.png")
+
+    # several WADs get their name on the images, patterns don't repeat maps
+    jobs = drawmaps.findjobs([str(one), str(two)], ["MAP01", "MAP*"], 500, 0, Options(),
+                             str(tmp_path))
+    assert [j.name for j in jobs] == ["MAP01", "MAP02", "MAP10", "MAP01"]
+    assert jobs[-1].filename == str(tmp_path / "two_MAP01.png")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_drawbatch(make_wad, tmp_path, workers):
+    wad = make_wad(maps=("MAP01", "MAP02", "MAP03"))
+    jobs = drawmaps.findjobs([str(wad)], ["*"], 300, 0, Options(), str(tmp_path))
+    results = list(drawmaps.drawbatch(jobs, workers=workers))
+    assert sorted(r.name for r in results) == ["MAP01", "MAP02", "MAP03"]
+    for result in results:
+        with Image.open(result.filename) as im:
+            assert im.size == (result.xsize, result.ysize)
+            assert max(im.size) <= 300
+
+
+@pytest.mark.parametrize("size", [200, 700])
+def test_raster_engine_matches_pillow(make_wad, size):
+    wad = drawmaps.MappedWAD(str(make_wad(rooms=40)))
+    raster, scale = drawmaps.rendermap(wad, "MAP01", size, 0, Options(engine="raster"))
+    pillow, pillow_scale = drawmaps.rendermap(wad, "MAP01", size, 0, Options(engine="pillow"))
+    assert scale == pillow_scale
+    assert raster.size == pillow.size
+    assert (np.asarray(raster.convert('RGB')) == np.asarray(pillow)).all()
+    wad.release()
+
+
+def test_spawn_sprites_are_drawn_once(make_wad):
+    wad = drawmaps.MappedWAD(str(make_wad()))
+    drawmaps.spawnsprite.cache_clear()
+    im, scale = drawmaps.rendermap(wad, "MAP01", 400, 0, Options(dmspawns=True))
+    drawmaps.rendermap(wad, "MAP01", 400, 0, Options(dmspawns=True))
+    info = drawmaps.spawnsprite.cache_info()
+    # the generated map has deathmatch starts (type 11), all at angle 90
+    assert info.misses == 1
+    assert info.hits >= 1
+    sprite, half = drawmaps.spawnsprite(drawmaps.dmtcol, 90, False, False)
+    assert sprite.size == (half * 2 + 1, half * 2 + 1)
+    assert sprite.getpixel((half, half)) == drawmaps.dmtcol + (255,)
+
+    # spots are drawn on the map in green (give or take the anti-aliasing)
+    pixels = np.asarray(im.convert('RGB')).reshape(-1, 3).astype(int)
+    assert (np.abs(pixels - drawmaps.dmtcol) < 16).all(axis=1).any()
+    wad.release()
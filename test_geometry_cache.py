@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_geometry_cache.py
+Description: GeometryCache keys, round trips and eviction.
+Author: InZane84
+License: MIT
+"""
+import os
+import numpy as np
+import geometry_cache
+from geometry_cache import GeometryCache, map_digest
+from map_geometry import MapGeometry
+from wadfile_buffer import MappedWAD, BufferWAD
+
+
+def test_digest_is_of_the_maps_only(make_wad, tmp_path):
+    path = make_wad(extra={"MUSIC": b"a" * 4096})
+    wad = MappedWAD(path)
+    digest = map_digest(wad)
+    wad.release()
+
+    # a non-map lump edited in place (same size and spot) doesn't matter
+    data = path.read_bytes()
+    path.write_bytes(data.replace(b"a" * 4096, b"b" * 4096))
+    wad = MappedWAD(path)
+    assert map_digest(wad) == digest
+    wad.release()
+
+    # the same WAD in memory has the same digest
+    assert map_digest(BufferWAD(path.read_bytes())) == digest
+
+    # resizing it moves things in the directory
+    other = make_wad(extra={"MUSIC": b"a" * 100}, name="other.wad")
+    assert map_digest(BufferWAD(other.read_bytes())) != digest
+
+
+def test_digest_changes_with_the_map(make_wad):
+    one = BufferWAD(make_wad(seed=0, name="one.wad").read_bytes())
+    two = BufferWAD(make_wad(seed=1, name="two.wad").read_bytes())
+    assert map_digest(one) != map_digest(two)
+
+
+def test_wad_digest_remembers_files(make_wad, tmp_path, monkeypatch):
+    cache = GeometryCache(tmp_path / "geometry")
+    path = make_wad()
+    wad = MappedWAD(path)
+    digest = cache.wad_digest(wad)
+
+    calls = []
+    monkeypatch.setattr(geometry_cache, "map_digest", lambda wad: calls.append(wad) or "x")
+    assert GeometryCache(tmp_path / "geometry").wad_digest(wad) == digest
+    assert not calls
+
+    # touched, so hashed again
+    os.utime(path, ns=(0, 0))
+    assert cache.wad_digest(wad) == "x"
+    wad.release()
+
+
+def test_store_and_load(make_wad, tmp_path):
+    cache = GeometryCache(tmp_path / "geometry")
+    wad = MappedWAD(make_wad())
+    geometry = MapGeometry.from_wad(wad, "MAP01")
+    digest = cache.wad_digest(wad)
+    assert cache.load(digest, "MAP01") is None
+    cache.store(digest, geometry)
+
+    loaded = GeometryCache(tmp_path / "geometry").load(digest, "MAP01")
+    for name in MapGeometry.ARRAYS:
+        assert np.array_equal(getattr(loaded, name), getattr(geometry, name))
+    assert loaded.bounds() == geometry.bounds()
+    assert loaded.num_sectors == geometry.num_sectors
+    assert loaded.namespace == "Doom"
+    wad.release()
+
+
+def test_corrupt_entry_is_dropped(tmp_path):
+    cache = GeometryCache(tmp_path / "geometry")
+    path = cache.path_for("abc", "MAP01")
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"not a zip")
+    assert cache.load("abc", "MAP01") is None
+    assert not path.exists()
+
+
+def test_evicts_least_recently_used(make_wad, tmp_path):
+    wad = MappedWAD(make_wad(maps=("MAP01", "MAP02", "MAP03")))
+    geometries = [MapGeometry.from_wad(wad, name) for name in ("MAP01", "MAP02", "MAP03")]
+    cache = GeometryCache(tmp_path / "geometry")
+    cache.store("abc", geometries[0])
+    size = cache.path_for("abc", "MAP01").stat().st_size
+    cache.max_size = size * 2.5
+
+    cache.store("abc", geometries[1])
+    # MAP01 used last, so MAP02 is the one to go
+    cache.load("abc", "MAP01")
+    cache.store("abc", geometries[2])
+    assert cache.load("abc", "MAP02") is None
+    assert cache.load("abc", "MAP01") is not None
+    assert cache.load("abc", "MAP03") is not None
+    wad.release()
+
+
+def test_old_versions_are_removed(tmp_path):
+    cache_dir = tmp_path / "geometry"
+    cache_dir.mkdir()
+    old = cache_dir / "abc_MAP01.v0.npz"
+    old.write_bytes(b"old")
+    GeometryCache(cache_dir).evict()
+    assert not old.exists()
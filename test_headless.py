@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_headless.py
+Description: The headless CLI and the wadinfo helpers it's built on.
+Author: InZane84
+License: MIT
+"""
+import os, sys, json, subprocess
+import pytest
+import headless
+import wadinfo
+from map_geometry import MapGeometry
+from wadfile_buffer import MappedWAD
+
+
+def test_identify_game():
+    assert wadinfo.identify_game("E1M1") == "DOOM"
+    assert wadinfo.identify_game("MAP01") == "DOOM2"
+    assert wadinfo.identify_game("FOO") == "UNKNOWN/UNSUPPORTED"
+    assert wadinfo.find_map_ids(["MAP01", "MAP02", "MAPXX"], "DOOM2") == ["MAP01", "MAP02"]
+
+
+def test_wad_map_ids(make_wad):
+    wad = MappedWAD(make_wad(maps=("E1M1", "E1M2")))
+    assert wadinfo.wad_map_ids(wad) == ("DOOM", ["E1M1", "E1M2"])
+    wad.release()
+
+
+def test_open_source(make_wad):
+    path = str(make_wad())
+    wad, label = wadinfo.open_source(path)
+    assert label == path
+    assert list(wad.maps) == ["MAP01"]
+    wad.release()
+    with pytest.raises(FileNotFoundError):
+        wadinfo.open_source("no/such/file.wad")
+
+
+def test_map_stats(make_wad):
+    wad = MappedWAD(make_wad(rooms=3))
+    stats = wadinfo.map_stats(MapGeometry.from_wad(wad, "MAP01"))
+    assert stats['linedefs'] == 24
+    assert stats['vertexes'] == 24
+    assert stats['things'] == 10
+    assert stats['bounds']['xmin'] < stats['bounds']['xmax']
+    wad.release()
+
+
+def test_doesnt_load_the_gui():
+    code = "import sys, headless; sys.exit('dearpygui' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code],
+                          cwd=os.path.dirname(os.path.abspath(headless.__file__))).returncode == 0
+
+
+def test_main_renders_and_writes_stats(make_wad, tmp_path):
+    path = str(make_wad(maps=("MAP01", "MAP02")))
+    out = tmp_path / "out"
+    report = headless.main(["-o", str(out), "-s", "200", path])
+    assert [m['name'] for m in report['maps']] == ["MAP01", "MAP02"]
+    assert report['game'] == "DOOM2"
+    assert (out / "MAP01.png").exists()
+    with open(out / "stats.json") as f:
+        assert json.load(f)['map_ids'] == ["MAP01", "MAP02"]
+
+
+def test_main_stats_only(make_wad, tmp_path, capsys):
+    path = str(make_wad(maps=("MAP01", "MAP02")))
+    headless.main(["-n", "-o", str(tmp_path / "out"), "-j", "-", path, "MAP02"])
+    report = json.loads(capsys.readouterr().out)
+    assert [m['name'] for m in report['maps']] == ["MAP02"]
+    assert 'image' not in report['maps'][0]
+    assert not (tmp_path / "out").exists()
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_http_client.py
+Description: The shared client is reused until closed.
+Author: InZane84
+License: MIT
+"""
+import threading
+import pytest
+import http_client
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(http_client, "_client", None)
+    yield
+    http_client.close_client()
+
+
+def test_one_client_for_all_threads():
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(http_client.get_client()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(map(id, clients))) == 1
+    assert clients[0].headers['User-Agent'] == http_client.USER_AGENT
+
+
+def test_new_client_after_close():
+    client = http_client.get_client()
+    http_client.close_client()
+    assert client.is_closed
+    assert http_client.get_client() is not client
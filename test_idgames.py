@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_idgames.py
+Description: download_file resuming, checking and failing over against
+             fake mirrors.
+Author: InZane84
+License: MIT
+"""
+import hashlib
+import httpx
+import pytest
+import idgames
+from mirrors import MirrorRegistry
+
+FIRST, SECOND = "https://first.example/idgames/", "https://second.example/idgames/"
+DATA = bytes(range(256)) * 1000
+CONTENT = {'dir': 'levels/doom2/a-c/', 'filename': 'foo.zip',
+           'md5': hashlib.md5(DATA).hexdigest()}
+
+
+class FakeMirror:
+    """Serves DATA per host: 'ok' with Range support, 'norange', 'missing'
+    (404), 'down', or 'drop' (cut off after `drop` bytes once)"""
+
+    def __init__(self, modes, drop=idgames.CHUNK_SIZE):
+        self.modes = modes
+        self.drop = drop
+        self.requests = []
+
+    def __call__(self, request):
+        mirror = next(url for url in self.modes if str(request.url).startswith(url))
+        mode = self.modes[mirror]
+        self.requests.append((mirror, request.headers.get('Range')))
+        if mode == 'down':
+            raise httpx.ConnectError("down", request=request)
+        if mode == 'missing':
+            return httpx.Response(404)
+        if mode == 'drop':
+            self.modes[mirror] = 'ok'
+            def cut():
+                yield DATA[:self.drop]
+                raise httpx.ReadError("dropped", request=request)
+            return httpx.Response(200, headers={'Content-Length': str(len(DATA))},
+                                  content=cut())
+        start = 0
+        if request.headers.get('Range') and mode == 'ok':
+            start = int(request.headers['Range'][6:-1])
+            if start >= len(DATA):
+                return httpx.Response(416)
+            return httpx.Response(206, content=DATA[start:])
+        return httpx.Response(200, content=DATA)
+
+
+@pytest.fixture
+def serve():
+    def make(first, second='ok', **kwargs):
+        server = FakeMirror({FIRST: first, SECOND: second}, **kwargs)
+        client = httpx.Client(transport=httpx.MockTransport(server))
+        registry = MirrorRegistry([FIRST, SECOND], client=client)
+        registry.probe_in_background = lambda: None
+        registry.recheck_later = lambda url: None
+        return server, client, registry
+    return make
+
+
+def download(client, registry, path, **kwargs):
+    return idgames.download_file(CONTENT, client, path, registry=registry, **kwargs)
+
+
+def test_download(tmp_path, serve):
+    server, client, registry = serve('ok')
+    seen = []
+    path = tmp_path / "foo.zip"
+    result = download(client, registry, path, progress=lambda done, total: seen.append(done))
+    assert result == (hashlib.sha256(DATA).hexdigest(), len(DATA))
+    assert path.read_bytes() == DATA
+    assert not (tmp_path / "foo.zip.part").exists()
+    assert seen[-1] == len(DATA)
+    assert server.requests == [(FIRST, None)]
+
+
+def test_resumes_part_file(tmp_path, serve):
+    server, client, registry = serve('ok')
+    path = tmp_path / "foo.zip"
+    (tmp_path / "foo.zip.part").write_bytes(DATA[:5000])
+    assert download(client, registry, path)[1] == len(DATA)
+    assert path.read_bytes() == DATA
+    assert server.requests == [(FIRST, "bytes=5000-")]
+
+
+def test_resumes_dropped_connection(tmp_path, serve):
+    server, client, registry = serve('drop')
+    path = tmp_path / "foo.zip"
+    download(client, registry, path)
+    assert path.read_bytes() == DATA
+    # a dropped read isn't the mirror's fault, it's asked again
+    assert server.requests == [(FIRST, None), (FIRST, f"bytes={idgames.CHUNK_SIZE}-")]
+
+
+def test_complete_part_file(tmp_path, serve):
+    server, client, registry = serve('ok')
+    path = tmp_path / "foo.zip"
+    (tmp_path / "foo.zip.part").write_bytes(DATA)
+    assert download(client, registry, path) == (hashlib.sha256(DATA).hexdigest(), len(DATA))
+    assert path.read_bytes() == DATA
+
+
+def test_no_range_support_starts_over(tmp_path, serve):
+    server, client, registry = serve('norange')
+    path = tmp_path / "foo.zip"
+    (tmp_path / "foo.zip.part").write_bytes(b"junk" * 100)
+    download(client, registry, path)
+    assert path.read_bytes() == DATA
+
+
+def test_md5_mismatch_removes_part(tmp_path, serve):
+    server, client, registry = serve('ok')
+    path = tmp_path / "foo.zip"
+    # a part file from some other version of the zip
+    (tmp_path / "foo.zip.part").write_bytes(b"x" * 5000)
+    with pytest.raises(ValueError):
+        download(client, registry, path)
+    assert not path.exists()
+    assert not (tmp_path / "foo.zip.part").exists()
+
+
+@pytest.mark.parametrize("mode", ["missing", "down"])
+def test_fails_over(tmp_path, serve, mode):
+    server, client, registry = serve(mode)
+    path = tmp_path / "foo.zip"
+    download(client, registry, path)
+    assert path.read_bytes() == DATA
+    assert [mirror for mirror, _ in server.requests] == [FIRST, SECOND]
+    # only an unreachable mirror is demoted, the 404 was about this file
+    assert (registry.best() == SECOND) == (mode == "down")
+
+
+def test_resumes_on_another_mirror(tmp_path, serve):
+    server, client, registry = serve('ok')
+    path = tmp_path / "foo.zip"
+    (tmp_path / "foo.zip.part").write_bytes(DATA[:5000])
+    server.modes[FIRST] = 'down'
+    download(client, registry, path)
+    assert path.read_bytes() == DATA
+    assert server.requests[-1] == (SECOND, "bytes=5000-")
+
+
+def test_every_mirror_failing(tmp_path, serve):
+    server, client, registry = serve('missing', 'missing')
+    with pytest.raises(httpx.HTTPStatusError):
+        download(client, registry, tmp_path / "foo.zip")
+
+
+APACHE = b"""<table>
+<tr><th><a href="?C=N;O=D">Name</a></th><th><a href="?C=M;O=A">Last modified</a></th>
+<th><a href="?C=S;O=A">Size</a></th><th><a href="?C=D;O=A">Description</a></th></tr>
+<tr><td><a href="/idgames/levels/">Parent Directory</a></td><td>&nbsp;</td><td align="right">-</td></tr>
+<tr><td><a href="a-c/">a-c/</a></td><td align="right">2005-01-01 10:00</td><td align="right">-</td></tr>
+<tr><td><a href="foo.zip">foo.zip</a></td><td align="right">2006-02-02 11:30</td><td align="right">1.5M</td><td>Episode 2 of 3</td></tr>
+<tr><td><a href="foo.txt">foo.txt</a></td><td align="right">2006-02-02 11:30</td><td align="right">812</td><td>&nbsp;</td></tr>
+</table>"""
+
+NGINX = b"""<html><body><h1>Index of /idgames/levels/doom2/</h1><hr><pre><a href="../">../</a>
+<a href="a-c/">a-c/</a>                                               01-Jan-2005 10:00                   -
+<a href="foo.zip">foo.zip</a>                                            02-Feb-2006 11:30               12K
+<a href="foo.txt">foo.txt</a>                                            02-Feb-2006 11:30               812
+</pre><hr></body></html>"""
+
+LISTED = [("a-c/", True, None, "2005-01-01 10:00"),
+          ("foo.zip", False, None, "2006-02-02 11:30"),
+          ("foo.txt", False, 812, "2006-02-02 11:30")]
+
+
+def summary(entries):
+    return [(e['name'], e['is_folder'], e['size'], e['date']) for e in entries]
+
+
+@pytest.mark.parametrize("page, zip_size", [(APACHE, int(1.5 * 1024**2)), (NGINX, 12 * 1024)])
+def test_parse_listing(page, zip_size):
+    url = "https://mirror.example/idgames/levels/doom2/"
+    entries = idgames.parse_listing(page, url)
+    expected = [(name, folder, zip_size if name == "foo.zip" else size, date)
+                for name, folder, size, date in LISTED]
+    assert summary(entries) == expected
+    assert entries[0]['url'] == url + "a-c/"
+    assert entries[0]['type'] == 'folder' and entries[1]['type'] == 'file'
+
+
+@pytest.mark.parametrize("page", [APACHE, NGINX])
+def test_parser_fed_byte_by_byte(page):
+    url = "https://mirror.example/idgames/levels/doom2/"
+    parser = idgames.ListingParser(url)
+    taken = []
+    for i in range(len(page)):
+        parser.feed(page[i:i + 1])
+        taken += parser.take()
+    parser.close()
+    taken += parser.take()
+    assert taken == idgames.parse_listing(page, url)
+
+
+def test_parser_multibyte_split():
+    page = '<pre><a href="café.zip">café.zip</a> 02-Feb-2006 11:30 1K\n</pre>'.encode()
+    parser = idgames.ListingParser("https://mirror.example/")
+    for i in range(len(page)):
+        parser.feed(page[i:i + 1])
+    parser.close()
+    assert parser.entries[0]['name'] == "café.zip"
+    assert parser.entries[0]['size'] == 1024
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_listing_cache.py
+Description: ListingCache revalidation and its delayed saves.
+Author: InZane84
+License: MIT
+"""
+import json, asyncio
+import httpx
+import pytest
+import idgames
+import listing_cache
+from listing_cache import ListingCache
+
+URL = "https://mirror.example/idgames/levels/doom2/"
+PAGE = (b'<pre><a href="../">../</a>\n'
+        b'<a href="a-c/">a-c/</a>     01-Jan-2005 10:00    -\n'
+        b'<a href="foo.zip">foo.zip</a>  02-Feb-2006 11:30  12K\n</pre>')
+
+
+class FakeServer:
+    """The listing page with an ETag, 304 when asked with it"""
+
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request):
+        self.requests.append(request.headers.get('If-None-Match'))
+        if request.headers.get('If-None-Match') == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=PAGE, headers={'ETag': '"v1"'})
+
+
+@pytest.fixture(autouse=True)
+def no_timer(monkeypatch):
+    # saves only happen when a test flushes
+    monkeypatch.setattr(listing_cache, "SAVE_DELAY", 3600.0)
+
+
+def test_fresh_then_revalidated(tmp_path):
+    server = FakeServer()
+    client = httpx.Client(transport=httpx.MockTransport(server))
+    cache = ListingCache(tmp_path / "listings.json")
+    entries = cache.get(client, URL, idgames.parse_listing)
+    assert [e['name'] for e in entries] == ["a-c/", "foo.zip"]
+    assert cache.get(client, URL, idgames.parse_listing) == entries
+    assert server.requests == [None]
+
+    # past the TTL the server is asked, a 304 keeps the entries
+    cache.ttl = 0
+    assert cache.get(client, URL, idgames.parse_listing) == entries
+    assert server.requests == [None, '"v1"']
+
+
+def test_saved_on_flush(tmp_path):
+    path = tmp_path / "listings.json"
+    client = httpx.Client(transport=httpx.MockTransport(FakeServer()))
+    cache = ListingCache(path)
+    entries = cache.get(client, URL, idgames.parse_listing)
+    assert not path.exists()
+    cache.flush()
+    assert ListingCache(path).fresh(URL) == entries
+
+    # a 304 isn't written
+    mtime = path.stat().st_mtime_ns
+    cache.ttl = 0
+    cache.get(client, URL, idgames.parse_listing)
+    cache.flush()
+    assert path.stat().st_mtime_ns == mtime
+
+
+def test_old_version_ignored(tmp_path):
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps({'version': listing_cache.CACHE_VERSION - 1,
+                                'listings': {URL: {'entries': [], 'checked': 1e12}}}))
+    assert ListingCache(path).fresh(URL) is None
+
+
+def test_least_recently_used_dropped():
+    client = httpx.Client(transport=httpx.MockTransport(FakeServer()))
+    cache = ListingCache(None, max_listings=2)
+    for name in ("a", "b"):
+        cache.get(client, URL + name, idgames.parse_listing)
+    cache.fresh(URL + "a")
+    cache.get(client, URL + "c", idgames.parse_listing)
+    assert cache.fresh(URL + "b") is None
+    assert cache.fresh(URL + "a") and cache.fresh(URL + "c")
+
+
+def test_stream_async():
+    server = FakeServer()
+    cache = ListingCache(None)
+    batches = []
+
+    async def fetch():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(server)) as client:
+            first = await cache.stream_async(client, URL, idgames.ListingParser(URL),
+                                             batches.append)
+            cache.ttl = 0
+            again = await cache.stream_async(client, URL, idgames.ListingParser(URL),
+                                             batches.append)
+            return first, again
+
+    first, again = asyncio.run(fetch())
+    assert [e['name'] for batch in batches for e in batch] == ["a-c/", "foo.zip"]
+    assert again == first
+    assert server.requests == [None, '"v1"']
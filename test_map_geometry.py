@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_map_geometry.py
+Description: MapGeometry decoding against omgifol's MapEditor.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+from omg import WAD
+from omg.mapedit import MapEditor
+from map_geometry import (MapGeometry, chain_segments, STYLE_ONESIDED, STYLE_TWOSIDED,
+                          STYLE_SPECIAL, STYLE_TAGGED, TWOSIDED_FLAG)
+from wadfile_buffer import MappedWAD
+
+
+def geometry(v1, v2, flags=None, special=None, tag=None, vx=(0, 10, 10, 0), vy=(0, 0, 10, 10)):
+    n = len(v1)
+    return MapGeometry("TEST", vx, vy, v1, v2,
+                       flags if flags is not None else [0] * n,
+                       special if special is not None else [0] * n,
+                       tag if tag is not None else [0] * n,
+                       [], [], [], [])
+
+
+def test_decodes_like_omgifol(make_wad):
+    path = make_wad(maps=("MAP01", "MAP02"), rooms=20)
+    wad = MappedWAD(path)
+    for name in ("MAP01", "MAP02"):
+        g = MapGeometry.from_wad(wad, name)
+        edit = MapEditor(WAD(str(path)).maps[name])
+        assert g.num_vertexes == len(edit.vertexes)
+        assert g.num_linedefs == len(edit.linedefs)
+        assert g.num_things == len(edit.things)
+        assert g.vx.tolist() == [v.x for v in edit.vertexes]
+        assert g.vy.tolist() == [v.y for v in edit.vertexes]
+        assert g.v1.tolist() == [l.vx_a for l in edit.linedefs]
+        assert g.v2.tolist() == [l.vx_b for l in edit.linedefs]
+        assert g.special.tolist() == [l.action for l in edit.linedefs]
+        assert g.tag.tolist() == [l.tag for l in edit.linedefs]
+        assert g.two_sided.tolist() == [bool(l.two_sided) for l in edit.linedefs]
+        assert g.thing_type.tolist() == [t.type for t in edit.things]
+        assert g.num_sectors == len(edit.sectors)
+        assert g.namespace == "Doom"
+    wad.release()
+
+
+def test_bad_vertex_references_are_dropped():
+    g = geometry([0, 1, 7, 3], [1, 2, 0, 0])
+    assert g.v1.tolist() == [0, 1, 3]
+    assert g.num_linedefs == 3
+
+
+def test_styles_and_draw_order():
+    g = geometry([0, 1, 2, 3], [1, 2, 3, 0],
+                 flags=[0, TWOSIDED_FLAG, TWOSIDED_FLAG, 0],
+                 special=[0, 0, 11, 0], tag=[0, 0, 0, 5])
+    assert g.styles().tolist() == [STYLE_ONESIDED, STYLE_TWOSIDED, STYLE_SPECIAL, STYLE_TAGGED]
+    assert g.styles(specials=False).tolist() == [STYLE_ONESIDED, STYLE_TWOSIDED,
+                                                 STYLE_TWOSIDED, STYLE_ONESIDED]
+    # 2-sided first so 1-sided lines are never covered, stable otherwise
+    assert g.draw_order().tolist() == [1, 2, 0, 3]
+
+
+def test_bounds_and_layout():
+    g = geometry([0, 1], [1, 2], vx=(-100, 100, 0), vy=(-50, 50, 200))
+    # y flipped to screen space
+    assert g.bounds() == (-100, 100, -200, 50)
+    scale = g.fit_scale(260, 5)
+    assert scale == (260 - 10) / 250.0
+    assert g.fit_scale(260, 5, reqscale=2) == 0.5
+    px, py, xsize, ysize = g.layout(scale, 5)
+    assert (px.min(), py.min()) == (5, 5)
+    assert px.max() < xsize and py.max() < ysize
+    x1, y1, x2, y2, _, _ = g.segments(scale, 5)
+    assert (x1.tolist(), x2.tolist()) == ([px[0], px[1]], [px[1], px[2]])
+
+
+def test_empty_map():
+    g = geometry([], [], vx=(), vy=())
+    assert g.bounds() == (0, 0, 0, 0)
+    assert g.fit_scale(100, 4) > 0
+
+
+def segment_set(v1, v2):
+    return sorted(tuple(sorted(s)) for s in zip(v1, v2))
+
+
+def chains_to_set(chains):
+    return segment_set([a for c in chains for a in c[:-1].tolist()],
+                       [b for c in chains for b in c[1:].tolist()])
+
+
+def test_chain_segments_covers_every_segment_once():
+    rng = np.random.default_rng(3)
+    v1 = rng.integers(0, 40, 300)
+    v2 = (v1 + rng.integers(1, 5, 300)) % 40
+    chains = chain_segments(v1, v2)
+    assert chains_to_set(chains) == segment_set(v1.tolist(), v2.tolist())
+    assert sum(len(c) - 1 for c in chains) == 300
+
+
+def test_chain_segments_joins_polylines():
+    # a closed square and an open path 4-5-6, given in scrambled order
+    v1 = np.array([2, 5, 0, 3, 1, 4])
+    v2 = np.array([3, 6, 1, 0, 2, 5])
+    chains = chain_segments(v1, v2)
+    assert len(chains) == 2
+    lengths = sorted(len(c) for c in chains)
+    assert lengths == [3, 5]
+    square = next(c for c in chains if len(c) == 5)
+    assert square[0] == square[-1]
+
+
+def test_style_chains():
+    g = geometry([0, 1, 2, 3], [1, 2, 3, 0], flags=[0, 0, TWOSIDED_FLAG, 0])
+    chains = g.style_chains()
+    assert set(chains) == {STYLE_ONESIDED, STYLE_TWOSIDED}
+    assert [c.tolist() for c in chains[STYLE_TWOSIDED]] in ([[2, 3]], [[3, 2]])
+    assert len(chains[STYLE_ONESIDED]) == 1
+    assert len(chains[STYLE_ONESIDED][0]) == 4
+    assert g.style_chains() is chains
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_map_lod.py
+Description: LOD polyline simplification against a plain recursive
+             Douglas-Peucker.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+from map_lod import (simplify_chains, level_tolerance, level_for_scale,
+                     chains_to_segments, LOD_LEVELS, LOD_PIXELS)
+from map_geometry import MapGeometry
+
+
+def distance2(px, py, ax, ay, bx, by):
+    dx, dy = bx - ax, by - ay
+    length2 = dx*dx + dy*dy
+    t = 0.0 if length2 == 0 else min(max(((px - ax)*dx + (py - ay)*dy) / length2, 0.0), 1.0)
+    ex, ey = px - (ax + t*dx), py - (ay + t*dy)
+    return ex*ex + ey*ey
+
+
+def douglas_peucker(x, y, chain, tolerance):
+    keep = {0, len(chain) - 1}
+
+    def split(first, last):
+        best, far = None, -1.0
+        for i in range(first + 1, last):
+            d = distance2(x[chain[i]], y[chain[i]], x[chain[first]], y[chain[first]],
+                          x[chain[last]], y[chain[last]])
+            if d > far:
+                best, far = i, d
+        if best is not None and far > tolerance * tolerance:
+            keep.add(best)
+            split(first, best)
+            split(best, last)
+
+    split(0, len(chain) - 1)
+    return chain[sorted(keep)]
+
+
+def random_chains(seed=0):
+    rng = np.random.default_rng(seed)
+    x = np.round(np.cumsum(rng.normal(0, 20, 2000))).astype(np.int32)
+    y = np.round(np.cumsum(rng.normal(0, 20, 2000))).astype(np.int32)
+    bounds = np.sort(rng.choice(np.arange(2, 1999), 60, replace=False))
+    chains = [np.arange(a, b + 1, dtype=np.int32) for a, b in zip(bounds[:-1:2], bounds[1::2])]
+    # a closed loop
+    chains.append(np.array([0, 1, 2, 0], dtype=np.int32))
+    return x, y, chains
+
+
+def test_matches_recursive_douglas_peucker():
+    x, y, chains = random_chains()
+    for tolerance in (1.0, 8.0, 64.0):
+        simplified = simplify_chains(x, y, chains, tolerance)
+        expected = [douglas_peucker(x, y, c, tolerance) for c in chains]
+        extents = [max(np.ptp(x[c]), np.ptp(y[c])) for c in chains]
+        expected = [c for c, size in zip(expected, extents) if size >= tolerance]
+        assert [c.tolist() for c in simplified] == [c.tolist() for c in expected]
+
+
+def test_collinear_runs_merge():
+    x = np.array([0, 1, 2, 3, 10, 10])
+    y = np.array([0, 0, 0, 0, 0, 10])
+    assert [c.tolist() for c in simplify_chains(x, y, [np.arange(6)], 0.5)] == [[0, 4, 5]]
+
+
+def test_tiny_chains_dropped():
+    x = np.array([0, 1, 0, 100, 200])
+    y = np.array([0, 1, 1, 0, 0])
+    chains = [np.array([0, 1, 2]), np.array([3, 4])]
+    assert [c.tolist() for c in simplify_chains(x, y, chains, 4.0)] == [[3, 4]]
+    assert simplify_chains(x, y, [], 4.0) == []
+
+
+def test_levels():
+    assert level_tolerance(0) == 0.0
+    assert level_tolerance(3) == 8.0
+    assert level_for_scale(1.0) == 0
+    assert level_for_scale(LOD_PIXELS / 4) == 2
+    assert level_for_scale(1e-9) == LOD_LEVELS
+
+
+def test_chains_to_segments():
+    v1, v2 = chains_to_segments([np.array([0, 1, 2]), np.array([5, 6])])
+    assert v1.tolist() == [0, 1, 5]
+    assert v2.tolist() == [1, 2, 6]
+    v1, v2 = chains_to_segments([])
+    assert len(v1) == len(v2) == 0
+
+
+def test_geometry_levels_build_on_each_other():
+    x, y, chains = random_chains(1)
+    v1, v2 = chains_to_segments(chains)
+    g = MapGeometry("TEST", x, y, v1, v2, [0] * len(v1), [0] * len(v1), [0] * len(v1),
+                    [], [], [], [])
+    counts = [sum(len(c) for chains in g.lod(level).values() for c in chains)
+              for level in range(5)]
+    assert counts == sorted(counts, reverse=True)
+    assert counts[4] < counts[0]
+    assert g.lod(3) is g.lod(3)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_map_raster.py
+Description: The vectorized rasterizer against Pillow's ImageDraw.line.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+import map_raster
+from map_raster import (pen, new_image, line_pixels, clip_segments,
+                        draw_segments, draw_styled)
+
+RED = (255, 0, 0, 255)
+BLUE = (0, 0, 255, 255)
+
+
+def random_segments(n, size, seed=1):
+    rng = np.random.default_rng(seed)
+    # some reach past the edges
+    x1, y1, x2, y2 = (rng.integers(-20, size + 20, n) for _ in range(4))
+    colors = np.concatenate([rng.integers(0, 255, (n, 3)),
+                             np.full((n, 1), 255)], axis=1).astype(np.uint8)
+    return x1, y1, x2, y2, colors
+
+
+def pillow(size, x1, y1, x2, y2, colors, plus=False):
+    """What drawmaps.py drew with Pillow, five lines for a 2px pen"""
+    im = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(im)
+    shifts = ((0, 0), (1, 0), (-1, 0), (0, 1), (0, -1)) if plus else ((0, 0),)
+    for a, b, c, d, color in zip(x1.tolist(), y1.tolist(), x2.tolist(), y2.tolist(),
+                                 map(tuple, colors.tolist())):
+        for sx, sy in shifts:
+            draw.line((a + sx, b + sy, c + sx, d + sy), fill=color)
+    return np.asarray(im)
+
+
+def test_pen_shapes():
+    assert pen(1).tolist() == [[0, 0]]
+    assert sorted(pen(2).tolist()) == [[-1, 0], [0, -1], [0, 0], [0, 1], [1, 0]]
+    assert len(pen(3)) == 9
+    assert pen(3)[0].tolist() == [0, 0]
+
+
+def test_line_pixels_match_pillow():
+    x1, y1, x2, y2, colors = random_segments(300, 64)
+    xs, ys, seg = line_pixels(x1, y1, x2, y2)
+    assert (np.diff(seg) >= 0).all()
+    for i in range(len(x1)):
+        im = Image.new('1', (200, 200))
+        ImageDraw.Draw(im).line((x1[i] + 50, y1[i] + 50, x2[i] + 50, y2[i] + 50), fill=1)
+        ref = set(zip(*np.nonzero(np.asarray(im).T)))
+        mine = set(zip((xs[seg == i] + 50).tolist(), (ys[seg == i] + 50).tolist()))
+        assert mine == ref
+
+
+@pytest.mark.parametrize("plus", [False, True])
+def test_draw_segments_matches_pillow(plus):
+    x1, y1, x2, y2, colors = random_segments(2000, 300)
+    image = draw_segments(new_image(300, 300), x1, y1, x2, y2, colors, 2 if plus else 1)
+    assert (image == pillow(300, x1, y1, x2, y2, colors, plus)).all()
+
+
+def test_draw_segments_small_batches(monkeypatch):
+    monkeypatch.setattr(map_raster, "BATCH_PIXELS", 64)
+    x1, y1, x2, y2, colors = random_segments(500, 100, seed=2)
+    image = draw_segments(new_image(100, 100), x1, y1, x2, y2, colors, 2)
+    assert (image == pillow(100, x1, y1, x2, y2, colors, plus=True)).all()
+
+
+def test_later_segment_on_top_at_the_edge():
+    # the first runs down the left edge (its pen gets clipped), the second
+    # starts next to it with its whole pen inside the image
+    x1, y1, x2, y2 = (np.array(a) for a in ([0, 1], [0, 5], [0, 9], [9, 5]))
+    colors = np.array([RED, BLUE], dtype=np.uint8)
+    image = draw_segments(new_image(10, 10), x1, y1, x2, y2, colors, 3)
+    assert tuple(image[5, 1]) == BLUE
+    assert tuple(image[5, 0]) == BLUE
+    assert tuple(image[2, 1]) == RED
+
+
+def test_single_color_and_palette_image():
+    image = np.zeros((8, 8), dtype=np.uint8)
+    draw_segments(image, np.array([0]), np.array([0]), np.array([7]), np.array([7]), 3)
+    assert (np.diag(image) == 3).all()
+    assert image.sum() == 3 * 8
+
+
+def test_clip_segments():
+    x1, y1, x2, y2, keep = clip_segments([-10, 20, 5], [5, 20, -5], [20, 30, 5], [5, 30, 15],
+                                         0, 0, 10, 10)
+    # the one wholly outside is dropped
+    assert keep.tolist() == [0, 2]
+    assert np.allclose([x1[0], y1[0], x2[0], y2[0]], [0, 5, 10, 5])
+    assert np.allclose([x1[1], y1[1], x2[1], y2[1]], [5, 0, 5, 10])
+
+
+def test_draw_styled_keeps_order():
+    # a 2px style, a 1px one over it, then the 2px one again over that
+    x1, y1, x2, y2 = (np.array(a) for a in ([0, 0, 7], [5, 0, 0], [9, 9, 7], [5, 9, 9]))
+    styles = np.array([0, 1, 0])
+    image = draw_styled(new_image(10, 10), x1, y1, x2, y2, styles,
+                        {0: RED, 1: BLUE}, {0: 2, 1: 1})
+    assert tuple(image[5, 5]) == BLUE
+    assert tuple(image[5, 2]) == RED
+    assert tuple(image[7, 7]) == RED
+    assert tuple(image[2, 2]) == BLUE
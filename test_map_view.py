@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_map_view.py
+Description: MapView's map <-> screen transform, zoom and pan.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+import pytest
+from map_geometry import MapGeometry
+from map_view import MapView, MAX_ZOOM
+
+
+@pytest.fixture
+def view():
+    # 1000 x 500 map units
+    geometry = MapGeometry("TEST", [0, 1000, 1000, 0], [0, 0, 500, 500],
+                           [0, 1, 2, 3], [1, 2, 3, 0], [0] * 4, [0] * 4, [0] * 4,
+                           [], [], [], [])
+    return MapView(geometry, 1008, 4)
+
+
+def test_fits_the_map(view):
+    assert view.scale == 1.0
+    assert (view.width, view.height) == (1008, 508)
+    assert not view.zoomed
+    assert view.shows_everything()
+    x, y = view.to_screen([0, 1000], [-500, 0])
+    assert x.tolist() == [4, 1004]
+    assert y.tolist() == [4, 504]
+
+
+def test_round_trip(view):
+    view.zoom_at(3.0, 100, 200)
+    mx, my = view.to_map(np.array([0.0, 517.0]), np.array([0.0, 33.0]))
+    sx, sy = view.to_screen(mx, my)
+    assert np.allclose(sx, [0, 517]) and np.allclose(sy, [0, 33])
+
+
+def test_zoom_keeps_point_under_cursor(view):
+    before = view.to_map(300, 100)
+    view.zoom_at(4.0, 300, 100)
+    assert view.zoom == 4.0
+    assert np.allclose(view.to_map(300, 100), before)
+    assert view.zoomed
+    assert not view.shows_everything()
+    view.zoom_at(1e9, 0, 0)
+    assert view.zoom == MAX_ZOOM
+
+
+def test_pan_and_reset(view):
+    before = view.to_screen(500, -250)
+    view.pan_by(10, -20)
+    after = view.to_screen(500, -250)
+    assert np.allclose((after[0] - before[0], after[1] - before[1]), (10, -20))
+    view.reset()
+    assert not view.zoomed
+
+
+def test_visible_rect(view):
+    xmin, ymin, xmax, ymax = view.visible_rect()
+    assert np.allclose((xmin, xmax), (-4, 1004))
+    view.zoom_at(2.0, view.width / 2, view.height / 2)
+    xmin, ymin, xmax, ymax = view.visible_rect(margin=2)
+    assert np.allclose((xmin, xmax), (500 - 253, 500 + 253))
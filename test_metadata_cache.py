@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_metadata_cache.py
+Description: MetadataCache lookups, staleness and API fallback.
+Author: InZane84
+License: MIT
+"""
+import time
+import httpx
+from metadata_cache import MetadataCache
+
+PATH = "levels/doom2/a-c/foo.zip"
+FOO = {'id': 123, 'dir': 'levels/doom2/a-c/', 'filename': 'foo.zip', 'title': "Foo"}
+
+
+def api(requests):
+    def handler(request):
+        requests.append(dict(request.url.params))
+        return httpx.Response(200, json={'content': FOO})
+    return httpx.Client(transport=httpx.MockTransport(handler))
+
+
+def test_put_and_lookup(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    assert cache.cached(PATH) is None
+    cache.put(PATH, FOO)
+    assert cache.cached(PATH) == FOO
+    assert cache.cached(123) == FOO
+    assert cache.fresh("123") == FOO
+
+    # from the database, not the memory of the first instance
+    again = MetadataCache(tmp_path / "metadata.sqlite")
+    assert again.cached(123) == FOO
+    assert again.cached(PATH) == FOO
+
+
+def test_stale_after_ttl(tmp_path, monkeypatch):
+    cache = MetadataCache(tmp_path / "metadata.sqlite", ttl=60)
+    cache.put(PATH, FOO)
+    later = time.time() + 61
+    monkeypatch.setattr(time, "time", lambda: later)
+    assert cache.fresh(PATH) is None
+    assert cache.cached(PATH) == FOO
+
+
+def test_get_asks_api_once(tmp_path):
+    requests = []
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    client = api(requests)
+    assert cache.get(123, client) == FOO
+    assert cache.get(123, client) == FOO
+    assert cache.get(PATH, client) == FOO
+    assert requests == [{'action': 'get', 'id': '123', 'out': 'json'}]
+
+
+def test_get_retries_unknown(tmp_path):
+    requests = []
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    # the prefetcher stores files the API didn't know as {}
+    cache.put(PATH, {})
+    assert cache.cached(PATH) == {}
+    assert cache.get(PATH, api(requests)) == FOO
+    assert len(requests) == 1
+
+
+def test_clear(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    cache.put(PATH, FOO)
+    cache.clear()
+    assert cache.cached(PATH) is None
+    assert MetadataCache(tmp_path / "metadata.sqlite").cached(123) is None
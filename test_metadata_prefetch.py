@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_metadata_prefetch.py
+Description: MetadataPrefetcher against a fake idGames API.
+Author: InZane84
+License: MIT
+"""
+import time, json
+import httpx
+from metadata_cache import MetadataCache
+from metadata_prefetch import MetadataPrefetcher
+
+
+def wait_for(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def prefetcher(tmp_path, handler, **kwargs):
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    cache = MetadataCache(tmp_path / "metadata.sqlite")
+    return MetadataPrefetcher(cache, lambda path, content: None, rate=1000.0,
+                              client=client, **kwargs), cache
+
+
+def test_fetches_into_cache(tmp_path):
+    def handler(request):
+        path = request.url.params['file']
+        return httpx.Response(200, json={'content': {'id': 1, 'filename': path}})
+
+    fetcher, cache = prefetcher(tmp_path, handler)
+    fetcher.start(["levels/doom2/a-c/foo.zip"])
+    assert wait_for(lambda: fetcher.done.qsize() == 1)
+    fetcher.close()
+    assert cache.cached("levels/doom2/a-c/foo.zip")['filename'] == "levels/doom2/a-c/foo.zip"
+    assert cache.cached(1) is not None
+
+
+def test_html_reply_doesnt_kill_workers(tmp_path):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, text="<html>down for maintenance</html>")
+
+    fetcher, cache = prefetcher(tmp_path, handler, workers=2)
+    fetcher.start([f"levels/doom2/{i}.zip" for i in range(4)])
+    assert wait_for(lambda: len(requests) == 4)
+    assert wait_for(lambda: not fetcher._inflight)
+    assert all(t.is_alive() for t in fetcher._threads)
+    fetcher.start(["levels/doom2/again.zip"])
+    assert wait_for(lambda: len(requests) == 5)
+    fetcher.close()
+    # nothing was cached for them
+    assert cache.cached("levels/doom2/0.zip") is None
+
+
+def test_dead_workers_are_replaced(tmp_path):
+    def handler(request):
+        return httpx.Response(200, json={'content': {}})
+
+    fetcher, cache = prefetcher(tmp_path, handler, workers=2)
+    fetcher.start([])
+    fetcher._closed = True
+    with fetcher._cond:
+        fetcher._cond.notify_all()
+    assert wait_for(lambda: not any(t.is_alive() for t in fetcher._threads))
+    fetcher._closed = False
+    fetcher.start(["levels/doom2/foo.zip"])
+    assert sum(t.is_alive() for t in fetcher._threads) == 2
+    assert wait_for(lambda: fetcher.done.qsize() == 1)
+    fetcher.close()
+
+
+def test_retry_after_requeues(tmp_path):
+    calls = []
+
+    def handler(request):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return httpx.Response(429, headers={'Retry-After': '0.2'})
+        return httpx.Response(200, text=json.dumps({'content': {'id': 7}}))
+
+    fetcher, cache = prefetcher(tmp_path, handler, workers=1)
+    fetcher.start(["levels/doom2/foo.zip"])
+    assert wait_for(lambda: fetcher.done.qsize() == 1)
+    fetcher.close()
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_mirrors.py
+Description: MirrorRegistry probing, ranking and failover against fake
+             mirrors.
+Author: InZane84
+License: MIT
+"""
+import time
+import httpx
+from mirrors import MirrorRegistry
+
+FAST, SLOW, BROKEN = ("https://fast.example/idgames/", "https://slow.example/idgames/",
+                      "https://broken.example/idgames/")
+
+
+class FakeMirrors:
+    """Answers HEAD/GET per host: a delay in seconds, or None for down"""
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    def __call__(self, request):
+        for url, delay in self.delays.items():
+            if str(request.url).startswith(url):
+                if delay is None:
+                    raise httpx.ConnectError("down", request=request)
+                time.sleep(delay)
+                return httpx.Response(200)
+        return httpx.Response(404)
+
+
+def registry(delays, **kwargs):
+    client = httpx.Client(transport=httpx.MockTransport(FakeMirrors(delays)))
+    mirrors = MirrorRegistry([BROKEN, SLOW, FAST], client=client, **kwargs)
+    # full probes only when a test asks for them
+    mirrors.probe_in_background = lambda: None
+    return mirrors
+
+
+def wait_for(check, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def status_error(url, code):
+    request = httpx.Request("GET", url)
+    return httpx.HTTPStatusError(str(code), request=request,
+                                 response=httpx.Response(code, request=request))
+
+
+def test_unprobed_in_configured_order():
+    mirrors = registry({})
+    assert mirrors.ranked() == [BROKEN, SLOW, FAST]
+    assert mirrors.best() == BROKEN
+
+
+def test_probe_ranks_by_latency():
+    mirrors = registry({FAST: 0.0, SLOW: 0.1, BROKEN: None})
+    assert mirrors.probe() == [FAST, SLOW, BROKEN]
+    assert mirrors.status(BROKEN)['healthy'] is False
+    assert "ConnectError" in mirrors.status(BROKEN)['error']
+
+
+def test_failover_order():
+    mirrors = registry({FAST: 0.0, SLOW: 0.1, BROKEN: None})
+    mirrors.probe()
+    assert mirrors.best(exclude={FAST}) == SLOW
+    assert mirrors.best(exclude={FAST, SLOW}) == BROKEN
+    # all tried, back to the best
+    assert mirrors.best(exclude={FAST, SLOW, BROKEN}) == FAST
+
+    path = "levels/doom2/a-c/foo.zip"
+    assert mirrors.failover_url(FAST + path) == SLOW + path
+    # never to one known to be down
+    assert mirrors.failover_url(SLOW + path, exclude={FAST}) is None
+    assert mirrors.failover_url("https://elsewhere.example/" + path) is None
+
+
+def test_mark_failed_demotes():
+    mirrors = registry({FAST: 0.0, SLOW: 0.1, BROKEN: None}, recheck=60)
+    mirrors.probe()
+    mirrors.mark_failed(FAST, httpx.ConnectError("down"))
+    assert mirrors.ranked() == [SLOW, BROKEN, FAST]
+    assert mirrors.status(FAST)['healthy'] is False
+    mirrors.mark_failed(SLOW, status_error(SLOW + "foo", 503))
+    assert mirrors.status(SLOW)['healthy'] is False
+
+
+def test_404_doesnt_demote():
+    mirrors = registry({FAST: 0.0, SLOW: 0.1, BROKEN: None}, recheck=60)
+    mirrors.probe()
+    mirrors.mark_failed(FAST, status_error(FAST + "levels/gone.zip", 404))
+    assert mirrors.status(FAST)['healthy'] is True
+    assert mirrors.best() == FAST
+    assert not mirrors._rechecks
+
+
+def test_failed_mirror_recovers():
+    delays = {FAST: 0.0, SLOW: 0.1, BROKEN: None}
+    mirrors = registry(delays, recheck=0.05)
+    mirrors.probe()
+    # a blip, the mirror is fine again by the time it's rechecked
+    mirrors.mark_failed(FAST, httpx.ConnectError("blip"))
+    assert mirrors.best() == SLOW
+    assert wait_for(lambda: mirrors.status(FAST)['healthy'])
+    assert mirrors.best() == FAST
+
+
+def test_still_down_stays_demoted():
+    mirrors = registry({FAST: None, SLOW: 0.0}, recheck=0.05)
+    mirrors.mark_failed(FAST, httpx.ConnectError("down"))
+    # failing again before the recheck doesn't stack up timers
+    mirrors.mark_failed(FAST, httpx.ConnectError("down"))
+    assert len(mirrors._rechecks) == 1
+    assert wait_for(lambda: not mirrors._rechecks)
+    assert mirrors.status(FAST)['healthy'] is False
+    assert mirrors.best() != FAST
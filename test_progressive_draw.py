@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_progressive_draw.py
+Description: ProgressiveDraw's frame budget, reveal delay and cancelling.
+Author: InZane84
+License: MIT
+"""
+import time
+from progressive_draw import ProgressiveDraw
+
+
+def test_draws_everything_then_calls_on_done():
+    drawn, done = [], []
+    job = ProgressiveDraw(budget=1.0)
+    job.start(lambda i: drawn.append(i), [(1, {'i': i}) for i in range(100)],
+              on_done=lambda: done.append(True))
+    assert job.busy
+    job.step()
+    assert drawn == list(range(100))
+    assert done == [True]
+    assert not job.busy
+
+
+def test_budget_spreads_over_frames():
+    drawn = []
+
+    def slow(i):
+        time.sleep(0.002)
+        drawn.append(i)
+
+    job = ProgressiveDraw(budget=0.005)
+    job.start(slow, [(1, {'i': i}) for i in range(20)])
+    job.step()
+    assert 1 <= len(drawn) < 20
+    assert job.progress() == (len(drawn), 20)
+    frames = 1
+    while job.busy:
+        job.step()
+        frames += 1
+    assert drawn == list(range(20))
+    assert frames > 2
+
+
+def test_delay_reveals_lines_over_time():
+    drawn = []
+    job = ProgressiveDraw(budget=1.0)
+    # 10 linedefs an item, 0.01s a linedef
+    job.start(lambda i: drawn.append(i), [(10, {'i': i}) for i in range(5)], delay=0.01)
+    job.step()
+    assert len(drawn) == 1
+    time.sleep(0.11)
+    job.step()
+    assert 2 <= len(drawn) < 5
+
+
+def test_cancel_and_failing_draw():
+    drawn = []
+    job = ProgressiveDraw(budget=1.0)
+    job.start(lambda i: drawn.append(i), [(1, {'i': i}) for i in range(5)], delay=1.0)
+    job.step()
+    job.cancel()
+    job.step()
+    assert drawn == [0]
+    assert job.progress() == (0, 0)
+
+    def gone(i):
+        raise SystemError("item does not exist")
+
+    done = []
+    job.start(gone, [(1, {'i': 0})], on_done=lambda: done.append(True))
+    job.step()
+    assert not job.busy
+    assert not done
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_spatial_grid.py
+Description: SegmentGrid queries against a brute force search.
+Author: InZane84
+License: MIT
+"""
+import numpy as np
+import pytest
+import spatial_grid
+from spatial_grid import SegmentGrid
+
+
+def brute_force(x1, y1, x2, y2, xmin, ymin, xmax, ymax):
+    return np.flatnonzero((np.minimum(x1, x2) <= xmax) & (np.maximum(x1, x2) >= xmin) &
+                          (np.minimum(y1, y2) <= ymax) & (np.maximum(y1, y2) >= ymin))
+
+
+def random_segments(n, seed=0):
+    rng = np.random.default_rng(seed)
+    x1, y1 = rng.uniform(-5000, 5000, n), rng.uniform(-5000, 5000, n)
+    # mostly short lines, a few long ones across the map
+    length = np.where(rng.random(n) < 0.02, 8000, 200)
+    return x1, y1, x1 + rng.uniform(-1, 1, n) * length, y1 + rng.uniform(-1, 1, n) * length
+
+
+@pytest.mark.parametrize("cell", [None, 50.0, 5000.0])
+def test_query_matches_brute_force(cell):
+    x1, y1, x2, y2 = random_segments(3000)
+    grid = SegmentGrid(x1, y1, x2, y2, cell)
+    if cell == 50.0:
+        # the long lines are too big for the grid
+        assert len(grid.big)
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        cx, cy = rng.uniform(-7000, 7000, 2)
+        w, h = rng.uniform(1, 3000, 2)
+        rect = (cx - w, cy - h, cx + w, cy + h)
+        assert grid.query(*rect).tolist() == brute_force(x1, y1, x2, y2, *rect).tolist()
+
+
+def test_query_outside_and_everything():
+    x1, y1, x2, y2 = random_segments(500, seed=2)
+    grid = SegmentGrid(x1, y1, x2, y2)
+    assert len(grid.query(20000, 20000, 30000, 30000)) == 0
+    assert len(grid.query(-30000, -30000, -20000, -20000)) == 0
+    assert grid.query(-1e6, -1e6, 1e6, 1e6).tolist() == list(range(500))
+
+
+def test_no_big_segments(monkeypatch):
+    monkeypatch.setattr(spatial_grid, "MAX_SEGMENT_CELLS", 10**9)
+    x1, y1, x2, y2 = random_segments(300, seed=3)
+    grid = SegmentGrid(x1, y1, x2, y2)
+    assert not len(grid.big)
+    rect = (-1000, -1000, 1000, 1000)
+    assert grid.query(*rect).tolist() == brute_force(x1, y1, x2, y2, *rect).tolist()
+
+
+def test_empty_and_degenerate():
+    assert len(SegmentGrid([], [], [], []).query(0, 0, 10, 10)) == 0
+    # a single point segment
+    grid = SegmentGrid([5], [5], [5], [5])
+    assert grid.query(0, 0, 10, 10).tolist() == [0]
+    assert grid.query(6, 6, 10, 10).tolist() == []
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_wadfile_buffer.py
+Description: BufferWAD/MappedWAD loading and releasing.
+Author: InZane84
+License: MIT
+"""
+import io
+import numpy as np
+import pytest
+from omg import WAD
+from wadfile_buffer import BufferWAD, MappedWAD, ViewLump
+
+
+@pytest.mark.parametrize("kind", [bytes, bytearray, memoryview, io.BytesIO])
+def test_buffer_wad_matches_omgifol(make_wad, kind):
+    path = make_wad(maps=("MAP01", "MAP02"), extra={"DEMO1": b"x" * 300})
+    wad = BufferWAD(kind(path.read_bytes()))
+    ref = WAD(str(path))
+    assert list(wad.maps) == list(ref.maps)
+    for name in ref.maps:
+        for lump in ref.maps[name]:
+            assert wad.maps[name][lump].data == ref.maps[name][lump].data
+    assert wad.data["DEMO1"].data == b"x" * 300
+    assert isinstance(wad.maps["MAP01"]["LINEDEFS"], ViewLump)
+    wad.release()
+
+
+def test_not_a_wad():
+    with pytest.raises(IOError):
+        BufferWAD(b"JUNK" + bytes(20))
+    with pytest.raises(IOError):
+        BufferWAD(b"PWAD")
+
+
+def test_mapped_wad_indexes_maps_only(make_wad):
+    wad = MappedWAD(make_wad(extra={"DEMO1": b"x" * 300}))
+    assert list(wad.maps) == ["MAP01"]
+    assert not hasattr(wad, "data")
+    # a view straight into the mapping
+    view = wad.maps["MAP01"]["VERTEXES"].view
+    assert view.readonly
+    wad.release()
+
+
+def test_release_unmaps(make_wad):
+    wad = MappedWAD(make_wad())
+    mapping = wad._mmap
+    view = wad.maps["MAP01"]["LINEDEFS"].view
+    wad.release()
+    assert mapping.closed
+    # what it handed out can't be read any more
+    with pytest.raises(ValueError):
+        bytes(view)
+
+
+def test_release_warns_about_views_in_use(make_wad, capsys):
+    wad = MappedWAD(make_wad())
+    mapping = wad._mmap
+    array = np.frombuffer(wad.maps["MAP01"]["LINEDEFS"].view, dtype=np.uint8)
+    wad.release()
+    assert not mapping.closed
+    assert "still mapped" in capsys.readouterr().out
+    # still readable, it's the array keeping it alive
+    assert array.sum() >= 0
+    del array
+    mapping.close()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: test_wadfile_cache.py
+Description: DownloadCache storing, deduplicating and evicting zips.
+Author: InZane84
+License: MIT
+"""
+import hashlib
+import pytest
+from wadfile_cache import DownloadCache, _INDEX
+
+
+def zipdata(n, size=1000):
+    return bytes([n]) * size
+
+
+def test_put_and_get(tmp_path):
+    cache = DownloadCache(tmp_path)
+    content = {'filename': 'foo.zip', 'md5': hashlib.md5(zipdata(1)).hexdigest()}
+    path = cache.put("123", zipdata(1), content)
+    assert path.read_bytes() == zipdata(1)
+    assert "123" in cache and 123 in cache
+    assert cache.get(123) == (content, zipdata(1))
+    assert cache.info("123") == content
+
+    # a new instance reads it back from the index
+    again = DownloadCache(tmp_path)
+    assert again.get_path("123") == (content, path)
+    assert again.total_size == 1000
+
+
+def test_md5_mismatch(tmp_path):
+    cache = DownloadCache(tmp_path)
+    with pytest.raises(ValueError):
+        cache.put("123", zipdata(1), {'md5': hashlib.md5(b"other").hexdigest()})
+    assert "123" not in cache
+
+
+def test_same_zip_kept_once(tmp_path):
+    cache = DownloadCache(tmp_path)
+    cache.put("123", zipdata(1))
+    cache.put("levels/doom2/foo.zip", zipdata(1))
+    assert cache.total_size == 1000
+    assert len(list(tmp_path.glob("*.zip"))) == 1
+    # the zip stays while another id uses it
+    cache._remove("123")
+    assert cache.get("levels/doom2/foo.zip")[1] == zipdata(1)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = DownloadCache(tmp_path, max_size=2500)
+    cache.put("1", zipdata(1))
+    cache.put("2", zipdata(2))
+    cache.get_path("1")
+    cache.put("3", zipdata(3))
+    assert "2" not in cache
+    assert "1" in cache and "3" in cache
+    assert cache.total_size == 2000
+    assert len(list(tmp_path.glob("*.zip"))) == 2
+
+
+def test_hits_written_by_flush(tmp_path):
+    cache = DownloadCache(tmp_path)
+    cache.put("1", zipdata(1))
+    cache.put("2", zipdata(2))
+    index = (tmp_path / _INDEX).stat().st_mtime_ns
+    for _ in range(100):
+        cache.get_path("1")
+    assert (tmp_path / _INDEX).stat().st_mtime_ns == index
+    cache.flush()
+    # "1" is the most recently used one after a reload
+    assert list(DownloadCache(tmp_path)._load()) == ["2", "1"]
+
+
+def test_truncated_zip_dropped(tmp_path):
+    cache = DownloadCache(tmp_path)
+    path = cache.put("1", zipdata(1))
+    path.write_bytes(b"short")
+    assert cache.get_path("1") == (None, None)
+    assert "1" not in cache
+    assert cache.total_size == 0
+
+
+def test_clear(tmp_path):
+    cache = DownloadCache(tmp_path)
+    cache.put("1", zipdata(1))
+    cache.clear()
+    assert not list(tmp_path.glob("*.zip"))
+    assert DownloadCache(tmp_path).total_size == 0
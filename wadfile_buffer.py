@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: wadfile_buffer.py
+Description: omgifol WAD loading from in-memory buffers (bytes, BytesIO,
+             memoryview) without a tempfile round-trip, and lazy mmap'd
+             loading of local WAD files.
+Author: InZane84
+License: MIT
+"""
+import io, mmap, ctypes
+from omg.wad import WAD, HeaderGroup, defstruct
+from omg.wadio import WadIO, Header, Entry
+from omg.lump import Lump
+from omg.util import wccmp
+
+_HEADER_SIZE = ctypes.sizeof(Header)
+_ENTRY_SIZE = ctypes.sizeof(Entry)
+
+
+class ViewLump(Lump):
+    """A lump that keeps a memoryview slice of the WAD buffer instead of
+    its own copy of the data.
+
+    .view  -- zero-copy memoryview of the lump (use this for np.frombuffer etc.)
+    .data  -- bytes copy, made on access so the rest of omgifol keeps working
+    """
+
+    def __init__(self, data=None, from_file=None):
+        self.view = memoryview(b"")
+        Lump.__init__(self, data, from_file)
+
+    @property
+    def data(self):
+        return bytes(self.view)
+
+    @data.setter
+    def data(self, value):
+        if isinstance(value, Lump):
+            value = value.data
+        self.view = memoryview(value if value is not None else b"")
+
+    def copy(self):
+        return ViewLump(bytes(self.view))
+
+
+# same sections as omgifol's default structure, but every lump is a view
+# into the buffer. NOTE: Graphic/Sound/Flat helpers aren't available on
+# these lumps, the viewer only ever needs the raw map lumps.
+bufstruct = [[group[0], group[1], ViewLump, group[3]] for group in defstruct]
+
+# only the map sections, everything else in the directory is skipped
+mapstruct = [group for group in bufstruct if group[0] is HeaderGroup]
+
+
+def release_views(group):
+    """Release the memoryviews of a group's ViewLumps (map groups hold
+    a dict of lumps per map)"""
+    for lump in group.values():
+        if isinstance(lump, dict):
+            release_views(lump)
+        elif isinstance(lump, ViewLump):
+            try:
+                lump.view.release()
+            except BufferError:
+                # exported again, whoever did that keeps it
+                pass
+
+
+def as_buffer(source):
+    """Get a read-only memoryview over a bytes-like object or io.BytesIO"""
+    if isinstance(source, io.BytesIO):
+        # getbuffer() exposes the BytesIO's own storage, no copy
+        source = source.getbuffer()
+    view = memoryview(source)
+    if view.ndim != 1 or view.itemsize != 1:
+        view = view.cast("B")
+    return view.toreadonly()
+
+
+class BufferWadIO(WadIO):
+    """Read-only WadIO that reads the directory and lumps out of a
+    memoryview instead of a file on disk."""
+
+    def __init__(self, source=None):
+        self.buffer = None
+        WadIO.__init__(self, source)
+
+    def open(self, source):
+        """Parse the WAD header and lump directory from `source`"""
+        assert not self.entries
+        buf = as_buffer(source)
+        if len(buf) < _HEADER_SIZE:
+            raise IOError("The buffer is not a valid WAD file.")
+        self.header = h = Header(bytes=bytes(buf[:_HEADER_SIZE]))
+        if h.type not in ("PWAD", "IWAD"):
+            raise IOError("The buffer is not a valid WAD file.")
+        if len(buf) < h.dir_ptr + h.dir_len * _ENTRY_SIZE:
+            raise IOError("Invalid directory information in header.")
+        self.buffer = buf
+        self.entries = [Entry(bytes=bytes(buf[ptr:ptr + _ENTRY_SIZE]))
+                        for ptr in range(h.dir_ptr,
+                                         h.dir_ptr + h.dir_len * _ENTRY_SIZE,
+                                         _ENTRY_SIZE)]
+
+    def close(self):
+        if self.buffer is not None:
+            try:
+                self.buffer.release()
+            except BufferError:
+                pass
+        self.buffer = None
+
+    def select(self, id):
+        if isinstance(id, int):
+            if id < len(self.entries):
+                return id
+            raise LookupError
+        elif isinstance(id, str):
+            for i in range(len(self.entries)):
+                if wccmp(self.entries[i].name, id):
+                    return i
+            raise LookupError
+        raise TypeError
+
+    def read(self, id):
+        """Return a lump as a memoryview slice of the buffer (no copy)"""
+        entry = self.entries[self.select(id)]
+        if entry.ptr + entry.size > len(self.buffer):
+            raise IOError(f"Lump {entry.name} points past the end of the WAD.")
+        return self.buffer[entry.ptr:entry.ptr + entry.size]
+
+    def _readonly(self, *args, **kwargs):
+        raise IOError("BufferWadIO is read-only")
+
+    insert = update = remove = rename = save = _readonly
+    write_at = write_append = write_free = _readonly
+
+
+class BufferWAD(WAD):
+    """omgifol WAD loaded straight from memory.
+
+    new = BufferWAD(source[, structure])
+
+    `source` may be bytes, bytearray, memoryview or io.BytesIO. Lumps are
+    ViewLump objects slicing the source buffer, so the WAD is never copied
+    and never written to disk. The source must stay unmodified for as long
+    as the BufferWAD is in use.
+    """
+
+    def __init__(self, source=None, structure=bufstruct):
+        self.wadio = None
+        WAD.__init__(self, structure=structure)
+        if source is not None:
+            self.from_buffer(source)
+
+    def from_buffer(self, source):
+        """Load all sections from an in-memory WAD"""
+        self.wadio = BufferWadIO(source)
+        self.from_file(self.wadio)
+
+    @property
+    def buffer(self):
+        """The whole WAD as a memoryview (None if nothing is loaded)"""
+        return self.wadio.buffer if self.wadio else None
+
+    def release(self):
+        """Drop all lumps and the buffer reference. The lumps' views are
+        released, anything still holding one can't read it any more."""
+        for group in self.groups:
+            release_views(group)
+            group.clear()
+        if self.wadio:
+            self.wadio.close()
+            self.wadio = None
+
+
+class MappedWAD(BufferWAD):
+    """A local WAD file opened through mmap.
+
+    new = MappedWAD(path[, lazy])
+
+    Only the lump directory is parsed up front. With lazy=True (default)
+    only the map sections are indexed; textures, sounds, music etc. are
+    never touched. Lump data is paged in by the OS the first time a map's
+    lumps are actually read, so memory grows with the maps viewed rather
+    than with the size of the file.
+    """
+
+    def __init__(self, path, lazy=True):
+        self.path = path
+        self._mmap = None
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # mmap refuses empty files
+                raise IOError(f"{path} is not a valid WAD file.")
+        BufferWAD.__init__(self, self._mmap,
+                           structure=mapstruct if lazy else bufstruct)
+
+    def release(self):
+        """Drop all lumps and unmap the file"""
+        BufferWAD.release(self)
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # something made from a lump (np.frombuffer...) is still
+                # around, the mapping and the file stay open until it goes
+                print(f"MappedWAD: {self.path} is still mapped, a view of "
+                      f"one of its lumps is still in use")
+            self._mmap = None
@@ -1,127 +1,235 @@
+# -*- coding: utf-8 -*-
 """
-wadfile_cache.py
-
-Module for caching downloaded WAD files from the idGames archive.
+Module Name: wadfile_cache.py
+Description: On-disk cache of zips downloaded from the idGames archive, so
+             reopening an idgames id doesn't touch the network.
+Author: InZane84
+License: MIT
 """
-
-# NOTE: This module is not used and the code within was generated by gemini
-#       it's here to reference when implementing the idGames browser as I am
-#       new to network programming and httpx...
-#       prolly shouldn't of commited it
-
-import os
-import io
+import os, json, time, atexit, hashlib, threading
+from collections import OrderedDict
 from pathlib import Path
 
-CACHE_DIR = Path("/tmp/doom_mapscope_cache")
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME",
+                                Path.home() / ".cache")) / "doom_map_scope" / "downloads"
 MAX_CACHE_SIZE = 250*1024*1024
-CACHE_DIR.mkdir(exist_ok=True)
-
-def get_cache_path(wad_id):
-    """Generate cache file path from WAD ID"""
-    return CACHE_DIR / f"wad_{wad_id}.zip"
-
-def get_cache_size():
-    """Get total size of cached files in bytes"""
-    if not CACHE_DIR.exists():
-        return 0
-    return sum(f.stat().st_size for f in CACHE_DIR.glob("wad_*.zip"))
-
-def cleanup_cache(needed_space):
-    """Remove oldest files if cache exceeds limit"""
-    cache_size = get_cache_size()
-
-    if cache_size + needed_space > MAX_CACHE_SIZE:
-        print(f"Cache cleanup: {cache_size / 1024 / 1024:.1f}MB + {needed_space / 1024 / 1024:.1f}MB needed")
-
-        # Get all cached files sorted by modification time (oldest first)
-        cached_files = sorted(CACHE_DIR.glob("wad_*.zip"), key=lambda f: f.stat().st_mtime)
-
-        # Delete oldest files until we have space
-        for cache_file in cached_files:
-            if cache_size + needed_space <= MAX_CACHE_SIZE:
-                break
-            file_size = cache_file.stat().st_size
-            cache_file.unlink()
-            cache_size -= file_size
-            print(f"Deleted cache: {cache_file.name} ({file_size / 1024 / 1024:.1f}MB)")
-# wadfile_downloader and extract_wad_from_zip are
-# just hanging out here in the cache implementation for now
-def wadfile_downloader(user_input):
-    """Get a wadfile over http from the idGames database with caching"""
-    wad_id = user_input.split("://")[-1].strip()
-    cache_path = get_cache_path(wad_id)
-
-    # Check if already cached
-    if cache_path.exists():
-        print(f"Loading from cache: {cache_path}")
-        with open(cache_path, 'rb') as f:
-            wad_data = extract_wad_from_zip(f.read())
-            wadfile.open_wadfile(sender='foo', app_data=io.BytesIO(wad_data))
-        return
-
-    try:
-        with httpx.Client(follow_redirects=True) as client:
-            api_url = f"https://doomworld.com/idgames/api/api.php?action=get&id={wad_id}&out=json"
-            print(f"Requesting: {api_url}")
-            response = client.get(api_url)
-            data = response.json()
-
-            # Display WAD info
-            display_wadfile_info(data)
-
-            # Download wadfile
-            if 'content' in data:
-                file_path = data['content']['dir'].strip('/')
-                file_name = data['content']['filename']
-                download_url = f"https://gamers.org/pub/idgames/{file_path}/{file_name}"
-
-                print(f"Downloading from: {download_url}")
-                _headers = {"User-Agent": "Mozilla/5.0 (Doom Map Scope)"}
-                r = client.get(download_url, headers=_headers)
-                r.raise_for_status()
-
-                # Check cache space before saving
-                cleanup_cache(len(r.content))
-
-                # Save to cache
-                cache_path.write_bytes(r.content)
-                print(f"Cached: {cache_path} ({len(r.content) / 1024 / 1024:.1f}MB)")
-
-                # Extract and open WAD
-                wad_data = extract_wad_from_zip(r.content)
-                wadfile.open_wadfile(sender='foo', app_data=io.BytesIO(wad_data))
-                print(f"Successfully loaded WAD")
-
-    except httpx.ConnectError:
-        dpg.set_value("status_text", "Error: Could not connect to idGames")
-    except Exception as e:
-        dpg.set_value("status_text", f"Error: {str(e)}")
-
-def extract_wad_from_zip(zip_content):
-    """Extract WAD file from zip archive"""
-    with zipfile.ZipFile(io.BytesIO(zip_content)) as z:
-        wads = [f for f in z.namelist() if f.lower().endswith('.wad')]
-        if wads:
-            return z.read(wads[0])
-    return None
-
-def clear_cache():
-    """Manually clear all cached files"""
-    for cache_file in CACHE_DIR.glob("wad_*.zip"):
-        cache_file.unlink()
-    print("Cache cleared")
-
-"""
-# First download - fetches from server
-    wadfile_downloader("15156")
-
-# Second 'download' - from cache
-    wadfile_downloader("15156")
-
-# cleanup
-    clear_cache()
 
-# Check cache size
-    print(f"Cache size: {get_cache_size() / 1024 / 1024:.1f}MB")
-"""
\ No newline at end of file
+_INDEX = "index.json"
+INDEX_VERSION = 1
+
+
+def _safe_name(wad_id):
+    # ids can be archive paths too
+    return "".join(c if c.isalnum() else "_" for c in str(wad_id))
+
+
+class DownloadCache:
+    """Downloaded zips keyed by idgames id.
+
+    The zips are stored under their sha256, so the same file reached
+    through two ids is only kept once. index.json maps each id to
+    {hash, size, atime, md5, content} (content being the API's file info,
+    so a cached id can be shown without asking the API again). The index
+    is read once, after that the total size and the LRU order are kept
+    up to date in memory, nothing globs or stats the cache directory.
+    A hit only updates the access time in memory, the index is written
+    by the next put/eviction or flush() (run at exit). Least recently
+    used ids are evicted once the zips take more than `max_size` bytes.
+    Safe to share between downloader threads.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size=MAX_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self._lock = threading.RLock()
+        self._entries = None   # id -> entry, least recently used first
+        self._refs = {}        # hash -> ids using it
+        self._total = 0        # bytes of distinct zips
+        self._dirty = False    # access times not written yet
+        self._download_locks = {}
+        atexit.register(self.flush)
+
+    # -- index -----------------------------------------------------------
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        try:
+            with open(self.cache_dir / _INDEX) as f:
+                index = json.load(f)
+            if index.get('version') != INDEX_VERSION:
+                index = {}
+        except (OSError, ValueError):
+            index = {}
+        entries = sorted(index.get('entries', {}).items(), key=lambda e: e[1]['atime'])
+        self._entries = OrderedDict()
+        for wad_id, entry in entries:
+            self._add(wad_id, entry)
+        return self._entries
+
+    def _save(self):
+        self._dirty = False
+        index = {'version': INDEX_VERSION, 'entries': self._entries}
+        tmp = self.cache_dir / f"{_INDEX}.{threading.get_ident()}.tmp"
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w") as f:
+                json.dump(index, f)
+            os.replace(tmp, self.cache_dir / _INDEX)
+        except OSError as e:
+            print(f"DownloadCache: couldn't save the index: {e}")
+
+    def _add(self, wad_id, entry):
+        ids = self._refs.setdefault(entry['hash'], set())
+        if not ids:
+            self._total += entry['size']
+        ids.add(wad_id)
+        self._entries[wad_id] = entry
+
+    def _remove(self, wad_id):
+        """Forget an id, delete its zip when no other id uses it"""
+        entry = self._entries.pop(wad_id)
+        ids = self._refs[entry['hash']]
+        ids.discard(wad_id)
+        if not ids:
+            del self._refs[entry['hash']]
+            self._total -= entry['size']
+            self.path_for(entry['hash']).unlink(missing_ok=True)
+
+    # -- entries ---------------------------------------------------------
+
+    def path_for(self, digest):
+        return self.cache_dir / f"{digest}.zip"
+
+    @property
+    def total_size(self):
+        with self._lock:
+            self._load()
+            return self._total
+
+    def __contains__(self, wad_id):
+        with self._lock:
+            return str(wad_id) in self._load()
+
+    def info(self, wad_id):
+        """The API file info stored with an id, or None"""
+        with self._lock:
+            entry = self._load().get(str(wad_id))
+            return entry and entry['content']
+
+    def lock_for(self, wad_id):
+        """Lock to hold while downloading an id, so two threads asking for
+        the same id don't both download it"""
+        with self._lock:
+            return self._download_locks.setdefault(str(wad_id), threading.Lock())
+
+    def download_path(self, wad_id):
+        """Where to stream a download of an id before add_file(), partial
+        downloads left there are resumed"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return self.cache_dir / f"wad_{_safe_name(wad_id)}.download"
+
+    def get_path(self, wad_id):
+        """(file info, zip path) of a cached id, or (None, None)"""
+        wad_id = str(wad_id)
+        with self._lock:
+            entry = self._load().get(wad_id)
+            if entry is None:
+                return None, None
+            path = self.path_for(entry['hash'])
+            try:
+                intact = path.stat().st_size == entry['size']
+            except OSError:
+                intact = False
+            if not intact:
+                print(f"DownloadCache: dropping {wad_id}, its zip is gone or truncated")
+                self._remove(wad_id)
+                self._save()
+                return None, None
+            entry['atime'] = time.time()
+            self._entries.move_to_end(wad_id)
+            self._dirty = True
+        return entry['content'], path
+
+    def get(self, wad_id):
+        """(file info, zip bytes) of a cached id, or (None, None)"""
+        content, path = self.get_path(wad_id)
+        if path is None:
+            return None, None
+        try:
+            return content, path.read_bytes()
+        except OSError:
+            # evicted while we were reading
+            return None, None
+
+    def put(self, wad_id, data, content=None):
+        """Add a downloaded zip, then evict if over budget.
+
+        When the file info carries the API's md5 the zip is checked
+        against it first and a ValueError raised on a mismatch.
+        """
+        content = content or {}
+        md5 = content.get('md5')
+        if md5 and hashlib.md5(data).hexdigest() != md5.lower():
+            raise ValueError(f"DownloadCache: {wad_id}: md5 mismatch, download is corrupt")
+        # threads writing the same id each use their own temp file
+        tmp = self.cache_dir / f"wad_{_safe_name(wad_id)}.{threading.get_ident()}.tmp"
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+        except OSError as e:
+            print(f"DownloadCache: couldn't write {tmp.name}: {e}")
+            tmp.unlink(missing_ok=True)
+            return None
+        return self.add_file(wad_id, tmp, hashlib.sha256(data).hexdigest(), len(data), content)
+
+    def add_file(self, wad_id, path, digest, size, content=None):
+        """Move a downloaded (already verified) zip into the cache, then
+        evict if over budget. Returns the cached zip's path."""
+        wad_id = str(wad_id)
+        content = content or {}
+        entry = {'hash': digest, 'size': size, 'atime': time.time(),
+                 'md5': content.get('md5'), 'content': content}
+        with self._lock:
+            self._load()
+            cached = self.path_for(digest)
+            if digest in self._refs:
+                # another id already has this zip
+                os.remove(path)
+            else:
+                os.replace(path, cached)
+
+            old = self._entries.get(wad_id)
+            if old is not None and old['hash'] == digest:
+                # same zip again, only the info and access time change
+                self._entries[wad_id] = entry
+                self._entries.move_to_end(wad_id)
+            else:
+                if old is not None:
+                    self._remove(wad_id)
+                self._add(wad_id, entry)
+            self._evict()
+            self._save()
+            print(f"DownloadCache: cached {wad_id} ({size / 1024 / 1024:.1f}MB, "
+                  f"{self._total / 1024 / 1024:.1f}MB total)")
+        return cached
+
+    def flush(self):
+        """Write access times from hits since the last save"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    def _evict(self):
+        # never evict what was just added, even if it's over budget alone
+        while self._total > self.max_size and len(self._entries) > 1:
+            wad_id = next(iter(self._entries))
+            print(f"DownloadCache: evicting {wad_id}")
+            self._remove(wad_id)
+
+    def clear(self):
+        """Remove every cached zip"""
+        with self._lock:
+            for wad_id in list(self._load()):
+                self._remove(wad_id)
+            self._save()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Module Name: wadinfo.py
+Description: Opening WADs (local file or idgames id), telling DOOM from
+             DOOM2 map names and map statistics, no GUI needed.
+Author: InZane84
+License: MIT
+"""
+import os, re
+from wadfile_buffer import BufferWAD, MappedWAD
+
+# map name format per game
+MAPID_FORMATS = {"DOOM": r"E\d{1}M\d{1}",
+                 "DOOM2": r"MAP\d{2}"}
+
+
+def identify_game(map_name):
+    """Game a map name belongs to, from its format"""
+    if "E" in map_name:
+        return "DOOM"
+    elif "MAP" in map_name:
+        return "DOOM2"
+    return "UNKNOWN/UNSUPPORTED"
+
+
+def find_map_ids(map_names, game):
+    """The map names that fit the game's map name format"""
+    regex = re.compile(MAPID_FORMATS[game])
+    return [name for name in map_names if regex.match(name)]
+
+
+def wad_map_ids(wad):
+    """(game, map ids) of an opened WAD, (game, []) when the game isn't
+    supported"""
+    names = list(wad.maps.keys())
+    if not names:
+        return "UNKNOWN/UNSUPPORTED", []
+    game = identify_game(names[0])
+    if game not in MAPID_FORMATS:
+        return game, []
+    return game, find_map_ids(names, game)
+
+
+def open_source(source):
+    """Open a WAD from a local path or an idgames id ('idgames://123').
+    Returns (wad, label)."""
+    if os.path.isfile(source):
+        return MappedWAD(source), source
+
+    # only needs the network (and httpx) for idgames ids
+    import idgames
+    from wadfile_cache import DownloadCache
+    wad_id = idgames.parse_id(source)
+    if not wad_id.isdigit():
+        raise FileNotFoundError(f"{source}: not a file or an idgames id")
+    content, name, data = idgames.fetch_wad(wad_id, cache=DownloadCache())
+    if data is None:
+        raise LookupError(f"idgames {wad_id}: no .wad in {content['filename']}")
+    return BufferWAD(data), f"idgames://{wad_id} {content['filename']}:{name}"
+
+
+def map_stats(geometry):
+    """Counts and bounds (map units, y up) of a MapGeometry"""
+    if geometry.num_vertexes:
+        bounds = {'xmin': int(geometry.vx.min()), 'xmax': int(geometry.vx.max()),
+                  'ymin': int(geometry.vy.min()), 'ymax': int(geometry.vy.max())}
+    else:
+        bounds = None
+    return {'name': geometry.name,
+            'namespace': geometry.namespace,
+            'vertexes': geometry.num_vertexes,
+            'linedefs': geometry.num_linedefs,
+            'sidedefs': geometry.num_sidedefs,
+            'sectors': geometry.num_sectors,
+            'things': geometry.num_things,
+            'bounds': bounds}